@@ -0,0 +1,349 @@
+# batch_scoring.py
+# Scoring de portefeuilles par morceaux (CSV / Parquet), sans dépendance à Streamlit
+#
+# En ligne de commande (revalorisations nocturnes, ni Streamlit ni Plotly importés) :
+#   python batch_scoring.py portefeuille.csv --output scores.csv --workers 8
+#   zcat portefeuille.csv.gz | python batch_scoring.py - --chunk-size 100000 > scores.csv
+#
+# Le processus principal ne fait que découper l'entrée en blocs de lignes (octets bruts pour
+# un CSV) et écrire les résultats dans l'ordre d'entrée; chaque processus du pool charge le
+# modèle une fois puis lit, prédit et formate ses blocs, ce qui occupe tous les cœurs.
+#
+# Une ligne dont une cellule est illisible (« 1,200 », « N/A ») n'est pas prédite : elle est
+# écrite sans prix, avec le motif dans la colonne ScoringError, et comptée sur stderr.
+
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+# Taille de morceau par défaut (lignes lues et prédites en un seul appel)
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Colonnes ajoutées aux résultats
+PREDICTION_COLUMN = 'PredictedPrice'
+LOWER_COLUMN = 'PredictedPriceLower'
+UPPER_COLUMN = 'PredictedPriceUpper'
+# Motif du rejet d'une ligne (vide si elle est scorée) : cellules non numériques
+ERROR_COLUMN = 'ScoringError'
+# Préfixe des colonnes de contribution (prédiction = biais + somme des contributions)
+CONTRIBUTION_PREFIX = 'Contribution_'
+
+SUPPORTED_FORMATS = ('csv', 'parquet')
+
+
+# Fonction pour déduire le format à partir du nom de fichier
+def detect_format(filename):
+    """Déduire le format (csv ou parquet) à partir de l'extension du fichier"""
+    extension = os.path.splitext(str(filename).lower())[1]
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.csv', '.txt'):
+        return 'csv'
+    raise ValueError(f"Format de fichier non supporté: '{extension}' (attendu: CSV ou Parquet)")
+
+
+# Fonction pour vérifier les colonnes du fichier
+def check_columns(columns, feature_names):
+    """Vérifier que toutes les features du modèle sont présentes dans les colonnes"""
+    missing = [name for name in feature_names if name not in set(columns)]
+    if missing:
+        raise ValueError(f"Colonnes manquantes pour le modèle: {', '.join(missing)}")
+
+
+# Fonction pour lire un fichier par morceaux
+def iter_input_chunks(source, file_format, chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    """Lire un fichier CSV/Parquet par morceaux, en renvoyant (morceau, progression 0-1)
+
+    `columns` limite la lecture aux colonnes utiles (toutes par défaut).
+    """
+    if file_format == 'csv':
+        total_size = _source_size(source)
+        reader = pd.read_csv(source, chunksize=chunk_size, usecols=columns)
+        for chunk in reader:
+            position = source.tell() if hasattr(source, 'tell') and total_size else 0
+            progress = min(1.0, position / total_size) if total_size else 0.0
+            yield chunk, progress
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        total_rows = parquet_file.metadata.num_rows
+        rows_done = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            rows_done += batch.num_rows
+            yield batch.to_pandas(), (rows_done / total_rows if total_rows else 1.0)
+    else:
+        raise ValueError(f"Format inconnu: {file_format}")
+
+
+def _source_size(source):
+    """Taille en octets d'un chemin ou d'un objet fichier (0 si inconnue)"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if hasattr(source, 'seek') and hasattr(source, 'tell'):
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    return 0
+
+
+# Fonction pour convertir les features d'un morceau en nombres
+def numeric_features(chunk, feature_names):
+    """Renvoyer (features numériques, motifs de rejet par ligne)
+
+    Une cellule vide reste une valeur manquante, traitée comme telle par le modèle. Une cellule
+    non vide illisible (« 1,200 », « N/A », faute de frappe) rend la ligne invalide : elle n'est
+    pas prédite et son motif liste les cellules en cause.
+    """
+    raw = chunk[list(feature_names)]
+    features = raw.apply(pd.to_numeric, errors='coerce')
+    coerced = features.isna() & raw.notna()
+    errors = pd.Series('', index=chunk.index, dtype=object)
+    if coerced.to_numpy().any():
+        for position in np.flatnonzero(coerced.to_numpy().any(axis=1)):
+            cells = [f"{name}={raw.iat[position, column]!r}"
+                     for column, name in enumerate(feature_names) if coerced.iat[position, column]]
+            errors.iat[position] = "valeurs non numériques: " + ', '.join(cells)
+    return features, errors
+
+
+# Fonction pour prédire un morceau en un seul appel vectorisé
+def score_chunk(model, features):
+    """Prédire les prix d'un morceau (features numériques) avec un seul appel model.predict"""
+    predictions = model.predict(features)
+    return np.maximum(predictions, 0)  # Assurer que les prix sont positifs
+
+
+# Fonction pour prédire un morceau avec ses intervalles de prédiction
+def score_chunk_with_intervals(interval_estimator, features):
+    """Renvoyer (prédictions, bornes basses, bornes hautes) d'un morceau en une passe sur les arbres"""
+    return interval_estimator.predict_interval(features)
+
+
+# Fonction pour expliquer un morceau feature par feature
+def explain_chunk(contribution_explainer, features):
+    """Renvoyer (noms de colonnes, matrice des contributions) d'un morceau en une passe sur les arbres"""
+    columns = [CONTRIBUTION_PREFIX + name for name in contribution_explainer.feature_names]
+    return columns, contribution_explainer.explain(features)
+
+
+# Fonction pour compléter un morceau avec ses prédictions et les motifs de rejet
+def annotate_chunk(chunk, feature_names, model=None, interval_estimator=None, contribution_explainer=None):
+    """Ajouter les colonnes de résultat à `chunk`; renvoie le nombre de lignes rejetées"""
+    features, errors = numeric_features(chunk, feature_names)
+    if interval_estimator is not None:
+        results = dict(zip((PREDICTION_COLUMN, LOWER_COLUMN, UPPER_COLUMN),
+                           score_chunk_with_intervals(interval_estimator, features)))
+    else:
+        results = {PREDICTION_COLUMN: score_chunk(model, features)}
+    if contribution_explainer is not None:
+        columns, contributions = explain_chunk(contribution_explainer, features)
+        results.update(zip(columns, np.asarray(contributions).T))
+    rejected = (errors != '').to_numpy()
+    for name, values in results.items():
+        values = np.array(values, dtype=float)
+        values[rejected] = np.nan  # aucun prix plausible mais faux pour une ligne illisible
+        chunk[name] = values
+    chunk[ERROR_COLUMN] = errors
+    return int(rejected.sum())
+
+
+# Fonction pour scorer un fichier complet en flux
+def score_file(model, feature_names, source, file_format, output, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+               interval_estimator=None, contribution_explainer=None):
+    """Scorer un fichier morceau par morceau et écrire les résultats en CSV dans `output`
+
+    La mémoire reste bornée par la taille d'un morceau: chaque morceau est lu,
+    prédit puis écrit avant de passer au suivant. Avec `interval_estimator`
+    (prediction_intervals.IntervalEstimator), les bornes de l'intervalle sont
+    ajoutées en colonnes; avec `contribution_explainer`
+    (feature_contributions.ContributionExplainer), une colonne de contribution
+    par feature. Les lignes aux cellules illisibles sont écrites sans prix, avec leur motif
+    dans ERROR_COLUMN. Renvoie (lignes écrites, lignes rejetées).
+    """
+    rows_scored = 0
+    rows_rejected = 0
+    for index, (chunk, progress) in enumerate(iter_input_chunks(source, file_format, chunk_size)):
+        if index == 0:
+            check_columns(chunk.columns, feature_names)
+        rows_rejected += annotate_chunk(chunk, feature_names, model, interval_estimator, contribution_explainer)
+        chunk.to_csv(output, header=(index == 0), index=False)
+        rows_scored += len(chunk)
+        if progress_callback:
+            progress_callback(progress, rows_scored)
+    return rows_scored, rows_rejected
+
+
+# Fonction pour découper un CSV en blocs de lignes sans l'analyser
+def iter_csv_blocks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Renvoyer (en-tête, bloc de `chunk_size` lignes) en octets bruts, à partir d'un flux binaire"""
+    header = _complete_record(stream, stream.readline())
+    if not header.strip():
+        raise ValueError("Fichier CSV vide")
+    if not header.endswith(b'\n'):
+        header += b'\n'
+    while True:
+        lines = list(itertools.islice(stream, chunk_size))
+        if not lines:
+            return
+        yield header, _complete_record(stream, b''.join(lines))
+
+
+def _complete_record(stream, block):
+    """Prolonger le bloc tant qu'un champ entre guillemets (saut de ligne inclus) reste ouvert"""
+    while block.count(b'"') % 2:
+        line = stream.readline()
+        if not line:
+            break
+        block += line
+    return block
+
+
+# État de chaque processus du pool : le modèle est chargé une seule fois par l'initialisateur
+_worker_state = {}
+
+
+def _init_worker(model_path, feature_info_path, artifact_path):
+    from prediction_server import load_artifacts
+
+    model, feature_info = load_artifacts(model_path, feature_info_path, artifact_path)
+    if hasattr(model, 'get_booster'):
+        model.get_booster().set_param('nthread', 1)  # un cœur par processus : le parallélisme vient du pool
+    _worker_state.update(model=model, feature_names=list(feature_info['feature_names']))
+
+
+def _score_csv_block(header, block, first):
+    return _score_frame(pd.read_csv(io.BytesIO(header + block)), first)
+
+
+def _score_frame(chunk, first):
+    """Prédire un morceau et le renvoyer formaté en CSV (en-tête pour le premier seulement)"""
+    feature_names = _worker_state['feature_names']
+    check_columns(chunk.columns, feature_names)
+    rejected = annotate_chunk(chunk, feature_names, _worker_state['model'])
+    return len(chunk), rejected, chunk.to_csv(header=first, index=False).encode('utf-8')
+
+
+# Fonction pour scorer un fichier sur un pool de processus, résultats dans l'ordre d'entrée
+def score_file_parallel(source, file_format, output, model_path=None, feature_info_path=None, artifact_path=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, workers=None, progress_callback=None):
+    """Scorer un flux binaire CSV/Parquet avec un modèle par processus et écrire le CSV dans `output`
+
+    Au plus deux morceaux par processus sont en cours à la fois : la mémoire reste bornée
+    quelle que soit la taille du fichier. Renvoie (lignes écrites, lignes rejetées).
+    """
+    from house_model import FEATURE_INFO_PATH, MODEL_PATH
+
+    workers = workers or os.cpu_count() or 1
+    initargs = (model_path or MODEL_PATH, feature_info_path or FEATURE_INFO_PATH, artifact_path)
+    if file_format == 'csv':
+        tasks = ((_score_csv_block, header, block) for header, block in iter_csv_blocks(source, chunk_size))
+    else:
+        tasks = ((_score_frame, chunk) for chunk, _ in iter_input_chunks(source, file_format, chunk_size))
+
+    rows_scored = 0
+    rows_rejected = 0
+    pending = deque()
+
+    def write_oldest():
+        nonlocal rows_scored, rows_rejected
+        rows, rejected, data = pending.popleft().result()
+        output.write(data)
+        rows_scored += rows
+        rows_rejected += rejected
+        if progress_callback:
+            progress_callback(rows_scored)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        try:
+            for index, (function, *arguments) in enumerate(tasks):
+                pending.append(pool.submit(function, *arguments, index == 0))
+                if len(pending) >= 2 * workers:
+                    write_oldest()
+            while pending:
+                write_oldest()
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return rows_scored, rows_rejected
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scorer un portefeuille CSV/Parquet sur tous les cœurs")
+    parser.add_argument('input', help="Fichier CSV/Parquet, ou - pour l'entrée standard")
+    parser.add_argument('--output', default='-', help="Fichier CSV des résultats (- : sortie standard)")
+    parser.add_argument('--format', choices=SUPPORTED_FORMATS, help="Format de l'entrée (déduit de l'extension)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Lignes par morceau")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus du pool")
+    parser.add_argument('--model', help="Chemin du modèle PKL (xgb_model.pkl par défaut)")
+    parser.add_argument('--feature-info', help="Chemin des métadonnées PKL (feature_info.pkl par défaut)")
+    parser.add_argument('--artifact', help="Répertoire d'artefact sans pickle (prioritaire sur --model)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.chunk_size < 1 or args.workers < 1:
+        raise SystemExit("--chunk-size et --workers doivent être positifs")
+    try:
+        file_format = args.format or ('csv' if args.input == '-' else detect_format(args.input))
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+    try:
+        if args.input == '-':
+            source = sys.stdin.buffer
+            if file_format == 'parquet':
+                source = io.BytesIO(source.read())  # Parquet se lit depuis la fin : flux rembobinable requis
+        else:
+            source = open(args.input, 'rb')
+    except OSError as e:
+        raise SystemExit(f"❌ {e}")
+    # Fichier de sortie écrit à côté puis renommé : jamais de résultat partiel sous le nom final
+    try:
+        output = sys.stdout.buffer if args.output == '-' else open(f'{args.output}.tmp', 'wb')
+    except OSError as e:
+        if source is not sys.stdin.buffer:
+            source.close()
+        raise SystemExit(f"❌ {e}")
+
+    started = time.perf_counter()
+    try:
+        rows, rejected = score_file_parallel(source, file_format, output, args.model, args.feature_info, args.artifact,
+                                   args.chunk_size, args.workers)
+    except BaseException as e:
+        if output is not sys.stdout.buffer:
+            output.close()
+            os.remove(output.name)
+        if isinstance(e, (ValueError, OSError, BrokenProcessPool)):
+            raise SystemExit(f"❌ {e}")
+        raise
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    if output is sys.stdout.buffer:
+        output.flush()
+    else:
+        output.close()
+        os.replace(output.name, args.output)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {rows:,} lignes scorées en {elapsed:.1f}s • {rows / elapsed if elapsed else 0:,.0f} lignes/s "
+          f"• {args.workers} processus", file=sys.stderr)
+    if rejected:
+        print(f"⚠️ {rejected:,} lignes non scorées (valeurs non numériques), motif dans la colonne {ERROR_COLUMN}",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
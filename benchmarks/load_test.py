@@ -0,0 +1,372 @@
+# benchmarks/load_test.py
+# Test de charge : sessions Streamlit simultanées dans un seul processus, sans réseau
+#
+# Lancement (depuis la racine du dépôt) :
+#   python benchmarks/load_test.py --output load_report.json                 # paliers 1, 2, 4, 8... jusqu'à saturation
+#   python benchmarks/load_test.py --levels 1,4,16 --duration 30 --think-time 2 --p95-budget-ms 500
+#
+# Chaque session est un thread qui pilote main() avec le harnais AppTest de Streamlit, comme
+# une session du serveur : même processus, mêmes caches partagés (modèle, index, figures).
+# Parcours rejoué par chaque session, avec un temps de réflexion exponentiel entre deux actions :
+# chargement, mode avancé, unités, devise, puis soumissions du formulaire avec des valeurs tirées
+# au hasard. Pour chaque palier : latences de réexécution p50/p95/p99 (par action et au total),
+# débit, CPU (cœurs occupés, ms par réexécution) et mémoire résidente par session.
+# La saturation est le premier palier où le p95 dépasse le budget, où des erreurs apparaissent,
+# ou où le débit progresse de moins de 10 % de ce qu'apporteraient les sessions supplémentaires.
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'streamlit_app.py')
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+
+# Libellés des widgets pilotés (streamlit_app.py)
+ADVANCED_LABEL = "🔬 Mode Avancé"
+UNITS_LABEL = "🌍 Système d'unités"
+CURRENCY_LABEL = "💰 Devise"
+SUBMIT_PREFIX = "🔮"
+SIDEBAR_LABELS = (UNITS_LABEL, CURRENCY_LABEL)
+
+# Options forcées pour toutes les exécutions AppTest (journal : avertissements répétés à chaque session)
+TEST_CONFIG = {'global.appTest': True, 'logger.level': 'error'}
+
+# Progression minimale du débit, rapportée à la progression proportionnelle au nombre de sessions
+MIN_THROUGHPUT_GAIN = 0.1
+
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+
+# Fonction pour lire la mémoire résidente actuelle
+def current_rss_mb():
+    """RSS courant (Linux, /proc), sinon pic de RSS du processus (Mo)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Fonction pour partager un runtime de test entre les sessions simultanées
+@contextlib.contextmanager
+def shared_test_runtime():
+    """Rendre AppTest utilisable depuis plusieurs threads à la fois
+
+    AppTest installe un Runtime factice global au début de chaque exécution et le retire à
+    la fin : une session qui se termine le retirerait sous les autres. Le dernier Runtime
+    factice installé reste donc visible tant que le test tourne, et l'option de configuration
+    global.appTest est forcée une fois pour toutes plutôt qu'à chaque exécution (avec un niveau de
+    journal qui masque les avertissements de Streamlit répétés à chaque session). Comme sur le
+    serveur, le bytecode du script est compilé une seule fois (ScriptCache partagé) au lieu
+    d'une compilation par exécution.
+    """
+    from unittest.mock import patch
+
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    original_instance = Runtime.__dict__['instance']
+    original_exists = Runtime.__dict__['exists']
+    last_runtime = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime[:] = [cls._instance]
+        if not last_runtime:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last_runtime[0]
+
+    def exists(cls):
+        return cls._instance is not None or bool(last_runtime)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    script_cache = ScriptCache()
+    try:
+        with patch.object(config, 'get_option', new=build_mock_config_get_option(TEST_CONFIG)), \
+                patch.object(app_test, 'ScriptCache', new=lambda: script_cache), \
+                patch.object(local_script_runner, 'ScriptCache', new=lambda: script_cache):
+            yield
+    finally:
+        Runtime.instance = original_instance
+        Runtime.exists = original_exists
+
+
+class Session:
+    """Une session simulée : un AppTest, son parcours et ses mesures"""
+
+    def __init__(self, session_id, seed, think_time, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.rng = np.random.default_rng(seed)
+        self.think_time = think_time
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.timings = []  # (action, secondes)
+        self.errors = []
+
+    def rerun(self, action, prepare=None):
+        started = time.perf_counter()
+        try:
+            if prepare is not None:
+                prepare()
+            self.app.run()
+        except Exception as e:  # délai dépassé, widget introuvable...
+            self.errors.append(f"{action}: {type(e).__name__}: {e}")
+            return
+        self.timings.append((action, time.perf_counter() - started))
+        if self.app.exception:
+            self.errors.append(f"{action}: {self.app.exception[0].value}")
+
+    def think(self, deadline):
+        pause = self.rng.exponential(self.think_time) if self.think_time > 0 else 0.0
+        time.sleep(max(0.0, min(pause, deadline - time.monotonic())))
+
+    def run(self, deadline):
+        """Rejouer le parcours jusqu'à l'échéance (monotonic)"""
+        self.rerun('load')
+        steps = [
+            ('advanced_mode', self.toggle_advanced_mode),
+            ('submit', self.submit_form),
+            ('units', lambda: self.switch(UNITS_LABEL)),
+            ('submit', self.submit_form),
+            ('currency', lambda: self.switch(CURRENCY_LABEL)),
+            ('submit', self.submit_form)
+        ]
+        position = 0
+        while time.monotonic() < deadline and len(self.errors) < 10:
+            self.think(deadline)
+            if time.monotonic() >= deadline:
+                break
+            action, prepare = steps[position % len(steps)]
+            self.rerun(action, prepare)
+            position += 1
+
+    # Actions (préparation des widgets avant la réexécution)
+
+    def widget(self, kind, label):
+        matches = [w for w in getattr(self.app, kind) if w.label == label or w.label.startswith(label)]
+        if not matches:
+            raise LookupError(f"Widget introuvable: {label}")
+        return matches[0]
+
+    def toggle_advanced_mode(self):
+        checkbox = self.widget('checkbox', ADVANCED_LABEL)
+        checkbox.set_value(not checkbox.value)
+
+    def switch(self, label):
+        selectbox = self.widget('selectbox', label)
+        selectbox.select_index((selectbox.index + 1) % len(selectbox.options))
+
+    def submit_form(self):
+        """Tirer de nouvelles valeurs pour les champs du formulaire puis le soumettre"""
+        for selectbox in self.app.selectbox:
+            if selectbox.label not in SIDEBAR_LABELS:
+                selectbox.select_index(int(self.rng.integers(len(selectbox.options))))
+        for number_input in self.app.number_input:
+            low, high, step = number_input.proto.min, number_input.proto.max, number_input.proto.step or 1
+            value = low + step * int(self.rng.integers(int((high - low) / step) + 1))
+            number_input.set_value(int(value) if isinstance(number_input.value, int) else float(value))
+        self.widget('button', SUBMIT_PREFIX).click()
+
+
+# Fonction pour résumer des latences
+def latency_summary(seconds):
+    if not len(seconds):
+        return {'count': 0}
+    seconds = np.asarray(seconds) * 1000
+    return {
+        'count': int(len(seconds)),
+        'p50_ms': float(np.percentile(seconds, 50)),
+        'p95_ms': float(np.percentile(seconds, 95)),
+        'p99_ms': float(np.percentile(seconds, 99)),
+        'max_ms': float(seconds.max()),
+        'mean_ms': float(seconds.mean())
+    }
+
+
+# Fonction pour exécuter un palier de concurrence
+def run_level(sessions_count, duration, think_time, seed, timeout):
+    """Lancer `sessions_count` sessions simultanées pendant `duration` secondes"""
+    gc.collect()
+    rss_before = current_rss_mb()
+    sessions = [Session(i, seed + i, think_time, timeout) for i in range(sessions_count)]
+    started_barrier = threading.Barrier(sessions_count + 1)
+    finished_barrier = threading.Barrier(sessions_count + 1)
+    release = threading.Event()
+    deadline = [0.0]
+
+    def drive(session):
+        started_barrier.wait()
+        try:
+            session.run(deadline[0])
+        finally:
+            finished_barrier.wait()
+            release.wait()  # garder la session (et son état) en vie jusqu'à la mesure mémoire
+
+    threads = [threading.Thread(target=drive, args=(session,), name=f'session-{session.session_id}', daemon=True)
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.monotonic() + duration
+    cpu_started, wall_started = cpu_seconds(), time.perf_counter()
+    started_barrier.wait()
+    finished_barrier.wait()
+    wall = time.perf_counter() - wall_started
+    cpu = cpu_seconds() - cpu_started
+    rss_after = current_rss_mb()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    timings = [(action, seconds) for session in sessions for action, seconds in session.timings]
+    actions = sorted({action for action, _ in timings})
+    errors = [error for session in sessions for error in session.errors]
+    reruns = len(timings)
+    return {
+        'sessions': sessions_count,
+        'wall_s': wall,
+        'reruns': reruns,
+        'throughput_reruns_per_s': reruns / wall if wall else 0.0,
+        'latency': latency_summary([seconds for _, seconds in timings]),
+        'latency_by_action': {action: latency_summary([s for a, s in timings if a == action]) for action in actions},
+        'cpu_cores_busy': cpu / wall if wall else 0.0,
+        'cpu_ms_per_rerun': cpu * 1000 / reruns if reruns else None,
+        'cpu_s_per_session': cpu / sessions_count,
+        'rss_mb': rss_after,
+        'rss_mb_per_session': (rss_after - rss_before) / sessions_count,
+        'errors': len(errors),
+        'error_samples': errors[:5]
+    }
+
+
+# Fonction pour repérer le palier de saturation
+def saturation_reason(level, previous, p95_budget_ms):
+    """Raison pour laquelle ce palier est saturé, ou None"""
+    if level['errors']:
+        return f"{level['errors']} erreurs"
+    p95 = level['latency'].get('p95_ms')
+    if p95 is not None and p95 > p95_budget_ms:
+        return f"p95 {p95:.0f} ms > budget {p95_budget_ms:.0f} ms"
+    if previous is not None and previous['throughput_reruns_per_s'] > 0:
+        expected_gain = level['sessions'] / previous['sessions'] - 1
+        gain = level['throughput_reruns_per_s'] / previous['throughput_reruns_per_s'] - 1
+        if gain < MIN_THROUGHPUT_GAIN * expected_gain:
+            return f"débit {gain:+.0%} pour +{expected_gain:.0%} de sessions"
+    return None
+
+
+# Fonction pour exécuter la montée en charge
+def run_load_test(levels, duration, think_time, p95_budget_ms, seed=42, timeout=120, stop_at_saturation=True,
+                  log=print):
+    os.environ['MODEL_RELOAD_INTERVAL'] = '0'  # pas de fil de surveillance pendant la mesure
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {'duration_s': duration, 'think_time_s': think_time, 'p95_budget_ms': p95_budget_ms,
+                     'seed': seed},
+        'levels': [],
+        'capacity_sessions': None,
+        'saturation': None
+    }
+    with tempfile.TemporaryDirectory() as state_dir, shared_test_runtime():
+        # Historique des prédictions et journaux écrits hors du dépôt
+        os.environ.setdefault('HOUSE_HISTORY_DB', os.path.join(state_dir, 'prediction_history.db'))
+        os.environ.setdefault('SHADOW_LOG', os.path.join(state_dir, 'shadow_log.jsonl'))
+
+        # Session de chauffe : chargement du modèle et caches partagés hors mesure
+        warmup = Session(-1, seed, 0.0, timeout)
+        warmup.run(time.monotonic() + 1.0)
+        if warmup.errors:
+            raise SystemExit(f"❌ Session de chauffe en erreur : {warmup.errors[0]}")
+        report['rss_mb_after_warmup'] = current_rss_mb()
+
+        previous = None
+        for sessions_count in levels:
+            level = run_level(sessions_count, duration, think_time, seed + 1000 * sessions_count, timeout)
+            reason = saturation_reason(level, previous, p95_budget_ms)
+            level['saturated'] = reason
+            report['levels'].append(level)
+            latency = level['latency']
+            log(f"{sessions_count:>4} sessions • {level['throughput_reruns_per_s']:7.2f} réexécutions/s • "
+                f"p50/p95/p99 {latency.get('p50_ms', 0):7.0f}/{latency.get('p95_ms', 0):7.0f}/"
+                f"{latency.get('p99_ms', 0):7.0f} ms • CPU {level['cpu_cores_busy']:.2f} cœur "
+                f"({level['cpu_ms_per_rerun'] or 0:.0f} ms/réexécution) • "
+                f"{level['rss_mb_per_session']:+.1f} Mo/session • {level['errors']} erreurs"
+                + (f" • ⚠️ saturé : {reason}" if reason else ""))
+            if reason:
+                report['saturation'] = {'sessions': sessions_count, 'reason': reason}
+                if stop_at_saturation:
+                    break
+            elif report['saturation'] is None:
+                report['capacity_sessions'] = sessions_count
+            previous = level
+    return report
+
+
+def parse_levels(text):
+    levels = sorted({int(value) for value in text.split(',') if value.strip()})
+    if not levels or levels[0] < 1:
+        raise argparse.ArgumentTypeError("Paliers attendus : entiers positifs séparés par des virgules")
+    return levels
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge des sessions Streamlit simultanées")
+    parser.add_argument('--levels', type=parse_levels, default=list(DEFAULT_LEVELS),
+                        help="Nombres de sessions simultanées testés (ex. 1,2,4,8)")
+    parser.add_argument('--duration', type=float, default=20.0, help="Durée de chaque palier (s)")
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help="Temps de réflexion moyen entre deux actions d'une session (s, loi exponentielle)")
+    parser.add_argument('--p95-budget-ms', type=float, default=1000.0, help="Latence p95 de réexécution tolérée")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Délai maximal d'une réexécution (s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--all-levels', action='store_true', help="Continuer après le palier de saturation")
+    parser.add_argument('--output', default='load_report.json', help="Fichier JSON du rapport")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_load_test(args.levels, args.duration, args.think_time, args.p95_budget_ms, args.seed,
+                           args.timeout, stop_at_saturation=not args.all_levels)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if report['capacity_sessions'] is not None:
+        print(f"✅ Capacité : {report['capacity_sessions']} sessions simultanées dans le budget")
+    else:
+        print("❌ Aucun palier dans le budget")
+    if report['saturation'] is not None:
+        print(f"Saturation à {report['saturation']['sessions']} sessions ({report['saturation']['reason']})")
+    print(f"Rapport écrit dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
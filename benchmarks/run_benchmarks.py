@@ -0,0 +1,270 @@
+# benchmarks/run_benchmarks.py
+# Benchmark reproductible de chaque étape du chemin de prédiction et de rendu
+#
+# Lancement (depuis la racine du dépôt) :
+#   python benchmarks/run_benchmarks.py --output bench_results.json
+#   python benchmarks/run_benchmarks.py --save-baseline          # enregistrer la référence
+#   python benchmarks/run_benchmarks.py --fail-on-regression     # code 1 si régression
+#
+# Chaque étape rapporte p50/p95/p99 (ms), le débit (lignes/s) et le pic de RSS du processus
+# à la fin de l'étape. Les graines sont fixées et chaque étape est précédée d'un appel à blanc.
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+BATCH_SIZES = (1, 100, 10_000, 1_000_000)
+
+# Les fichiers du modèle sont référencés relativement au répertoire de l'application
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+# Fonction pour lire le pic de mémoire résidente
+def peak_rss_mb():
+    """Pic de RSS du processus depuis son démarrage (Mo)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Fonction pour mesurer une étape
+def measure(fn, repeat, rows=1, setup=None, warmup=True):
+    """Chronométrer `fn` `repeat` fois et résumer les latences"""
+    if warmup:
+        if setup:
+            setup()
+        fn()
+    gc.collect()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return {
+        'repeat': repeat,
+        'rows_per_call': rows,
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p95_ms': float(np.percentile(timings, 95) * 1000),
+        'p99_ms': float(np.percentile(timings, 99) * 1000),
+        'mean_ms': float(timings.mean() * 1000),
+        'throughput_rows_per_s': float(rows / timings.mean()),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+# Fonction pour exécuter toutes les étapes
+def run_benchmarks(repeat=50, batch_sizes=BATCH_SIZES):
+    """Mesurer chaque étape de l'application et renvoyer le rapport"""
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    # Pas de fil de surveillance : chaque chargement à froid crée un nouveau détenteur du modèle
+    os.environ['MODEL_RELOAD_INTERVAL'] = '0'
+    import streamlit_app as app
+    from house_model import prepare_features_for_your_model
+    from tree_evaluator import TreeEnsemble, sample_features
+
+    stages = {}
+
+    # Chargement des modèles : à froid (détenteur recréé, prédiction de contrôle comprise) puis à chaud
+    stages['load_real_models_cold'] = measure(
+        app.load_real_models, max(3, repeat // 10), setup=app.get_model_holder.clear, warmup=False
+    )
+    model, feature_info, models_loaded, version = app.load_real_models()
+    if not models_loaded:
+        raise RuntimeError("Modèles non disponibles : impossible de mesurer la prédiction")
+    stages['load_real_models_warm'] = measure(app.load_real_models, repeat)
+
+    user_inputs = {
+        'overall_qual': 7, 'gr_liv_area': 1500, 'total_bsmt_sf': 1000, 'garage_area': 500,
+        'year_built': 2000, 'full_bath': 2, 'tot_rms_abv_grd': 7, 'fireplaces': 1, 'garage_cars': 2
+    }
+    feature_names = feature_info['feature_names']
+    stages['prepare_features_for_your_model'] = measure(
+        lambda: prepare_features_for_your_model(user_inputs, feature_names), repeat * 10
+    )
+    binder = version.binder
+    stages['feature_binder_row'] = measure(lambda: binder.row(user_inputs), repeat * 10)
+    predictor = app.get_native_evaluator(model, feature_info, version.key)
+    stages['single_row_dataframe_path'] = measure(
+        lambda: app.make_prediction_with_your_model(
+            predictor, prepare_features_for_your_model(user_inputs, feature_names)), repeat * 10
+    )
+    stages['single_row_bound_path'] = measure(
+        lambda: app.make_prediction_with_your_model(predictor, binder.row(user_inputs)), repeat * 10
+    )
+
+    # Même chemin avec un modèle fantôme (le modèle livré) noté dans un processus séparé : seul le dépôt est sur le chemin
+    import tempfile
+    from house_model import MODEL_PATH
+    from model_registry import ShadowScorer
+    with tempfile.TemporaryDirectory() as log_dir:
+        shadow_scorer = ShadowScorer(f'shadow={MODEL_PATH}', os.path.join(log_dir, 'shadow_log.jsonl'))
+        shadow_scorer.wait_loaded()
+
+        def shadowed_prediction():
+            started = time.perf_counter()
+            features_row = binder.row(user_inputs)
+            prediction = app.make_prediction_with_your_model(predictor, features_row)
+            shadow_scorer.submit(binder.as_mapping(features_row), version.key, prediction, time.perf_counter() - started)
+
+        stages['single_row_shadowed_path'] = measure(shadowed_prediction, repeat * 10)
+        shadow_scorer.close()
+
+        # Dépôt dans l'historique des prédictions (écriture SQLite différée, hors mesure)
+        from prediction_history import PredictionHistory
+        history = PredictionHistory(os.path.join(log_dir, 'prediction_history.db'))
+        stages['history_record'] = measure(
+            lambda: history.record(user_inputs, 200_000.0, version.label, 0.0001, 'benchmark'), repeat * 10
+        )
+        history.close()
+
+    # Mise à jour du moniteur de dérive pour une prédiction servie
+    from drift_monitor import DriftMonitor
+    drift_monitor = DriftMonitor.for_model(feature_info)
+    features_row = binder.row(user_inputs)
+    stages['drift_update_1'] = measure(lambda: drift_monitor.update(features_row, [200_000.0]), repeat * 10)
+
+    # Prédiction par taille de lot (moins de répétitions pour les gros lots)
+    for batch_size in batch_sizes:
+        features_df = sample_features(feature_info, batch_size, seed=42)
+        batch_repeat = max(3, min(repeat, int(repeat * 1000 / batch_size)))
+        stages[f'make_prediction_with_your_model_{batch_size}'] = measure(
+            lambda: app.make_prediction_with_your_model(model, features_df), batch_repeat, rows=batch_size
+        )
+        del features_df
+
+    # Lot de 2 000 lignes (taille typique d'un appel /predict/batch) : parcours natif des tableaux,
+    # ensemble routé (booster au-delà de BOOSTER_MIN_ROWS) et modèle d'origine
+    if isinstance(predictor, TreeEnsemble):
+        batch_matrix = sample_features(feature_info, 2000, seed=42).to_numpy()
+        stages['native_batch_2000'] = measure(lambda: predictor.predict_native(batch_matrix), repeat, rows=2000)
+        stages['ensemble_batch_2000'] = measure(lambda: predictor.predict(batch_matrix), repeat, rows=2000)
+        stages['model_batch_2000'] = measure(lambda: model.predict(batch_matrix), repeat, rows=2000)
+
+    # Intervalle de prédiction (une passe sur tous les arbres) : surcoût par rapport à la ligne liée
+    interval_estimator = app.get_interval_estimator(model, feature_info, version.key)
+    if interval_estimator is not None:
+        stages['prediction_interval_1'] = measure(
+            lambda: interval_estimator.predict_interval(binder.row(user_inputs)), repeat * 10
+        )
+
+    # Contributions des features d'une ligne (écarts par nœud précalculés au chargement)
+    explainer = app.get_contribution_explainer(model, feature_info, version.key)
+    if explainer is not None:
+        stages['feature_contributions_1'] = measure(lambda: explainer.explain(binder.row(user_inputs)), repeat * 10)
+
+    # Balayage « et si » 100 x 10 autour de la propriété, en un seul appel au modèle
+    from what_if import run_sweep
+    stages['what_if_sweep_100x10'] = measure(
+        lambda: run_sweep(model, binder, user_inputs, 'gr_liv_area', 'overall_qual', points=100), repeat, rows=1000
+    )
+
+    # Ventes comparables : k plus proches dans l'index prébâti (si un fichier de ventes est disponible)
+    from comparables import SALES_DATA_PATH
+    comparables_index = app.get_comparables_index(os.environ.get('HOUSE_SALES_DATA', SALES_DATA_PATH), feature_info,
+                                                  version.key)
+    if comparables_index is not None:
+        stages['comparables_query_5'] = measure(lambda: comparables_index.query(binder.row(user_inputs), 5), repeat * 10)
+
+    # Données de démonstration : à froid (cache_data vidé) puis à chaud
+    stages['create_demo_data_cold'] = measure(
+        app.create_demo_data, max(3, repeat // 5), setup=app.create_demo_data.clear, warmup=False
+    )
+    stages['create_demo_data_warm'] = measure(app.create_demo_data, repeat)
+
+    surface_data, quality_data, evolution_data = app.create_demo_data()
+    stages['build_base_charts_cold'] = measure(
+        app.build_base_charts, max(3, repeat // 10), setup=app.build_base_charts.clear, warmup=False
+    )
+    stages['create_interactive_charts_overview'] = measure(
+        lambda: app.create_interactive_charts(surface_data, quality_data, evolution_data), max(5, repeat // 5)
+    )
+    stages['create_interactive_charts_prediction'] = measure(
+        lambda: app.create_interactive_charts(surface_data, quality_data, evolution_data, 195000.0, user_inputs),
+        max(5, repeat // 5)
+    )
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'model': type(model).__name__,
+            'repeat': repeat
+        },
+        'stages': stages
+    }
+
+
+# Fonction pour comparer à la référence
+def compare_to_baseline(report, baseline, tolerance, min_delta_ms=0.1):
+    """Lister les étapes dont le p50 dépasse la référence de plus de `tolerance` (et de `min_delta_ms`)"""
+    regressions = []
+    for name, result in report['stages'].items():
+        reference = baseline.get('stages', {}).get(name)
+        if not reference:
+            continue
+        ratio = result['p50_ms'] / reference['p50_ms'] if reference['p50_ms'] else 1.0
+        result['baseline_p50_ms'] = reference['p50_ms']
+        result['p50_ratio'] = ratio
+        if ratio > 1.0 + tolerance and result['p50_ms'] - reference['p50_ms'] > min_delta_ms:
+            regressions.append((name, reference['p50_ms'], result['p50_ms'], ratio))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du chemin de prédiction et de rendu")
+    parser.add_argument('--output', default='bench_results.json', help="Fichier JSON du rapport")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Fichier JSON de référence")
+    parser.add_argument('--save-baseline', action='store_true', help="Enregistrer ce rapport comme référence")
+    parser.add_argument('--tolerance', type=float, default=0.20, help="Régression tolérée sur le p50 (0.20 = +20%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1, help="Écart absolu minimal pour signaler une régression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Code de sortie 1 en cas de régression")
+    parser.add_argument('--repeat', type=int, default=50, help="Répétitions de base par étape")
+    parser.add_argument('--max-batch', type=int, default=max(BATCH_SIZES), help="Taille de lot maximale mesurée")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args.repeat, [size for size in BATCH_SIZES if size <= args.max_batch])
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance, args.min_delta_ms)
+
+    print(f"{'Étape':<45} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'lignes/s':>14} {'RSS Mo':>8}")
+    for name, result in report['stages'].items():
+        print(f"{name:<45} {result['p50_ms']:10.3f} {result['p95_ms']:10.3f} {result['p99_ms']:10.3f} "
+              f"{result['throughput_rows_per_s']:14,.0f} {result['peak_rss_mb']:8.0f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Référence enregistrée dans {args.baseline}")
+
+    for name, reference, current, ratio in regressions:
+        print(f"❌ Régression {name}: p50 {reference:.3f} ms -> {current:.3f} ms (x{ratio:.2f})")
+    if not regressions and os.path.exists(args.baseline) and not args.save_baseline:
+        print(f"✅ Aucune régression au-delà de {args.tolerance:.0%}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
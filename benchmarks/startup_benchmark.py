@@ -0,0 +1,157 @@
+# benchmarks/startup_benchmark.py
+# Mesure du démarrage à froid : coût d'import par module et temps jusqu'à la première prédiction
+#
+# Lancement (depuis la racine du dépôt) :
+#   python benchmarks/startup_benchmark.py --budget benchmarks/startup_budget.json --output startup_report.json
+#
+# Chaque mesure est faite dans un processus neuf pour refléter le démarrage d'un pod.
+# Le préchauffage des graphiques (fil d'arrière-plan lancé une fois prêt) est désactivé :
+# il n'est pas sur le chemin de la première prédiction et n'entre pas dans les budgets.
+# Le script se termine avec le code 1 si l'un des budgets est dépassé.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'streamlit_app.py')
+DEFAULT_BUDGET = os.path.join(ROOT, 'benchmarks', 'startup_budget.json')
+
+# Modules lourds dont la présence est relevée après la première prédiction
+WATCHED_MODULES = ('matplotlib', 'seaborn', 'plotly', 'plotly.express', 'xgboost', 'pyarrow')
+
+
+# Fonction pour mesurer le coût d'import de chaque module de premier niveau
+def measure_import_costs():
+    """Importer streamlit_app avec -X importtime et renvoyer le coût cumulé par module (secondes)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import streamlit_app'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Import de streamlit_app impossible:\n{result.stderr[-2000:]}")
+
+    # -X importtime affiche les imports imbriqués (indentés) avant le module qui les importe :
+    # on garde les imports directs de streamlit_app avec leur coût cumulé
+    costs = {}
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name.strip() == 'streamlit_app':
+                costs = children
+            children = {}
+    return total, dict(sorted(costs.items(), key=lambda item: item[1], reverse=True))
+
+
+# Fonction exécutée dans le processus enfant : rendu initial puis première prédiction
+def run_first_prediction():
+    """Exécuter l'app avec AppTest, soumettre le formulaire et renvoyer les horodatages"""
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    timings['first_render_at'] = time.time()
+
+    app.button[0].click()
+    app.run()
+    timings['first_prediction_at'] = time.time()
+    timings['prediction_rendered'] = any('prediction-price' in m.value for m in app.markdown)
+    timings['errors'] = [e.value for e in app.error] + [str(e.value) for e in app.exception]
+    timings['loaded_modules'] = [name for name in WATCHED_MODULES if name in sys.modules]
+    return timings
+
+
+# Fonction pour mesurer le temps jusqu'à la première prédiction dans un processus neuf
+def measure_first_prediction():
+    """Lancer un processus enfant et mesurer depuis son démarrage"""
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, 'HOUSE_CHART_WARMUP': '0'}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Exécution de l'app impossible:\n{result.stderr[-2000:]}")
+    child = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'first_render_seconds': child['first_render_at'] - started,
+        'first_prediction_seconds': child['first_prediction_at'] - started,
+        'prediction_rendered': child['prediction_rendered'],
+        'errors': child['errors'],
+        'loaded_modules': child['loaded_modules']
+    }
+
+
+# Fonction pour comparer le rapport au budget
+def check_budget(report, budget):
+    """Renvoyer la liste des dépassements de budget"""
+    failures = []
+    for key in ('app_import_seconds', 'first_render_seconds', 'first_prediction_seconds'):
+        if key in budget and report[key] > budget[key]:
+            failures.append(f"{key}: {report[key]:.2f}s > {budget[key]:.2f}s")
+    limit = budget.get('module_import_seconds')
+    if limit is not None:
+        for name, cost in report['module_import_costs'].items():
+            if cost > limit:
+                failures.append(f"import {name}: {cost:.2f}s > {limit:.2f}s")
+    for name in budget.get('forbidden_modules_at_first_prediction', []):
+        if name in report['loaded_modules']:
+            failures.append(f"module {name} importé avant la première prédiction")
+    if not report['prediction_rendered']:
+        failures.append(f"aucune prédiction affichée ({'; '.join(report['errors']) or 'sans erreur'})")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de démarrage à froid de l'application")
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help="Fichier JSON des budgets")
+    parser.add_argument('--output', help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument('--top', type=int, default=10, help="Nombre de modules affichés")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_first_prediction()))
+        return 0
+
+    app_import, module_costs = measure_import_costs()
+    report = {'app_import_seconds': app_import, 'module_import_costs': module_costs}
+    report.update(measure_first_prediction())
+
+    print(f"Import streamlit_app : {app_import:.2f}s")
+    for name, cost in list(module_costs.items())[:args.top]:
+        print(f"  {name:<30} {cost * 1000:8.1f} ms")
+    print(f"Premier rendu        : {report['first_render_seconds']:.2f}s")
+    print(f"Première prédiction  : {report['first_prediction_seconds']:.2f}s")
+    print(f"Modules chargés      : {', '.join(report['loaded_modules']) or 'aucun'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+    failures = check_budget(report, budget)
+    for failure in failures:
+        print(f"❌ Budget dépassé - {failure}")
+    if not failures:
+        print("✅ Budgets de démarrage respectés")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# comparables.py
+# Recherche des ventes comparables : index KD-tree construit une fois sur les 9 features du modèle
+#
+# Construction (ou reconstruction) de l'index :
+#   python comparables.py --sales train.csv
+#
+# Le fichier de ventes (CSV ou Parquet) doit contenir les features du modèle et SalePrice
+# (colonne Id facultative), par exemple le train.csv du jeu Ames/Kaggle. Les features sont
+# mises à l'échelle [0, 1] avec les bornes d'entraînement de feature_info['feature_ranges'].
+# L'index est enregistré dans comparables_index/ (tableaux .npy sans pickle + manifeste JSON)
+# avec l'empreinte du fichier source : il n'est reconstruit que si les ventes ou les bornes
+# changent. Le KD-tree n'est pas enregistré : il est reconstruit au chargement à partir des
+# features mises à l'échelle (quelques millisecondes pour des dizaines de milliers de ventes).
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import detect_format
+from house_model import FEATURE_INFO_PATH, default_feature_info, load_feature_info
+
+COMPARABLES_DIR = 'comparables_index'
+SALES_DATA_PATH = 'train.csv'
+PRICE_COLUMN = 'SalePrice'
+ID_COLUMN = 'Id'
+DISTANCE_COLUMN = 'Distance'
+DEFAULT_K = 5
+
+MANIFEST_FILE = 'index.json'
+FEATURES_FILE = 'features.npy'
+PRICES_FILE = 'prices.npy'
+IDS_FILE = 'ids.npy'
+
+
+class ComparablesIndex:
+    """Index des plus proches voisins sur les features mises à l'échelle des ventes de référence"""
+
+    def __init__(self, tree, features, prices, ids, feature_names, low, span, fingerprint):
+        self.tree = tree
+        self.features = features
+        self.prices = prices
+        self.ids = ids
+        self.feature_names = list(feature_names)
+        self.low = np.asarray(low, dtype=float)
+        self.span = np.asarray(span, dtype=float)
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.prices)
+
+    # Construction
+
+    @classmethod
+    def build(cls, sales_path, feature_info):
+        """Lire les ventes, mettre les features à l'échelle et construire le KD-tree"""
+        feature_names = list(feature_info['feature_names'])
+        sales = read_sales(sales_path, feature_names)
+        features = sales[feature_names].to_numpy(dtype=float)
+        low, span = scaling_bounds(feature_info, features)
+        tree = build_tree(features, low, span)
+        ids = sales[ID_COLUMN].to_numpy() if ID_COLUMN in sales else np.arange(len(sales))
+        return cls(tree, features, sales[PRICE_COLUMN].to_numpy(dtype=float), ids, feature_names,
+                   low, span, source_fingerprint(sales_path, feature_names, low, span))
+
+    @classmethod
+    def load_or_build(cls, sales_path, feature_info, directory=COMPARABLES_DIR):
+        """Charger l'index enregistré s'il correspond aux ventes et aux bornes, sinon le reconstruire"""
+        feature_names = list(feature_info['feature_names'])
+        try:
+            index = cls.load(directory)
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is not None:
+            low, span = scaling_bounds(feature_info, index.features)
+            if index.fingerprint == source_fingerprint(sales_path, feature_names, low, span):
+                return index
+        index = cls.build(sales_path, feature_info)
+        index.save(directory)
+        return index
+
+    # Persistance
+
+    def save(self, directory=COMPARABLES_DIR):
+        """Écrire l'index dans un répertoire temporaire puis le mettre en place par renommage
+
+        Un lecteur voit l'ancien index complet, le nouveau complet, ou (brièvement) aucun index :
+        jamais un mélange de fichiers des deux.
+        """
+        directory = os.path.normpath(directory)
+        tmp_dir = f'{directory}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            np.save(os.path.join(tmp_dir, FEATURES_FILE), np.asarray(self.features, dtype=float))
+            np.save(os.path.join(tmp_dir, PRICES_FILE), np.asarray(self.prices, dtype=float))
+            np.save(os.path.join(tmp_dir, IDS_FILE), np.asarray(self.ids, dtype=np.int64))
+            manifest = {
+                'feature_names': self.feature_names,
+                'low': self.low.tolist(),
+                'span': self.span.tolist(),
+                'fingerprint': self.fingerprint,
+                'rows': len(self)
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # Un répertoire non vide ne peut pas être remplacé directement : l'ancien est d'abord écarté
+        old_dir = f'{directory}.old-{os.getpid()}'
+        if os.path.isdir(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory=COMPARABLES_DIR):
+        """Relire les tableaux en mémoire mappée (allow_pickle=False) et reconstruire le KD-tree"""
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode='r', allow_pickle=False)
+        features, prices, ids = load(FEATURES_FILE), load(PRICES_FILE), load(IDS_FILE)
+        if not len(features) == len(prices) == len(ids) == manifest['rows']:
+            raise ValueError(f"Index des ventes comparables incohérent dans '{directory}'")
+        low, span = np.asarray(manifest['low'], dtype=float), np.asarray(manifest['span'], dtype=float)
+        return cls(build_tree(features, low, span), features, prices, ids, manifest['feature_names'],
+                   low, span, manifest['fingerprint'])
+
+    # Recherche
+
+    def query(self, vector, k=DEFAULT_K):
+        """Les k ventes les plus proches d'une ligne (ordre de feature_names), triées par distance"""
+        point = (np.asarray(vector, dtype=float).reshape(-1) - self.low) / self.span
+        k = min(k, len(self))
+        distances, positions = self.tree.query(point, k=k)
+        positions = np.atleast_1d(positions)
+        comparables = pd.DataFrame(np.asarray(self.features)[positions], columns=self.feature_names)
+        comparables.insert(0, ID_COLUMN, np.asarray(self.ids)[positions])
+        comparables[PRICE_COLUMN] = np.asarray(self.prices)[positions]
+        comparables[DISTANCE_COLUMN] = np.atleast_1d(distances)
+        return comparables
+
+
+# Fonction pour construire le KD-tree sur les features mises à l'échelle
+def build_tree(features, low, span):
+    from scipy.spatial import cKDTree
+
+    return cKDTree((np.asarray(features, dtype=float) - low) / span)
+
+
+# Fonction pour lire le fichier de ventes
+def read_sales(sales_path, feature_names):
+    """Lire les colonnes utiles des ventes et écarter les lignes incomplètes"""
+    columns = list(feature_names) + [PRICE_COLUMN]
+    if detect_format(sales_path) == 'parquet':
+        sales = pd.read_parquet(sales_path)
+    else:
+        sales = pd.read_csv(sales_path)
+    missing = [name for name in columns if name not in sales.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans les ventes: {', '.join(missing)}")
+    keep = columns + ([ID_COLUMN] if ID_COLUMN in sales.columns else [])
+    sales = sales[keep].apply(pd.to_numeric, errors='coerce').dropna()
+    if sales.empty:
+        raise ValueError("Aucune vente complète dans le fichier de référence")
+    return sales
+
+
+# Fonction pour calculer les bornes de mise à l'échelle
+def scaling_bounds(feature_info, features):
+    """Minimum et étendue de chaque feature (bornes d'entraînement, sinon celles des ventes)"""
+    ranges = feature_info.get('feature_ranges', {})
+    low = np.empty(features.shape[1])
+    high = np.empty(features.shape[1])
+    for position, name in enumerate(feature_info['feature_names']):
+        bounds = ranges.get(name, {})
+        low[position] = bounds.get('min', np.min(features[:, position]))
+        high[position] = bounds.get('max', np.max(features[:, position]))
+    return low, np.where(high > low, high - low, 1.0)
+
+
+# Fonction pour calculer l'empreinte de la source
+def source_fingerprint(sales_path, feature_names, low, span):
+    """Empreinte (taille, date, features, bornes) invalidant l'index quand la source change"""
+    stat = os.stat(sales_path)
+    payload = json.dumps({
+        'path': os.path.abspath(sales_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'feature_names': list(feature_names),
+        'low': [float(v) for v in low],
+        'span': [float(v) for v in span]
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Construire l'index des ventes comparables")
+    parser.add_argument('--sales', default=os.environ.get('HOUSE_SALES_DATA', SALES_DATA_PATH),
+                        help="Fichier de ventes CSV/Parquet (features du modèle + SalePrice)")
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--output', default=COMPARABLES_DIR, help="Répertoire de l'index")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="Voisins renvoyés pour la mesure de latence")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    feature_info = load_feature_info(args.feature_info) or default_feature_info()
+
+    started = time.perf_counter()
+    index = ComparablesIndex.build(args.sales, feature_info)
+    index.save(args.output)
+    print(f"✅ Index de {len(index):,} ventes construit en {time.perf_counter() - started:.2f}s dans {args.output}/")
+
+    started = time.perf_counter()
+    index = ComparablesIndex.load(args.output)
+    print(f"Chargement : {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    point = np.asarray(index.features[len(index) // 2], dtype=float)
+    repeat = 1000
+    started = time.perf_counter()
+    for _ in range(repeat):
+        index.query(point, args.k)
+    print(f"Recherche des {args.k} plus proches : {(time.perf_counter() - started) / repeat * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+# drift_monitor.py
+# Surveillance de la dérive des entrées et des prédictions par rapport à l'entraînement, en mémoire fixe
+#
+# Consultation (états enregistrés par les workers du serveur de prédiction) :
+#   python drift_monitor.py --state-dir drift_state
+#   python drift_monitor.py --data nouvelles_ventes.csv      # dérive des features d'un fichier
+#
+# Pour chaque feature et pour la prédiction, le moniteur tient :
+# - les moments courants (effectif, moyenne, M2 de Welford, min, max), fusionnés par la formule de Chan;
+# - une esquisse à intervalles fixes sur les bornes d'entraînement (plus un intervalle
+#   sous le minimum et un au-dessus du maximum), d'où les quantiles à un intervalle près.
+# La mémoire ne dépend pas du trafic. Deux esquisses construites sur les mêmes bornes se
+# fusionnent par simple addition : chaque worker enregistre la sienne, la vue globale les additionne.
+#
+# La référence vient de feature_info['drift_reference'] (écrite par train_model.py). Pour un
+# modèle plus ancien, seules les bornes (feature_ranges) et les statistiques du prix (model_stats) servent.
+
+import argparse
+import glob
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from house_model import FEATURE_INFO_PATH, default_feature_info, load_feature_info
+
+DRIFT_STATE_DIR = 'drift_state'
+PREDICTION_COLUMN = 'prediction'
+DEFAULT_BINS = 32
+MIN_ROWS = 50
+
+# Seuils (avertissement, dérive) de chaque indicateur
+PSI_THRESHOLDS = (0.1, 0.25)
+OUT_OF_RANGE_THRESHOLDS = (0.01, 0.05)
+MEAN_SHIFT_THRESHOLDS = (0.5, 1.0)  # en écarts-types d'entraînement
+
+STATUS_LABELS = ('ok', 'avertissement', 'dérive')
+PSI_EPSILON = 1e-4
+
+
+# Fonction pour choisir les intervalles d'une colonne
+def column_bins(low, high, bins=DEFAULT_BINS):
+    """(début, largeur, nombre) d'intervalles réguliers; un par valeur pour une petite plage entière"""
+    low, high = float(low), float(high)
+    if low.is_integer() and high.is_integer() and high - low + 1 <= bins:
+        return low - 0.5, 1.0, int(high - low + 1)
+    if high <= low:
+        return low - 0.5, 1.0, 1
+    return low, (high - low) / bins, bins
+
+
+class DriftMonitor:
+    """Moments courants et esquisse à intervalles fixes de chaque colonne (features puis prédiction)"""
+
+    def __init__(self, columns, starts, widths, n_bins):
+        self.columns = list(columns)
+        self.starts = np.asarray(starts, dtype=float)
+        self.widths = np.asarray(widths, dtype=float)
+        self.n_bins = np.asarray(n_bins, dtype=np.int64)
+        # Une case sous le minimum et une au-dessus du maximum par colonne, à plat
+        self.offsets = np.concatenate([[0], np.cumsum(self.n_bins + 2)[:-1]])
+        self.counts = np.zeros(int((self.n_bins + 2).sum()), dtype=np.int64)
+        n_columns = len(self.columns)
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+        self.reference = None
+        self.reference_moments = {}  # colonne -> (moyenne, écart-type) sans esquisse de référence
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, feature_info, bins=DEFAULT_BINS):
+        """Moniteur vide aligné sur la référence d'entraînement de feature_info"""
+        reference = feature_info.get('drift_reference')
+        if reference:
+            monitor = cls.from_dict(reference).empty()
+            monitor.reference = cls.from_dict(reference)
+            return monitor
+
+        columns, starts, widths, n_bins = [], [], [], []
+        ranges = feature_info.get('feature_ranges', {})
+        stats = feature_info.get('model_stats', {})
+        for name in feature_info['feature_names']:
+            bounds = ranges.get(name, {'min': 0, 'max': 1})
+            start, width, count = column_bins(bounds['min'], bounds['max'], bins)
+            columns.append(name), starts.append(start), widths.append(width), n_bins.append(count)
+        start, width, count = column_bins(*price_bounds(stats), bins)
+        columns.append(PREDICTION_COLUMN), starts.append(start), widths.append(width), n_bins.append(count)
+        monitor = cls(columns, starts, widths, n_bins)
+        if stats.get('mean_price') is not None and stats.get('std_price'):
+            monitor.reference_moments[PREDICTION_COLUMN] = (float(stats['mean_price']), float(stats['std_price']))
+        return monitor
+
+    def empty(self):
+        """Copie vide (mêmes colonnes et intervalles)"""
+        return DriftMonitor(self.columns, self.starts, self.widths, self.n_bins)
+
+    @property
+    def rows(self):
+        return int(self.count.max()) if len(self.count) else 0
+
+    # Mise à jour
+
+    def update(self, features, predictions=None):
+        """Ajouter un lot : features (n, n_features) dans l'ordre du modèle, prédictions (n,) facultatives"""
+        features = np.asarray(features, dtype=float)
+        if features.ndim == 1:
+            features = features[None, :]
+        if predictions is None:
+            predictions = np.full(len(features), np.nan)
+        values = np.column_stack([features, np.asarray(predictions, dtype=float).reshape(-1)])
+        if values.shape[1] != len(self.columns):
+            raise ValueError(f"{values.shape[1]} colonnes reçues, {len(self.columns)} attendues")
+
+        finite = np.isfinite(values)
+        n = finite.sum(axis=0)
+        batch_mean = np.where(finite, values, 0.0).sum(axis=0) / np.maximum(n, 1)
+        batch_m2 = np.square(np.where(finite, values - batch_mean, 0.0)).sum(axis=0)
+        batch_min = np.where(finite, values, np.inf).min(axis=0)
+        batch_max = np.where(finite, values, -np.inf).max(axis=0)
+
+        # Case de chaque valeur : 0 sous le minimum, 1..n_bins dans la plage, n_bins + 1 au-dessus
+        positions = np.floor((values - self.starts) / self.widths) + 1
+        positions = np.clip(np.where(finite, positions, 0), 0, self.n_bins + 1).astype(np.int64)
+        flat = (positions + self.offsets)[finite]
+        batch_counts = np.bincount(flat, minlength=len(self.counts))
+
+        with self._lock:
+            self._merge_moments(n, batch_mean, batch_m2, batch_min, batch_max)
+            self.counts += batch_counts
+        return self
+
+    def _merge_moments(self, n, mean, m2, minimum, maximum):
+        total = self.count + n
+        delta = mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * n / safe_total
+        self.m2 = self.m2 + m2 + np.square(delta) * self.count * n / safe_total
+        self.count = total
+        self.min = np.fmin(self.min, minimum)
+        self.max = np.fmax(self.max, maximum)
+
+    def merge(self, other):
+        """Ajouter l'état d'un autre moniteur construit sur les mêmes intervalles (autre worker)"""
+        if (other.columns != self.columns or not np.array_equal(other.n_bins, self.n_bins)
+                or not np.allclose(other.starts, self.starts) or not np.allclose(other.widths, self.widths)):
+            raise ValueError("Esquisses incompatibles : colonnes ou intervalles différents")
+        with other._lock:
+            state = (other.count.copy(), other.mean.copy(), other.m2.copy(), other.min.copy(),
+                     other.max.copy(), other.counts.copy())
+        with self._lock:
+            self._merge_moments(*state[:5])
+            self.counts += state[5]
+        return self
+
+    # Lecture
+
+    def std(self):
+        return np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+
+    def histogram(self, position):
+        start = self.offsets[position]
+        return self.counts[start:start + self.n_bins[position] + 2]
+
+    def quantile(self, position, q):
+        """Quantile approché (interpolé dans l'intervalle qui le contient) d'une colonne"""
+        counts = self.histogram(position)
+        total = counts.sum()
+        if total == 0:
+            return None
+        low_edge = self.starts[position]
+        high_edge = low_edge + self.widths[position] * self.n_bins[position]
+        edges = np.concatenate([[min(self.min[position], low_edge)],
+                                low_edge + self.widths[position] * np.arange(self.n_bins[position] + 1),
+                                [max(self.max[position], high_edge)]])
+        target = q * total
+        cumulative = np.cumsum(counts)
+        bin_index = int(np.searchsorted(cumulative, target, side='left'))
+        before = cumulative[bin_index - 1] if bin_index else 0
+        fraction = (target - before) / counts[bin_index] if counts[bin_index] else 0.0
+        value = edges[bin_index] + fraction * (edges[bin_index + 1] - edges[bin_index])
+        return float(np.clip(value, self.min[position], self.max[position]))
+
+    def scores(self):
+        """Indicateurs de dérive de chaque colonne par rapport à la référence d'entraînement"""
+        snapshot = self.copy()  # état cohérent, lu sous le verrou
+        results = []
+        for position, name in enumerate(snapshot.columns):
+            rows = int(snapshot.count[position])
+            counts = snapshot.histogram(position)
+            out_of_range = float((counts[0] + counts[-1]) / rows) if rows else None
+            reference_mean, reference_std, psi = None, None, None
+            if self.reference is not None and self.reference.count[position]:
+                reference_mean = float(self.reference.mean[position])
+                reference_std = float(self.reference.std()[position])
+                psi = population_stability(self.reference.histogram(position), counts) if rows else None
+            elif name in self.reference_moments:
+                reference_mean, reference_std = self.reference_moments[name]
+            mean = float(snapshot.mean[position]) if rows else None
+            mean_shift = (mean - reference_mean) / reference_std \
+                if rows and reference_mean is not None and reference_std else None
+            results.append({
+                'feature': name,
+                'rows': rows,
+                'mean': mean,
+                'std': float(snapshot.std()[position]) if rows else None,
+                'p05': snapshot.quantile(position, 0.05),
+                'p50': snapshot.quantile(position, 0.5),
+                'p95': snapshot.quantile(position, 0.95),
+                'reference_mean': reference_mean,
+                'mean_shift': mean_shift,
+                'psi': psi,
+                'out_of_range': out_of_range,
+                'status': drift_status(rows, psi, out_of_range, mean_shift)
+            })
+        return results
+
+    # Sérialisation (fusion entre processus)
+
+    def copy(self):
+        clone = self.empty()
+        clone.merge(self)
+        return clone
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'columns': self.columns,
+                'starts': self.starts.tolist(),
+                'widths': self.widths.tolist(),
+                'n_bins': self.n_bins.tolist(),
+                'counts': self.counts.tolist(),
+                'count': self.count.tolist(),
+                'mean': self.mean.tolist(),
+                'm2': self.m2.tolist(),
+                'min': [v if math.isfinite(v) else None for v in self.min.tolist()],
+                'max': [v if math.isfinite(v) else None for v in self.max.tolist()]
+            }
+
+    @classmethod
+    def from_dict(cls, state):
+        monitor = cls(state['columns'], state['starts'], state['widths'], state['n_bins'])
+        monitor.counts = np.asarray(state['counts'], dtype=np.int64)
+        monitor.count = np.asarray(state['count'], dtype=np.int64)
+        monitor.mean = np.asarray(state['mean'], dtype=float)
+        monitor.m2 = np.asarray(state['m2'], dtype=float)
+        monitor.min = np.array([np.inf if v is None else v for v in state['min']], dtype=float)
+        monitor.max = np.array([-np.inf if v is None else v for v in state['max']], dtype=float)
+        return monitor
+
+    def save(self, path):
+        """Écrire l'état en JSON sans laisser de fichier partiel"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+
+# Fonction pour choisir la plage des prix prédits
+def price_bounds(model_stats):
+    """Plage des prix d'entraînement, sinon moyenne ± 4 écarts-types"""
+    if model_stats.get('min_price') is not None and model_stats.get('max_price') is not None:
+        return float(model_stats['min_price']), float(model_stats['max_price'])
+    mean, std = model_stats.get('mean_price'), model_stats.get('std_price')
+    if mean is not None and std:
+        return max(0.0, float(mean) - 4 * float(std)), float(mean) + 4 * float(std)
+    return 0.0, 1_000_000.0
+
+
+# Fonction pour calculer l'indice de stabilité de population (PSI)
+def population_stability(expected_counts, actual_counts):
+    expected = np.asarray(expected_counts, dtype=float)
+    actual = np.asarray(actual_counts, dtype=float)
+    expected = np.maximum(expected / max(expected.sum(), 1), PSI_EPSILON)
+    actual = np.maximum(actual / max(actual.sum(), 1), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+# Fonction pour résumer les indicateurs en un état
+def drift_status(rows, psi, out_of_range, mean_shift):
+    """'ok', 'avertissement' ou 'dérive' (le pire des indicateurs); None sous MIN_ROWS lignes"""
+    if rows < MIN_ROWS:
+        return None
+    level = 0
+    for value, (warning, drift) in ((psi, PSI_THRESHOLDS), (out_of_range, OUT_OF_RANGE_THRESHOLDS),
+                                    (None if mean_shift is None else abs(mean_shift), MEAN_SHIFT_THRESHOLDS)):
+        if value is not None:
+            level = max(level, 2 if value >= drift else 1 if value >= warning else 0)
+    return STATUS_LABELS[level]
+
+
+# Fonction pour fusionner les états enregistrés par plusieurs processus
+def load_merged(directory, feature_info, bins=DEFAULT_BINS):
+    """Moniteur (avec sa référence) cumulant tous les états JSON du répertoire"""
+    monitor = DriftMonitor.for_model(feature_info, bins)
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path) as f:
+            monitor.merge(DriftMonitor.from_dict(json.load(f)))
+    return monitor
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dérive des entrées et des prédictions par rapport à l'entraînement")
+    parser.add_argument('--state-dir', default=DRIFT_STATE_DIR, help="États JSON enregistrés par les workers")
+    parser.add_argument('--data', help="Mesurer plutôt la dérive des features d'un fichier CSV/Parquet")
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--json', action='store_true', help="Afficher les indicateurs en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    feature_info = load_feature_info(args.feature_info) or default_feature_info()
+    if args.data:
+        from batch_scoring import DEFAULT_CHUNK_SIZE, detect_format, iter_input_chunks
+
+        monitor = DriftMonitor.for_model(feature_info)
+        names = list(feature_info['feature_names'])
+        for chunk, _ in iter_input_chunks(args.data, detect_format(args.data), DEFAULT_CHUNK_SIZE, names):
+            monitor.update(chunk[names].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float))
+    else:
+        if not os.path.isdir(args.state_dir):
+            raise SystemExit(f"Répertoire '{args.state_dir}' non trouvé")
+        monitor = load_merged(args.state_dir, feature_info)
+
+    scores = monitor.scores()
+    if args.json:
+        print(json.dumps(scores, indent=2))
+        return
+    reference = "esquisse d'entraînement" if monitor.reference is not None else "bornes et statistiques du prix"
+    print(f"{monitor.rows:,} lignes • référence : {reference}")
+    for row in scores:
+        if not row['rows']:
+            continue
+        psi = f"{row['psi']:.3f}" if row['psi'] is not None else '-'
+        shift = f"{row['mean_shift']:+.2f}σ" if row['mean_shift'] is not None else '-'
+        print(f"{row['feature']:<14} {row['status'] or 'insuffisant':<14} PSI {psi:>6} • décalage {shift:>7} "
+              f"• hors plage {row['out_of_range']:.1%} • p05/p50/p95 "
+              f"{row['p05']:,.0f}/{row['p50']:,.0f}/{row['p95']:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# feature_contributions.py
+# Contributions de chaque feature à une prédiction, par attribution le long des chemins des arbres
+#
+# Vérification contre XGBoost (pred_contribs, approx_contribs=True) et latence :
+#   python feature_contributions.py --rows 10000 --repeat 200
+#
+# Chaque nœud porte la valeur attendue de son sous-arbre (moyenne des feuilles pondérée
+# par la couverture). Quand une ligne passe d'un nœud à son enfant, l'écart entre les deux
+# valeurs attendues est attribué à la feature testée par le nœud. Ces écarts sont
+# précalculés une fois au chargement : expliquer une ligne coûte un parcours des arbres,
+# comme la prédiction. prédiction = biais + somme des contributions.
+
+import argparse
+import time
+
+import numpy as np
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, default_feature_info, load_feature_info, load_model
+from tree_evaluator import DEFAULT_BLOCK_SIZE, TreeEnsemble, sample_features
+
+
+class ContributionExplainer:
+    """Attribution par chemin (Saabas) sur un TreeEnsemble disposant de la couverture des nœuds"""
+
+    def __init__(self, ensemble):
+        if ensemble.cover is None:
+            raise ValueError("La couverture des nœuds est nécessaire pour expliquer les prédictions")
+        self.ensemble = ensemble
+        self.feature_names = list(ensemble.feature_names)
+        expected = _expected_values(ensemble)
+        # Écart attribué en arrivant sur chaque nœud depuis son parent (nul pour les racines)
+        self.node_delta = np.zeros(ensemble.n_nodes)
+        internal = ensemble.left != np.arange(ensemble.n_nodes)
+        for children in (ensemble.left[internal], ensemble.right[internal]):
+            self.node_delta[children] = ensemble.scale * (expected[children] - expected[internal])
+        self.bias = ensemble.offset + ensemble.scale * float(expected[ensemble.roots].sum())
+
+    @classmethod
+    def from_model(cls, model, feature_names=None):
+        return cls(TreeEnsemble.from_model(model, feature_names))
+
+    def explain(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Matrice des contributions (n_lignes, n_features), dans l'ordre de feature_names"""
+        X = self.ensemble.as_matrix(X)
+        contributions = np.empty(X.shape)
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            contributions[start:start + len(block)] = self._explain_block(block)
+        return contributions
+
+    def _explain_block(self, X):
+        ensemble = self.ensemble
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        nodes = np.broadcast_to(ensemble.roots, (n_rows, ensemble.n_trees))
+        contributions = np.zeros(n_rows * n_features)
+        for _ in range(ensemble.max_depth):
+            features = ensemble.feature.take(nodes)
+            x = flat_X.take(row_offsets + features)
+            next_nodes = np.where(x < ensemble.threshold.take(nodes), ensemble.left.take(nodes), ensemble.right.take(nodes))
+            is_nan = np.isnan(x)
+            if is_nan.any():
+                next_nodes = np.where(is_nan, ensemble.missing.take(nodes), next_nodes)
+            # Une feuille boucle sur elle-même : aucun écart à attribuer
+            deltas = np.where(next_nodes != nodes, self.node_delta.take(next_nodes), 0.0)
+            contributions += np.bincount((row_offsets + features).ravel(), deltas.ravel(), minlength=len(contributions))
+            nodes = next_nodes
+        return contributions.reshape(n_rows, n_features)
+
+    def global_importance(self, X):
+        """Part moyenne de |contribution| de chaque feature sur un échantillon, triée par importance"""
+        magnitude = np.abs(self.explain(X)).mean(axis=0)
+        total = magnitude.sum() or 1.0
+        return sorted(
+            ({'feature': name, 'importance': float(value / total)} for name, value in zip(self.feature_names, magnitude)),
+            key=lambda item: item['importance'], reverse=True
+        )
+
+
+def _expected_values(ensemble):
+    """Valeur attendue de chaque nœud : moyenne des feuilles de son sous-arbre pondérée par la couverture"""
+    n_nodes = ensemble.n_nodes
+    left, right, cover = ensemble.left, ensemble.right, ensemble.cover
+    internal = left != np.arange(n_nodes)
+
+    # Profondeur de chaque nœud, niveau par niveau depuis les racines
+    depth = np.full(n_nodes, -1)
+    level = ensemble.roots
+    for d in range(ensemble.max_depth + 1):
+        depth[level] = d
+        level = level[internal[level]]
+        level = np.concatenate([left[level], right[level]])
+
+    # Remontée des feuilles vers les racines, un niveau à la fois
+    expected = np.where(internal, 0.0, ensemble.value)
+    for d in range(ensemble.max_depth - 1, -1, -1):
+        nodes = np.flatnonzero((depth == d) & internal)
+        left_cover, right_cover = cover[left[nodes]], cover[right[nodes]]
+        weight = left_cover + right_cover
+        expected[nodes] = np.where(
+            weight > 0,
+            (left_cover * expected[left[nodes]] + right_cover * expected[right[nodes]]) / np.where(weight > 0, weight, 1),
+            (expected[left[nodes]] + expected[right[nodes]]) / 2
+        )
+    return expected
+
+
+# Fonction pour comparer aux contributions approchées de XGBoost
+def check_xgboost_parity(model, explainer, X, rtol=1e-6):
+    """Comparer à booster.predict(pred_contribs=True, approx_contribs=True) (même méthode)
+
+    XGBoost cumule en float32 : la tolérance est relative à l'ordre de grandeur des prix.
+    """
+    import xgboost as xgb
+
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    matrix = explainer.ensemble.as_matrix(X)
+    reference = booster.predict(xgb.DMatrix(matrix, feature_names=explainer.feature_names),
+                                pred_contribs=True, approx_contribs=True)
+    contributions = explainer.explain(matrix)
+    tolerance = rtol * max(1.0, float(np.max(np.abs(reference.sum(axis=1)))))
+    max_error = float(np.max(np.abs(reference[:, :-1] - contributions)))
+    bias_error = float(np.max(np.abs(reference[:, -1] - explainer.bias)))
+    return {'ok': max_error <= tolerance and bias_error <= tolerance,
+            'max_abs_error': max_error, 'bias_error': bias_error}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Contributions des features par attribution le long des chemins")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--rows', type=int, default=10_000, help="Taille du lot mesuré")
+    parser.add_argument('--repeat', type=int, default=200)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model = load_model(args.model)
+    if model is None:
+        raise SystemExit(f"Fichier '{args.model}' non trouvé")
+    feature_info = load_feature_info(args.feature_info) or default_feature_info()
+    explainer = ContributionExplainer.from_model(model, feature_info['feature_names'])
+    X = sample_features(feature_info, args.rows, seed=1)
+
+    contributions = explainer.explain(X)
+    additivity = float(np.max(np.abs(explainer.bias + contributions.sum(axis=1) - explainer.ensemble.predict_native(X))))
+    print(f"Additivité (biais + contributions = prédiction) : écart max {additivity:.2e}")
+    if hasattr(model, 'get_booster'):
+        parity = check_xgboost_parity(model, explainer, X)
+        print(f"Parité XGBoost approx_contribs : {'OK' if parity['ok'] else 'ÉCHEC'} "
+              f"(écart max {parity['max_abs_error']:.2e}, biais {parity['bias_error']:.2e})")
+
+    for rows, repeat in ((1, args.repeat), (args.rows, max(3, args.repeat // 50))):
+        block = X.to_numpy()[:rows]
+        timings = {}
+        for name, fn in (('predict', explainer.ensemble.predict_native), ('explain', explainer.explain)):
+            fn(block)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                fn(block)
+            timings[name] = (time.perf_counter() - started) / repeat * 1e6
+        print(f"{rows:>7} lignes : predict {timings['predict']:10.1f} µs • explain {timings['explain']:10.1f} µs "
+              f"• rapport x{timings['explain'] / timings['predict']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
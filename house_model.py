@@ -0,0 +1,193 @@
+# house_model.py
+# Chargement du modèle et préparation des features, sans dépendance à Streamlit
+
+import copy
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Fichiers d'artefacts produits par l'entraînement
+MODEL_PATH = 'xgb_model.pkl'
+FEATURE_INFO_PATH = 'feature_info.pkl'
+
+# Correspondance entre les champs du formulaire et les features du modèle
+INPUT_FEATURES = {
+    'overall_qual': 'OverallQual',
+    'gr_liv_area': 'GrLivArea',
+    'total_bsmt_sf': 'TotalBsmtSF',
+    'garage_area': 'GarageArea',
+    'year_built': 'YearBuilt',
+    'full_bath': 'FullBath',
+    'tot_rms_abv_grd': 'TotRmsAbvGrd',
+    'fireplaces': 'Fireplaces',
+    'garage_cars': 'GarageCars'
+}
+
+# Métadonnées par défaut basées sur votre rapport
+DEFAULT_FEATURE_INFO = {
+    'rmse_score': 26240.20,
+    'r2_score': 0.8688,
+    'model_stats': {
+        'test_r2': 0.8688,
+        'train_r2': 0.9330,
+        'train_samples': 1456,
+        'mean_price': 180151.23,
+        'min_price': 50000,
+        'max_price': 500000
+    },
+    'feature_names': ['OverallQual', 'GrLivArea', 'TotalBsmtSF', 'GarageArea', 'YearBuilt', 'FullBath', 'TotRmsAbvGrd', 'Fireplaces', 'GarageCars'],
+    'feature_importance': [
+        {'feature': 'OverallQual', 'importance': 0.579},
+        {'feature': 'GrLivArea', 'importance': 0.184},
+        {'feature': 'TotalBsmtSF', 'importance': 0.092},
+        {'feature': 'GarageArea', 'importance': 0.047},
+        {'feature': 'YearBuilt', 'importance': 0.039},
+        {'feature': 'FullBath', 'importance': 0.030},
+        {'feature': 'TotRmsAbvGrd', 'importance': 0.015},
+        {'feature': 'Fireplaces', 'importance': 0.010},
+        {'feature': 'GarageCars', 'importance': 0.004}
+    ]
+}
+
+
+# Fonction pour charger le modèle entraîné
+def load_model(path=MODEL_PATH):
+    """Charger le modèle PKL, ou None si le fichier est absent"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+# Fonction pour charger les métadonnées des features
+def load_feature_info(path=FEATURE_INFO_PATH):
+    """Charger les métadonnées des features, ou None si le fichier est absent"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+# Fonction pour obtenir une copie des métadonnées par défaut
+def default_feature_info():
+    """Renvoyer une copie indépendante des métadonnées par défaut"""
+    return copy.deepcopy(DEFAULT_FEATURE_INFO)
+
+
+# Fonction pour préparer les features selon VOTRE modèle exact
+def prepare_features_for_your_model(user_inputs, feature_names=None):
+    """Préparer les features selon l'ordre exact de VOTRE modèle entraîné"""
+
+    features_dict = {feature: user_inputs[key] for key, feature in INPUT_FEATURES.items()}
+
+    # Convertir en DataFrame avec l'ordre exact des colonnes du modèle
+    df = pd.DataFrame([features_dict])
+    if feature_names is not None:
+        df = df[list(feature_names)]
+
+    return df
+
+
+# Fonction pour convertir une ligne JSON/dict en vecteur de features
+def row_to_vector(row, feature_names):
+    """Convertir un dict (noms du modèle ou champs du formulaire) en liste ordonnée de floats"""
+    values = []
+    for feature in feature_names:
+        if feature in row:
+            value = row[feature]
+        else:
+            key = next((k for k, f in INPUT_FEATURES.items() if f == feature), None)
+            if key is None or key not in row:
+                raise ValueError(f"Feature manquante: {feature}")
+            value = row[key]
+        values.append(float(value))
+    return values
+
+
+# Fonction pour lire les noms de features enregistrés dans le modèle
+def model_feature_names(model):
+    """Noms des colonnes vus à l'entraînement (XGBoost, scikit-learn, TreeEnsemble), ou None"""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is None and hasattr(model, 'get_booster'):
+        names = model.get_booster().feature_names
+    if names is None:
+        names = getattr(model, 'feature_names', None)
+    return None if names is None else [str(name) for name in names]
+
+
+class FeatureBinder:
+    """Liaison, vérifiée une seule fois, entre les champs du formulaire et l'ordre des colonnes du modèle
+
+    Après la liaison, une saisie est recopiée directement dans un tampon NumPy
+    (1, n_features) réutilisé par thread, ou dans une matrice de lot : aucun
+    DataFrame n'est construit sur le chemin de la requête.
+    """
+
+    def __init__(self, feature_names, model=None):
+        feature_names = [str(name) for name in feature_names]
+        inputs_by_feature = {feature: key for key, feature in INPUT_FEATURES.items()}
+        unknown = [name for name in feature_names if name not in inputs_by_feature]
+        missing = [name for name in inputs_by_feature if name not in feature_names]
+        if unknown or missing or len(set(feature_names)) != len(feature_names):
+            raise ValueError(
+                f"Schéma de features incompatible avec le formulaire "
+                f"(inconnues: {unknown}, absentes: {missing})"
+            )
+        trained_names = model_feature_names(model) if model is not None else None
+        if trained_names is not None and trained_names != feature_names:
+            raise ValueError(f"Ordre des colonnes différent de celui du modèle: {trained_names}")
+
+        self.feature_names = tuple(feature_names)
+        self.input_keys = tuple(inputs_by_feature[name] for name in feature_names)
+        # Les modèles scikit-learn entraînés sur un DataFrame exigent encore des noms de colonnes
+        self.needs_frame = (
+            model is not None and not hasattr(model, 'get_booster')
+            and getattr(model, 'feature_names_in_', None) is not None
+        )
+        self._local = threading.local()
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def row(self, user_inputs):
+        """Remplir le tampon (1, n_features) du thread courant; il est écrasé à l'appel suivant"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, self.n_features))
+        values = buffer[0]
+        for position, key in enumerate(self.input_keys):
+            values[position] = user_inputs[key]
+        return buffer
+
+    def matrix(self, rows, out=None):
+        """Remplir une matrice (n_lignes, n_features) à partir d'une liste de saisies"""
+        if out is None:
+            out = np.empty((len(rows), self.n_features))
+        for index, user_inputs in enumerate(rows):
+            values = out[index]
+            for position, key in enumerate(self.input_keys):
+                values[position] = user_inputs[key]
+        return out
+
+    def as_mapping(self, vector):
+        """Vue feature -> valeur d'une ligne (pour la table précalculée)"""
+        return dict(zip(self.feature_names, np.ravel(vector)))
+
+    def predict(self, model, matrix):
+        """Prédire une matrice liée, sans DataFrame sauf si le modèle l'impose"""
+        if self.needs_frame:
+            matrix = pd.DataFrame(matrix, columns=list(self.feature_names))
+        return np.maximum(model.predict(matrix), 0)  # Assurer que les prix sont positifs
+
+
+# Fonction pour prédire une matrice de features ordonnée
+def predict_matrix(model, matrix, feature_names):
+    """Prédire les prix d'une matrice (n_lignes, n_features) en un seul appel"""
+    matrix = np.asarray(matrix, dtype=float)
+    if hasattr(model, 'get_booster') or getattr(model, 'feature_names_in_', None) is None:
+        return np.maximum(model.predict(matrix), 0)  # Assurer que les prix sont positifs
+    return np.maximum(model.predict(pd.DataFrame(matrix, columns=list(feature_names))), 0)
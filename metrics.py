@@ -0,0 +1,247 @@
+# metrics.py
+# Instrumentation légère du chemin critique : spans de durée, compteurs et export Prometheus
+#
+# Variables d'environnement :
+#   HOUSE_METRICS=0          -> désactiver (les spans deviennent des contextes vides)
+#   HOUSE_METRICS_FILE=path  -> écrire le format texte Prometheus dans ce fichier (collecteur textfile)
+#   HOUSE_METRICS_PORT=9108  -> exposer /metrics (et /ready, préparation du processus) sur un port local
+#   HOUSE_METRICS_HOST=0.0.0.0 -> interface d'écoute de ce port (127.0.0.1 par défaut)
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = 'house'
+
+# Bornes des histogrammes de durée (secondes)
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _NullSpan:
+    """Span inactif partagé : aucun coût quand les métriques sont désactivées"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_metrics', '_name', '_started')
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Registre de métriques thread-safe (sessions Streamlit, workers du serveur)"""
+
+    def __init__(self, enabled=True, prefix=METRIC_PREFIX):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Mesurer la durée d'un bloc : `with METRICS.span('prediction'): ...`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(DURATION_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram()
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def inc(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_collector(self, collector):
+        """Ajouter une fonction appelée à l'export, renvoyant {nom: (type, valeur)}"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def snapshot(self):
+        """Copie des valeurs courantes (compteurs, jauges, histogrammes)"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {
+                    name: {'count': h.count, 'sum': h.total, 'counts': list(h.counts)}
+                    for name, h in self._histograms.items()
+                }
+            }
+
+    def render_prometheus(self):
+        """Format d'exposition texte de Prometheus"""
+        snapshot = self.snapshot()
+        counters = dict(snapshot['counters'])
+        gauges = dict(snapshot['gauges'])
+        for collector in list(self._collectors):
+            for name, (kind, value) in collector().items():
+                (counters if kind == 'counter' else gauges)[name] = value
+
+        lines = []
+        for name, value in sorted(counters.items()):
+            metric = f'{self.prefix}_{name}_total'
+            lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+        for name, value in sorted(gauges.items()):
+            metric = f'{self.prefix}_{name}'
+            lines += [f'# TYPE {metric} gauge', f'{metric} {value}']
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            metric = f'{self.prefix}_{name}_seconds'
+            lines.append(f'# TYPE {metric} histogram')
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, histogram['counts']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{metric}_sum {histogram["sum"]:.6f}')
+            lines.append(f'{metric}_count {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Écrire l'export de façon atomique (lecture jamais partielle par le collecteur)"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_http_exporter(self, port, host='127.0.0.1', readiness=None):
+        """Servir /metrics (et /ready si `readiness` est fourni) sur un port local depuis un thread démon"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    status, body, content_type = 200, metrics.render_prometheus(), PROMETHEUS_CONTENT_TYPE
+                elif path == '/ready' and readiness is not None:
+                    status = 200 if readiness.ready else 503
+                    body, content_type = json.dumps(readiness.status()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+        return server
+
+
+class Readiness:
+    """Préparation du processus : non prêt tant que le préchauffage n'est pas terminé
+
+    Chaque étape du préchauffage est chronométrée à part (jauges warmup_<étape>_seconds,
+    total warmup_seconds) : ces durées n'entrent pas dans les histogrammes de latence.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics if metrics is not None else METRICS
+        self.stages = {}
+        self.started_at = time.time()
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()  # un seul préchauffage à la fois
+        self.metrics.set_gauge('ready', 0)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def warm_up(self, stages):
+        """Exécuter une fois les étapes [(nom, fonction), ...] puis passer prêt
+
+        Renvoie True si cet appel a effectué le préchauffage. Une étape qui lève une exception
+        l'interrompt : le processus reste non prêt et le préchauffage sera retenté au prochain appel.
+        """
+        with self._lock:
+            if self.ready:
+                return False
+            for name, step in stages:
+                started = time.perf_counter()
+                step()
+                self.record(name, time.perf_counter() - started)
+            self.mark_ready()
+            return True
+
+    def record(self, name, seconds):
+        """Enregistrer une étape chronométrée ailleurs (chargement du modèle avant le serveur)"""
+        self.stages[name] = seconds
+        self.metrics.set_gauge(f'warmup_{name}_seconds', seconds)
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+        self.metrics.set_gauge('warmup_seconds', sum(self.stages.values()))
+        self.metrics.set_gauge('ready', 1)
+        self._ready.set()
+
+    def status(self):
+        """État renvoyé par /ready"""
+        return {
+            'status': 'ready' if self.ready else 'warming_up',
+            'pid': os.getpid(),
+            'warmup_seconds': sum(self.stages.values()) if self.ready else None,
+            'stages': dict(self.stages),
+            'started_at': self.started_at,
+            'ready_at': self.ready_at
+        }
+
+
+# Registre par défaut du processus
+METRICS = Metrics(enabled=os.environ.get('HOUSE_METRICS', '1').lower() not in ('0', 'false', 'no'))
@@ -0,0 +1,200 @@
+# model_artifact.py
+# Format d'artefact sans pickle : tableaux de nœuds .npy + manifeste JSON, chargés en mémoire mappée
+#
+# Export depuis les fichiers PKL actuels :
+#   python model_artifact.py export --output model_artifacts
+#
+# Structure produite :
+#   model_artifacts/
+#   ├── LATEST                 -> nom de la dernière version exportée
+#   └── v0001/
+#       ├── manifest.json      -> version du format, paramètres de l'ensemble, feature_info
+#       ├── feature.npy, threshold.npy, left.npy, right.npy, missing.npy
+#       └── value.npy, cover.npy, roots.npy
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from tree_evaluator import TreeEnsemble
+
+ARTIFACT_ROOT = 'model_artifacts'
+LATEST_FILE = 'LATEST'
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+# Tableaux de l'ensemble et leur type exact (un chargement mmap ne doit provoquer aucune copie)
+NODE_ARRAYS = {
+    'feature': np.int32,
+    'threshold': np.float64,
+    'left': np.int32,
+    'right': np.int32,
+    'missing': np.int32,
+    'value': np.float64,
+    'cover': np.float64,
+    'roots': np.int32
+}
+
+
+def _json_safe(value):
+    """Convertir récursivement les scalaires NumPy de feature_info en types JSON"""
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _next_version(root):
+    existing = [name for name in os.listdir(root) if name.startswith('v') and name[1:].isdigit()] if os.path.isdir(root) else []
+    return f"v{max((int(name[1:]) for name in existing), default=0) + 1:04d}"
+
+
+# Fonction pour exporter le modèle en artefact versionné
+def export_artifact(model, feature_info, root=ARTIFACT_ROOT, version=None):
+    """Aplatir le modèle, écrire une nouvelle version et la désigner comme LATEST"""
+    ensemble = TreeEnsemble.from_model(model, feature_info['feature_names'])
+    if ensemble.cover is None:
+        raise ValueError("L'ensemble doit contenir les couvertures de nœuds (cover)")
+
+    os.makedirs(root, exist_ok=True)
+    version = version or _next_version(root)
+    directory = os.path.join(root, version)
+    os.makedirs(directory)
+
+    arrays = {}
+    for name, dtype in NODE_ARRAYS.items():
+        path = os.path.join(directory, f'{name}.npy')
+        np.save(path, np.ascontiguousarray(getattr(ensemble, name), dtype=dtype))
+        arrays[name] = {'file': f'{name}.npy', 'dtype': np.dtype(dtype).str, 'sha256': file_sha256(path)}
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'ensemble': {
+            'kind': ensemble.kind,
+            'n_trees': ensemble.n_trees,
+            'n_nodes': ensemble.n_nodes,
+            'max_depth': ensemble.max_depth,
+            'offset': ensemble.offset,
+            'scale': ensemble.scale,
+            'feature_names': ensemble.feature_names
+        },
+        'arrays': arrays,
+        'feature_info': _json_safe(feature_info)
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Mise à jour atomique du pointeur LATEST
+    latest_tmp = os.path.join(root, f'.{LATEST_FILE}.tmp')
+    with open(latest_tmp, 'w') as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    return directory
+
+
+# Fonction pour trouver le répertoire d'une version
+def resolve_artifact_dir(path=ARTIFACT_ROOT):
+    """Accepter un répertoire de version ou la racine (suivre alors LATEST)"""
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if os.path.exists(latest):
+        with open(latest) as f:
+            return os.path.join(path, f.read().strip())
+    raise FileNotFoundError(f"Aucun artefact de modèle dans '{path}'")
+
+
+# Fonction pour charger un artefact en mémoire mappée
+def load_artifact(path=ARTIFACT_ROOT, verify=False):
+    """Charger (ensemble, feature_info) avec des tableaux mappés en lecture seule
+
+    Aucun code n'est exécuté au chargement : seuls du JSON et des .npy sans objets
+    Python (allow_pickle=False) sont lus. Les pages des tableaux sont partagées
+    par tous les processus via le cache disque. `verify` recalcule les empreintes SHA-256.
+    """
+    directory = resolve_artifact_dir(path)
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Version de format non supportée: {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, dtype in NODE_ARRAYS.items():
+        spec = manifest['arrays'][name]
+        array_path = os.path.join(directory, spec['file'])
+        if verify and file_sha256(array_path) != spec['sha256']:
+            raise ValueError(f"Empreinte invalide pour {spec['file']}")
+        array = np.load(array_path, mmap_mode='r', allow_pickle=False)
+        if array.dtype != np.dtype(dtype):
+            raise ValueError(f"Type inattendu pour {name}: {array.dtype}")
+        arrays[name] = array
+
+    params = manifest['ensemble']
+    ensemble = TreeEnsemble(
+        **arrays,
+        max_depth=params['max_depth'],
+        feature_names=params['feature_names'],
+        offset=params['offset'],
+        scale=params['scale'],
+        kind=params['kind'],
+        version=manifest['version']
+    )
+    return ensemble, manifest['feature_info']
+
+
+def main(argv=None):
+    from house_model import FEATURE_INFO_PATH, MODEL_PATH, default_feature_info, load_feature_info, load_model
+    from tree_evaluator import check_parity, sample_features
+
+    parser = argparse.ArgumentParser(description="Export et vérification des artefacts de modèle sans pickle")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="Exporter les fichiers PKL en nouvel artefact")
+    export_parser.add_argument('--model', default=MODEL_PATH)
+    export_parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    export_parser.add_argument('--output', default=ARTIFACT_ROOT, help="Racine des versions")
+    export_parser.add_argument('--version', help="Nom de version (par défaut : incrément vNNNN)")
+    verify_parser = commands.add_parser('verify', help="Vérifier empreintes et parité d'un artefact")
+    verify_parser.add_argument('path', nargs='?', default=ARTIFACT_ROOT)
+    verify_parser.add_argument('--model', default=MODEL_PATH, help="Modèle PKL de référence pour la parité")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        model = load_model(args.model)
+        if model is None:
+            raise SystemExit(f"Fichier '{args.model}' non trouvé")
+        feature_info = load_feature_info(args.feature_info) or default_feature_info()
+        directory = export_artifact(model, feature_info, args.output, args.version)
+        print(f"✅ Artefact écrit dans {directory}")
+        return 0
+
+    ensemble, feature_info = load_artifact(args.path, verify=True)
+    print(f"✅ Empreintes valides pour {ensemble.version} ({ensemble.n_trees} arbres, {ensemble.n_nodes} nœuds)")
+    model = load_model(args.model)
+    if model is not None:
+        parity = check_parity(model, ensemble, sample_features(feature_info, 10_000))
+        print(f"Parité avec {args.model} : écart max {parity['max_abs_diff']:.6f} -> {'✅ OK' if parity['ok'] else '❌ ÉCHEC'}")
+        return 0 if parity['ok'] else 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
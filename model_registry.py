@@ -0,0 +1,256 @@
+# model_registry.py
+# Modèles fantômes (shadow) nommés, notés hors du processus qui sert les requêtes
+#
+# Configuration (application Streamlit) :
+#   SHADOW_MODELS="challenger=models/challenger.pkl:models/challenger_info.pkl,mmap=model_artifacts_v2"
+#   SHADOW_LOG=shadow_log.jsonl
+#
+# Chaque entrée est nom=chemin : un fichier PKL (métadonnées facultatives après « : »)
+# ou un répertoire d'artefact. Le modèle principal répond à la requête; la même ligne est
+# ensuite envoyée au processus shadow_worker.py (priorité minimale) qui charge les modèles
+# fantômes, la note avec chacun et écrit une ligne JSON (prédictions et latences) pour la
+# comparaison hors ligne :
+#   python model_registry.py --log shadow_log.jsonl
+#
+# Le chemin principal ne fait qu'une copie de la ligne et un dépôt non bloquant dans une file
+# bornée, vidée vers le processus par un thread d'alimentation : si elle est pleine, la ligne
+# est ignorée (compteur shadow_dropped) plutôt que de ralentir la requête. Les modèles fantômes
+# ne sont jamais chargés dans le processus qui sert les requêtes : leur scoring ne dispute ni
+# le GIL ni la mémoire du principal.
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from house_model import FEATURE_INFO_PATH
+from metrics import METRICS
+from model_reloader import ModelHolder
+
+logger = logging.getLogger('model_registry')
+
+PRIMARY_MODEL = 'production'
+SHADOW_LOG_PATH = 'shadow_log.jsonl'
+DEFAULT_MAX_PENDING = 256
+SHADOW_PROCESS_NICE = 19
+STATUS_INTERVAL = 1.0
+CLOSE_TIMEOUT = 30.0
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shadow_worker.py')
+
+
+# Fonction pour décrire les modèles fantômes à partir d'une chaîne de configuration
+def parse_shadow_spec(spec):
+    """`nom=chemin[:métadonnées]` séparés par des virgules -> {nom: ModelHolder} (non chargés)"""
+    holders = {}
+    for entry in filter(None, (item.strip() for item in (spec or '').split(','))):
+        name, separator, target = entry.partition('=')
+        if not separator or not name.strip() or not target.strip():
+            raise ValueError(f"Modèle fantôme invalide: '{entry}' (attendu: nom=chemin)")
+        name, target = name.strip(), target.strip()
+        if name == PRIMARY_MODEL:
+            raise ValueError(f"Le nom '{PRIMARY_MODEL}' est réservé au modèle principal")
+        if os.path.isdir(target):
+            holders[name] = ModelHolder(artifact_dir=target)
+        else:
+            model_path, _, feature_info_path = target.partition(':')
+            holders[name] = ModelHolder(model_path, feature_info_path or FEATURE_INFO_PATH)
+    return holders
+
+
+class ShadowScorer:
+    """Note dans un processus séparé, avec chaque modèle fantôme, les lignes déjà servies par le modèle principal"""
+
+    def __init__(self, spec, log_path=SHADOW_LOG_PATH, max_pending=DEFAULT_MAX_PENDING,
+                 poll_interval=0, primary_name=PRIMARY_MODEL):
+        # Spécification validée ici (ValueError) avant de lancer le processus
+        self.names = list(parse_shadow_spec(spec))
+        self.primary_name = primary_name
+        self.log_path = log_path
+        self._shadows = {name: {'version': None, 'source': None, 'error': "chargement en cours"}
+                         for name in self.names}
+        self._counters = {'shadow_predictions': 0, 'shadow_errors': 0}
+        self._status_lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._records = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._process = None
+        if not self.names:
+            return
+
+        # Script d'entrée dédié (pas de multiprocessing spawn : il réexécuterait le script Streamlit)
+        parent_socket, child_socket = socket.socketpair()
+        try:
+            self._process = subprocess.Popen([sys.executable, WORKER_SCRIPT, str(child_socket.fileno())],
+                                             pass_fds=(child_socket.fileno(),), stdin=subprocess.DEVNULL)
+        finally:
+            child_socket.close()
+        self._connection = Connection(parent_socket.detach())
+        self._connection.send({'spec': spec, 'log_path': os.path.abspath(log_path), 'poll_interval': poll_interval})
+        self._feeder = threading.Thread(target=self._feed, name='shadow-feeder', daemon=True)
+        self._reader = threading.Thread(target=self._read_status, name='shadow-status', daemon=True)
+        self._feeder.start()
+        self._reader.start()
+        METRICS.register_collector(self._collect)
+
+    @property
+    def enabled(self):
+        return self._process is not None
+
+    def submit(self, features, version, prediction, latency, request_id=None):
+        """Déposer une ligne servie (mapping feature -> valeur); False si elle est ignorée
+
+        Appelé sur le chemin de requête : aucune prédiction ni écriture ici, seulement une copie
+        superficielle de la ligne et un dépôt non bloquant dans la file bornée. Le thread
+        d'alimentation la sérialise ensuite vers le processus de scoring.
+        """
+        if not self.enabled or self._closed:
+            return False
+        record = {
+            'ts': time.time(),
+            'request_id': request_id,
+            'features': dict(features),
+            'primary': {'name': self.primary_name, 'version': version,
+                        'prediction': float(prediction), 'latency_ms': latency * 1000}
+        }
+        try:
+            self._records.put_nowait(record)
+        except queue.Full:
+            METRICS.inc('shadow_dropped')
+            return False
+        return True
+
+    def _feed(self):
+        while True:
+            record = self._records.get()
+            try:
+                self._connection.send(record)
+            except OSError:  # processus de scoring arrêté : les lignes suivantes sont ignorées
+                self._closed = True
+                return
+            if record is None:
+                return
+
+    def _read_status(self):
+        while True:
+            try:
+                shadows, counters = self._connection.recv()
+            except (EOFError, OSError):
+                return
+            with self._status_lock:
+                self._shadows.update(shadows)
+                self._counters.update(counters)
+            self._loaded.set()
+
+    def wait_loaded(self, timeout=60.0):
+        """Attendre le premier état du processus (modèles fantômes chargés); False à l'expiration"""
+        return self.enabled and self._loaded.wait(timeout)
+
+    def shadows(self):
+        """(nom, état) des modèles fantômes : version, source et dernière erreur vues par le processus"""
+        with self._status_lock:
+            return [(name, dict(self._shadows[name])) for name in self.names]
+
+    def _collect(self):
+        with self._status_lock:
+            counters = dict(self._counters)
+        return {name: ('counter', value) for name, value in counters.items()}
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Noter les lignes en attente puis arrêter le processus (interrompu après `timeout` secondes)"""
+        if not self.enabled or self._process.poll() is not None:
+            return
+        self._closed = True
+        try:
+            self._records.put(None, timeout=timeout)
+            self._process.wait(timeout)
+        except (queue.Full, subprocess.TimeoutExpired):
+            logger.warning("Processus de scoring fantôme interrompu après %.0f s", timeout)
+            self._process.kill()
+            self._process.wait()
+        self._reader.join(timeout)
+        self._connection.close()
+
+
+# Fonction pour comparer les modèles fantômes au modèle principal à partir du journal
+def summarize_log(path=SHADOW_LOG_PATH):
+    """Par modèle fantôme : écarts de prédiction et latences comparées au modèle principal"""
+    primary_latency = []
+    shadows = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            primary = record['primary']
+            primary_latency.append(primary['latency_ms'])
+            for shadow in record.get('shadows', []):
+                stats = shadows.setdefault(shadow['name'], {'diff': [], 'relative': [], 'latency': [], 'errors': 0})
+                if shadow['prediction'] is None:
+                    stats['errors'] += 1
+                    continue
+                difference = shadow['prediction'] - primary['prediction']
+                stats['diff'].append(difference)
+                if primary['prediction']:
+                    stats['relative'].append(difference / primary['prediction'])
+                stats['latency'].append(shadow['latency_ms'])
+
+    summary = {}
+    for name, stats in shadows.items():
+        diff = np.asarray(stats['diff'])
+        relative = np.asarray(stats['relative'])
+        latency = np.asarray(stats['latency'])
+        summary[name] = {
+            'rows': len(diff),
+            'errors': stats['errors'],
+            'mean_diff': float(diff.mean()) if len(diff) else None,
+            'mean_abs_diff': float(np.abs(diff).mean()) if len(diff) else None,
+            'max_abs_diff': float(np.abs(diff).max()) if len(diff) else None,
+            'mean_abs_relative_diff': float(np.abs(relative).mean()) if len(relative) else None,
+            'latency_p50_ms': float(np.percentile(latency, 50)) if len(latency) else None,
+            'latency_p95_ms': float(np.percentile(latency, 95)) if len(latency) else None,
+            'primary_latency_p50_ms': float(np.percentile(primary_latency, 50)),
+            'primary_latency_p95_ms': float(np.percentile(primary_latency, 95))
+        }
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Comparer les modèles fantômes au modèle principal")
+    parser.add_argument('--log', default=SHADOW_LOG_PATH, help="Journal JSONL écrit par le scoring fantôme")
+    parser.add_argument('--json', action='store_true', help="Afficher le résumé en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.log):
+        raise SystemExit(f"Fichier '{args.log}' non trouvé")
+    summary = summarize_log(args.log)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    if not summary:
+        print("Aucune prédiction fantôme dans le journal")
+        return
+    for name, stats in summary.items():
+        if not stats['rows']:
+            print(f"{name:<16} {stats['errors']:,} erreurs, aucune prédiction")
+            continue
+        print(f"{name:<16} {stats['rows']:>8,} lignes • écart moyen ${stats['mean_diff']:+,.0f} "
+              f"(|écart| ${stats['mean_abs_diff']:,.0f}, {stats['mean_abs_relative_diff']:.1%}, max ${stats['max_abs_diff']:,.0f}) "
+              f"• latence p50/p95 {stats['latency_p50_ms']:.2f}/{stats['latency_p95_ms']:.2f} ms "
+              f"vs principal {stats['primary_latency_p50_ms']:.2f}/{stats['primary_latency_p95_ms']:.2f} ms "
+              f"• {stats['errors']:,} erreurs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# model_reloader.py
+# Rechargement à chaud du modèle : surveillance des artefacts, chargement en arrière-plan,
+# prédiction de contrôle puis remplacement atomique, avec conservation des versions précédentes
+#
+# Utilisation :
+#   holder = ModelHolder()
+#   holder.reload()                # premier chargement (synchrone)
+#   holder.start()                 # surveillance des fichiers toutes les 2 s
+#   current = holder.current       # instantané cohérent (modèle, métadonnées, binder, version)
+#   holder.rollback()              # revenir instantanément à la version précédente
+#
+# Les lecteurs ne prennent aucun verrou : `current` est un seul attribut remplacé d'un bloc,
+# une session qui a lu la version N continue avec elle même si N+1 est installée entre-temps.
+# Un fichier en cours de copie n'est chargé qu'une fois sa taille et sa date stables sur
+# deux relevés consécutifs; un modèle qui échoue au chargement ou au contrôle n'est jamais installé.
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, FeatureBinder, default_feature_info, load_feature_info, load_model
+from metrics import METRICS
+from model_artifact import LATEST_FILE, load_artifact, resolve_artifact_dir
+from prediction_lattice import artifact_signature, model_signature
+from tree_evaluator import sample_features
+
+logger = logging.getLogger('model_reloader')
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_KEEP_VERSIONS = 3
+SMOKE_ROWS = 16
+
+
+class ModelVersion:
+    """Version chargée et validée : tout ce qu'une session utilise pour prédire"""
+
+    def __init__(self, key, model, feature_info, binder, source, signature, defaults_used=False, label=None):
+        self.key = key
+        self.label = label or key  # identifiant stable entre redémarrages (historique, journaux)
+        self.model = model
+        self.feature_info = feature_info
+        self.binder = binder
+        self.source = source
+        self.signature = signature
+        self.defaults_used = defaults_used
+        self.loaded_at = time.time()
+
+
+# Fonction pour vérifier qu'un modèle fraîchement chargé prédit correctement
+def smoke_test(model, feature_info, rows=SMOKE_ROWS):
+    """Lier le schéma et prédire quelques lignes; renvoie le FeatureBinder ou lève ValueError"""
+    binder = FeatureBinder(feature_info['feature_names'], model)
+    matrix = sample_features(feature_info, rows).to_numpy()
+    predictions = np.asarray(binder.predict(model, matrix))
+    if predictions.shape != (rows,) or not np.all(np.isfinite(predictions)):
+        raise ValueError("Prédiction de contrôle invalide (taille ou valeurs non finies)")
+    return binder
+
+
+class ModelHolder:
+    """Détient la version courante du modèle et la remplace sans bloquer les lecteurs"""
+
+    def __init__(self, model_path=MODEL_PATH, feature_info_path=FEATURE_INFO_PATH, artifact_dir=None,
+                 keep=DEFAULT_KEEP_VERSIONS):
+        self.model_path = model_path
+        self.feature_info_path = feature_info_path
+        self.artifact_dir = artifact_dir
+        self.last_error = None
+        self._current = None
+        self._history = deque(maxlen=keep)
+        self._sequence = 0
+        self._loaded_fingerprint = None
+        self._pending_fingerprint = None
+        self._lock = threading.Lock()  # sérialise chargements et retours arrière, pas les lectures
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        return self._current
+
+    def versions(self):
+        """Version courante puis versions conservées pour le retour arrière (plus récente d'abord)"""
+        current = self._current
+        return ([current] if current is not None else []) + list(self._history)
+
+    # Chargement
+
+    def fingerprint(self):
+        """Taille et date des fichiers surveillés (pointeur LATEST pour un artefact)"""
+        paths = [os.path.join(self.artifact_dir, LATEST_FILE)] if self.artifact_dir else \
+            [self.model_path, self.feature_info_path]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self):
+        """Charger, contrôler puis installer une nouvelle version; None (et last_error) en cas d'échec"""
+        with self._lock:
+            fingerprint = self.fingerprint()
+            started = time.perf_counter()
+            try:
+                version = self._load_version()
+            except Exception as e:  # un artefact défectueux ne doit jamais remplacer le modèle servi
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._loaded_fingerprint = fingerprint  # ne pas réessayer avant le prochain changement
+                METRICS.inc('model_reload_errors')
+                logger.warning("Nouvelle version du modèle rejetée: %s", self.last_error)
+                return None
+            self._loaded_fingerprint = fingerprint
+            self._install(version)
+            self.last_error = None
+            METRICS.inc('model_reloads')
+            METRICS.set_gauge('model_reload_seconds', time.perf_counter() - started)
+            logger.info("Version %s du modèle installée (%s)", version.key, version.source)
+            return version
+
+    def _load_version(self):
+        defaults_used = False
+        # Empreinte du modèle réellement chargé, comparée à celle enregistrée par la table précalculée
+        if self.artifact_dir:
+            directory = resolve_artifact_dir(self.artifact_dir)  # LATEST lu une seule fois
+            model, feature_info = load_artifact(directory)
+            signature = artifact_signature(directory)
+            source = f"artefact {model.version}"
+            label = model.version
+        else:
+            model = load_model(self.model_path)
+            if model is None:
+                raise FileNotFoundError(f"Fichier '{self.model_path}' non trouvé")
+            feature_info = load_feature_info(self.feature_info_path)
+            if feature_info is None:
+                feature_info = default_feature_info()
+                defaults_used = True
+            signature = model_signature(self.model_path)
+            source = self.model_path
+            label = f"{os.path.basename(self.model_path)}:{signature['sha256'][:12]}"
+        binder = smoke_test(model, feature_info)
+        self._sequence += 1
+        return ModelVersion(f"{self._sequence:04d}", model, feature_info, binder, source,
+                            signature, defaults_used, label)
+
+    def _install(self, version):
+        if self._current is not None:
+            self._history.appendleft(self._current)
+        self._current = version  # remplacement atomique : une seule affectation d'attribut
+
+    def rollback(self, key=None):
+        """Réinstaller une version conservée (la précédente par défaut); None si elle n'existe pas"""
+        with self._lock:
+            candidates = [version for version in self._history if key is None or version.key == key]
+            if not candidates:
+                return None
+            target = candidates[0]
+            self._history.remove(target)
+            self._install(target)
+            METRICS.inc('model_rollbacks')
+            logger.info("Retour à la version %s du modèle", target.key)
+            return target
+
+    # Surveillance
+
+    def poll(self):
+        """Recharger si les fichiers ont changé et sont stables depuis le relevé précédent"""
+        fingerprint = self.fingerprint()
+        if fingerprint == self._loaded_fingerprint:
+            self._pending_fingerprint = None
+            return None
+        if fingerprint != self._pending_fingerprint:
+            self._pending_fingerprint = fingerprint  # écriture possiblement en cours : attendre un relevé
+            return None
+        self._pending_fingerprint = None
+        return self.reload()
+
+    def start(self, interval=DEFAULT_POLL_INTERVAL):
+        """Démarrer le fil de surveillance (démon) s'il ne tourne pas déjà"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name='model-reloader', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Erreur de surveillance des artefacts du modèle")
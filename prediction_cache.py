@@ -0,0 +1,110 @@
+# prediction_cache.py
+# Cache borné des prédictions, indexé sur le vecteur normalisé des 9 features
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from house_model import MODEL_PATH
+
+DEFAULT_CACHE_SIZE = 4096
+EVICTION_POLICIES = ('lru', 'fifo')
+
+
+class PredictionCache:
+    """Cache LRU/FIFO des prix prédits avec compteurs et invalidation sur changement du modèle
+
+    La clé est le tuple des valeurs de la ligne, dans l'ordre des colonnes du modèle
+    (tampon NumPy de FeatureBinder ou DataFrame d'une ligne), préfixé par la version du modèle qui a
+    prédit (rechargement à chaud). Le cache est vidé dès que l'un des fichiers surveillés (par défaut
+    le modèle PKL) change de taille ou de date de modification.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, policy='lru', watched_paths=(MODEL_PATH,)):
+        if maxsize < 1:
+            raise ValueError("La taille du cache doit être au moins 1")
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Politique d'éviction inconnue: {policy} (attendu: {', '.join(EVICTION_POLICIES)})")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.watched_paths = tuple(watched_paths)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = self._source_signature()
+
+    @staticmethod
+    def make_key(features):
+        """Construire la clé normalisée à partir d'une ligne (tableau (1, n) ou DataFrame)"""
+        if hasattr(features, 'iloc'):
+            return tuple(float(value) for value in features.iloc[0])
+        return tuple(np.ravel(features).tolist())
+
+    def get_or_compute(self, features, compute, version=None):
+        """Renvoyer la prédiction en cache, ou appeler `compute()` et la mémoriser
+
+        `version` distingue les prédictions de deux versions du modèle servies en même temps.
+        """
+        key = (version, self.make_key(features))
+        with self._lock:
+            self._check_source()
+            if key in self._entries:
+                self.hits += 1
+                if self.policy == 'lru':
+                    self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        if value is None:
+            return value  # Ne pas mémoriser les erreurs de prédiction
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Compteurs du cache pour l'affichage et le suivi"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'policy': self.policy,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _source_signature(self):
+        signature = []
+        for path in self.watched_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _check_source(self):
+        signature = self._source_signature()
+        if signature != self._signature:
+            self._signature = signature
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
@@ -0,0 +1,228 @@
+# prediction_history.py
+# Historique des prédictions : file bornée en mémoire, écriture différée par lots dans SQLite (WAL)
+#
+# Consultation :
+#   python prediction_history.py --db prediction_history.db --limit 20
+#
+# Le chemin de requête ne fait qu'un dépôt non bloquant dans la file (la ligne est ignorée et
+# comptée si la file est pleine). Un thread unique vide la file et écrit chaque lot dans une
+# seule transaction; le mode WAL laisse les lectures de la vue historique se faire en parallèle.
+# La consultation ouvre la base en lecture seule : ni thread d'écriture, ni création du fichier.
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.request import pathname2url
+
+from metrics import METRICS
+
+logger = logging.getLogger('prediction_history')
+
+HISTORY_DB_PATH = 'prediction_history.db'
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    session_id TEXT,
+    model_version TEXT,
+    predicted_price REAL,
+    latency_ms REAL,
+    inputs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions (created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_session ON predictions (session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_version ON predictions (model_version, created_at);
+"""
+
+INSERT = ("INSERT INTO predictions (created_at, session_id, model_version, predicted_price, latency_ms, inputs) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+
+_STOP = object()
+
+
+# Fonction pour ouvrir une connexion configurée
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')  # durable au checkpoint, suffisant pour un historique
+    return connection
+
+
+# Fonction pour ouvrir une connexion en lecture seule (le fichier n'est jamais créé)
+def connect_read_only(path):
+    return sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True, timeout=30)
+
+
+class HistoryView:
+    """Lectures indexées de l'historique des prédictions, une connexion par thread"""
+
+    def __init__(self, path=HISTORY_DB_PATH, read_only=True):
+        self.path = path
+        self.read_only = read_only
+        self._readers = threading.local()
+
+    def _reader(self):
+        connection = getattr(self._readers, 'connection', None)
+        if connection is None:
+            connection = connect_read_only(self.path) if self.read_only else connect(self.path)
+            connection.row_factory = sqlite3.Row
+            self._readers.connection = connection
+        return connection
+
+    def recent(self, limit=50, session_id=None, model_version=None, since=None):
+        """Dernières prédictions (plus récentes d'abord), filtrées par session, version ou date"""
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append('session_id = ?')
+            params.append(session_id)
+        if model_version is not None:
+            clauses.append('model_version = ?')
+            params.append(model_version)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f"SELECT * FROM predictions {where} ORDER BY created_at DESC LIMIT ?", params + [limit]
+        ).fetchall()
+        return [dict(row, inputs=json.loads(row['inputs'])) for row in rows]
+
+    def stats_by_version(self, since=None):
+        """Nombre de prédictions, prix moyen et latence moyenne par version du modèle"""
+        where, params = ('WHERE created_at >= ?', [since]) if since is not None else ('', [])
+        rows = self._reader().execute(
+            f"SELECT model_version, COUNT(*) AS predictions, AVG(predicted_price) AS mean_price, "
+            f"AVG(latency_ms) AS mean_latency_ms, MAX(created_at) AS last_at "
+            f"FROM predictions {where} GROUP BY model_version ORDER BY last_at DESC", params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class PredictionHistory(HistoryView):
+    """Historique persistant des prédictions, écrit en arrière-plan par lots"""
+
+    def __init__(self, path=HISTORY_DB_PATH, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(path, read_only=False)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+
+        # Schéma créé avant le démarrage de l'écrivain : les lectures sont possibles immédiatement
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+
+        self._thread = threading.Thread(target=self._run, name='prediction-history', daemon=True)
+        self._thread.start()
+
+    # Chemin de requête
+
+    def record(self, user_inputs, predicted_price, model_version=None, latency=None, session_id=None):
+        """Déposer une prédiction dans la file sans attendre; False si la file est pleine"""
+        row = (time.time(), session_id, model_version, predicted_price,
+               latency * 1000 if latency is not None else None, dict(user_inputs))
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            METRICS.inc('history_dropped')
+            return False
+        return True
+
+    # Écriture différée
+
+    def _run(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(row is _STOP for row in batch)
+                rows = [row for row in batch if row is not _STOP]
+                if rows:
+                    self._write(connection, rows)
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, connection, rows):
+        started = time.perf_counter()
+        try:
+            with connection:  # une transaction par lot
+                connection.executemany(INSERT, [
+                    (created_at, session_id, model_version,
+                     float(price) if price is not None else None, latency_ms,
+                     json.dumps(inputs, default=float))
+                    for created_at, session_id, model_version, price, latency_ms, inputs in rows
+                ])
+        except sqlite3.Error:
+            METRICS.inc('history_errors')
+            logger.exception("Écriture de %d prédictions impossible", len(rows))
+            return
+        self.written += len(rows)
+        METRICS.observe('history_flush', time.perf_counter() - started)
+        METRICS.inc('history_rows', len(rows))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Attendre que toutes les prédictions déposées soient écrites"""
+        self._queue.join()
+
+    def close(self):
+        """Écrire ce qui reste puis arrêter le thread d'écriture"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consulter l'historique des prédictions")
+    parser.add_argument('--db', default=HISTORY_DB_PATH)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--session', help="Filtrer sur une session")
+    parser.add_argument('--version', help="Filtrer sur une version du modèle")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.db):
+        raise SystemExit(f"Fichier '{args.db}' non trouvé")
+    history = HistoryView(args.db)
+    for row in history.stats_by_version():
+        print(f"Version {row['model_version']}: {row['predictions']:,} prédictions • prix moyen "
+              f"${row['mean_price'] or 0:,.0f} • latence moyenne {row['mean_latency_ms'] or 0:.2f} ms")
+    for row in history.recent(args.limit, args.session, args.version):
+        created_at = datetime.fromtimestamp(row['created_at']).isoformat(timespec='seconds')
+        print(f"{created_at}  {row['model_version'] or '-':>6}  ${row['predicted_price'] or 0:>10,.0f}  "
+              f"{row['latency_ms'] or 0:7.2f} ms  {json.dumps(row['inputs'])}")
+
+
+if __name__ == '__main__':
+    main()
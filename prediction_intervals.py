@@ -0,0 +1,212 @@
+# prediction_intervals.py
+# Intervalles de prédiction par propriété, calculés à partir des arbres de l'ensemble en une passe vectorisée
+#
+# Mesure du surcoût par rapport à une prédiction simple :
+#   python prediction_intervals.py --rows 10000 --repeat 200
+#
+# - Forêt aléatoire : chaque arbre est un prédicteur complet, l'intervalle est donné par
+#   les quantiles des prédictions des arbres.
+# - Boosting (XGBoost) : les arbres sont additifs, un arbre seul ne prédit pas le prix.
+#   On tire une fois pour toutes des sous-ensembles aléatoires d'arbres (dropout, remis à
+#   l'échelle); les prédictions rééchantillonnées sont un produit matriciel des valeurs des
+#   arbres par la matrice des masques.
+#
+# Calibration (train_model.py) : sur des ventes de test jamais vues à l'entraînement, la
+# dispersion est mise à l'échelle (conformal split) pour atteindre la couverture visée sur une
+# moitié des lignes, puis la couverture réelle est mesurée sur l'autre moitié. Le facteur et la
+# couverture mesurée sont enregistrés dans feature_info['interval_calibration'].
+# Sans cette calibration (modèle livré), la demi-largeur médiane sur un échantillon synthétique
+# est seulement ramenée au RMSE de test : la couverture n'est alors pas garantie et
+# `empirical_coverage` vaut None.
+
+import argparse
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, default_feature_info, load_feature_info, load_model
+from tree_evaluator import DEFAULT_BLOCK_SIZE, TreeEnsemble, sample_features
+
+DEFAULT_COVERAGE = 0.90
+DEFAULT_RESAMPLES = 200
+DEFAULT_KEEP_FRACTION = 0.5
+DEFAULT_REFERENCE_ROWS = 2048
+
+
+class IntervalEstimator:
+    """Intervalles de prédiction [bas, haut] au niveau `coverage` à partir d'un TreeEnsemble"""
+
+    def __init__(self, ensemble, coverage=DEFAULT_COVERAGE, resamples=DEFAULT_RESAMPLES,
+                 keep_fraction=DEFAULT_KEEP_FRACTION, seed=0):
+        if not 0 < coverage < 1:
+            raise ValueError("Le niveau de couverture doit être compris entre 0 et 1")
+        self.ensemble = ensemble
+        self.coverage = coverage
+        self.quantiles = ((1 - coverage) / 2, (1 + coverage) / 2)
+        self.method = 'forest_quantiles' if ensemble.kind == 'forest' else 'tree_dropout'
+        self.resamples = resamples
+        self.keep_fraction = keep_fraction
+        self.seed = seed
+        self.calibration = 1.0
+        self.empirical_coverage = None  # couverture mesurée sur des ventes de test, si calibré
+
+        # Masques de dropout (n_arbres, n_tirages), remis à l'échelle 1/keep_fraction
+        self.masks = None
+        if self.method == 'tree_dropout':
+            rng = np.random.default_rng(seed)
+            keep = rng.random((ensemble.n_trees, resamples)) < keep_fraction
+            self.masks = keep / keep_fraction
+
+    @classmethod
+    def from_model(cls, model, feature_info, reference_rows=DEFAULT_REFERENCE_ROWS, **kwargs):
+        """Aplatir le modèle et reprendre la calibration enregistrée, sinon l'approcher par le RMSE de test"""
+        estimator = cls(TreeEnsemble.from_model(model, feature_info['feature_names']), **kwargs)
+        stored = feature_info.get('interval_calibration')
+        if stored and all(stored.get(key) == value for key, value in estimator.settings().items()):
+            estimator.calibration = stored['factor']
+            estimator.empirical_coverage = stored['empirical_coverage']
+            return estimator
+        rmse = feature_info.get('rmse_score')
+        if estimator.method == 'tree_dropout' and rmse:
+            estimator.calibrate(sample_features(feature_info, reference_rows), rmse)
+        return estimator
+
+    def settings(self):
+        """Paramètres dont dépend un facteur de calibration enregistré"""
+        return {'method': self.method, 'coverage': self.coverage, 'resamples': self.resamples,
+                'keep_fraction': self.keep_fraction, 'seed': self.seed}
+
+    def calibrate_holdout(self, X, y):
+        """Calibrer sur des ventes de test (X, y) puis mesurer la couverture réelle
+
+        Les lignes paires fixent le facteur (quantile conformal des écarts rapportés à la
+        demi-largeur brute du côté concerné), les lignes impaires mesurent la couverture obtenue.
+        Renvoie le dictionnaire à enregistrer dans feature_info['interval_calibration'].
+        """
+        X = self.ensemble.as_matrix(X)
+        y = np.asarray(y, dtype=float)
+        if len(y) < 20:
+            raise ValueError("Au moins 20 ventes de test sont nécessaires pour calibrer les intervalles")
+        fit, check = slice(0, None, 2), slice(1, None, 2)
+
+        self.calibration = 1.0
+        predictions, lower, upper = self.predict_interval(X[fit])
+        below = y[fit] < predictions
+        spread = np.where(below, predictions - lower, upper - predictions)
+        gap = np.abs(y[fit] - predictions)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(spread > 0, gap / spread, np.where(gap > 0, np.inf, 0.0))
+        n = len(scores)
+        rank = min(int(np.ceil((n + 1) * self.coverage)), n) - 1
+        factor = float(np.sort(scores)[rank])
+        if not np.isfinite(factor):
+            raise ValueError("Dispersion des arbres nulle sur trop de ventes : intervalle non calibrable")
+        self.calibration = factor
+
+        _, lower, upper = self.predict_interval(X[check])
+        self.empirical_coverage = float(np.mean((y[check] >= lower) & (y[check] <= upper)))
+        return {**self.settings(), 'factor': factor, 'empirical_coverage': self.empirical_coverage,
+                'rows': int(len(y[check]))}
+
+    def calibrate(self, X, rmse):
+        """Mettre à l'échelle la dispersion pour que la demi-largeur médiane vaille z * rmse (sans garantie de couverture)"""
+        self.calibration = 1.0
+        self.empirical_coverage = None
+        predictions, lower, upper = self.predict_interval(X)
+        half_width = float(np.median((upper - lower) / 2))
+        if half_width > 0:
+            z = NormalDist().inv_cdf(self.quantiles[1])
+            self.calibration = z * rmse / half_width
+        return self.calibration
+
+    def predict_interval(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Renvoyer (prédiction, borne basse, borne haute) pour une ligne ou un lot"""
+        X = self.ensemble.as_matrix(X)
+        predictions = np.empty(len(X))
+        lower = np.empty(len(X))
+        upper = np.empty(len(X))
+        for start in range(0, len(X), block_size):
+            block = slice(start, start + block_size)
+            predictions[block], lower[block], upper[block] = self._interval_block(X[block])
+        return np.maximum(predictions, 0), np.maximum(lower, 0), np.maximum(upper, 0)
+
+    def _interval_block(self, X):
+        ensemble = self.ensemble
+        tree_values = ensemble.tree_values(X)  # (n_lignes, n_arbres) : tous les arbres en une passe
+        predictions = ensemble.offset + ensemble.scale * tree_values.sum(axis=1)
+
+        if self.method == 'forest_quantiles':
+            members = ensemble.offset + tree_values
+        else:
+            members = ensemble.offset + ensemble.scale * (tree_values @ self.masks)
+
+        low, high = _row_quantiles(members, self.quantiles)
+        lower = predictions - self.calibration * np.maximum(predictions - low, 0)
+        upper = predictions + self.calibration * np.maximum(high - predictions, 0)
+        return predictions, lower, upper
+
+
+def _row_quantiles(members, quantiles):
+    """Quantiles par ligne (interpolation linéaire, comme np.quantile) via un seul tri"""
+    members = np.sort(members, axis=1)
+    last = members.shape[1] - 1
+    result = []
+    for q in quantiles:
+        position = q * last
+        low = int(position)
+        fraction = position - low
+        result.append(members[:, low] * (1 - fraction) + members[:, min(low + 1, last)] * fraction)
+    return result
+
+
+# Fonction pour mesurer le surcoût par rapport à une prédiction simple
+def measure_overhead(estimator, X, repeat=200):
+    """Latences moyennes (µs par appel) de predict et de predict_interval sur X"""
+    timings = {}
+    for name, fn in (('predict', estimator.ensemble.predict_native), ('predict_interval', estimator.predict_interval)):
+        fn(X)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn(X)
+        timings[name] = (time.perf_counter() - started) / repeat * 1e6
+    timings['overhead_ratio'] = timings['predict_interval'] / timings['predict']
+    return timings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Intervalles de prédiction par les arbres de l'ensemble")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--coverage', type=float, default=DEFAULT_COVERAGE, help="Niveau de l'intervalle (0.90 = 90%%)")
+    parser.add_argument('--rows', type=int, default=10_000, help="Taille du lot mesuré")
+    parser.add_argument('--repeat', type=int, default=200)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model = load_model(args.model)
+    if model is None:
+        raise SystemExit(f"Fichier '{args.model}' non trouvé")
+    feature_info = load_feature_info(args.feature_info) or default_feature_info()
+
+    estimator = IntervalEstimator.from_model(model, feature_info, coverage=args.coverage)
+    measured = (f"couverture mesurée {estimator.empirical_coverage:.1%}" if estimator.empirical_coverage is not None
+                else "couverture non mesurée (modèle non calibré par train_model.py)")
+    print(f"Méthode : {estimator.method} • niveau {estimator.coverage:.0%} • {measured} "
+          f"• calibration x{estimator.calibration:.2f}")
+
+    X = sample_features(feature_info, args.rows, seed=1).to_numpy()
+    predictions, lower, upper = estimator.predict_interval(X)
+    print(f"Demi-largeur médiane : ${np.median((upper - lower) / 2):,.0f} "
+          f"(min ${np.min((upper - lower) / 2):,.0f}, max ${np.max((upper - lower) / 2):,.0f})")
+
+    for rows, repeat in ((1, args.repeat), (args.rows, max(3, args.repeat // 50))):
+        timings = measure_overhead(estimator, X[:rows], repeat)
+        print(f"{rows:>7} lignes : predict {timings['predict']:10.1f} µs • "
+              f"predict_interval {timings['predict_interval']:10.1f} µs • surcoût x{timings['overhead_ratio']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
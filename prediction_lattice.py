@@ -0,0 +1,259 @@
+# prediction_lattice.py
+# Table de prédictions précalculée sur la grille du formulaire, partagée en mémoire mappée
+#
+# Construction hors ligne :
+#   python prediction_lattice.py --output prediction_lattice --step GrLivArea=250 --values FullBath=1,2,3
+#   python prediction_lattice.py --artifact model_artifacts     # table du modèle servi en artefact
+#
+# Le manifeste enregistre l'empreinte du modèle évalué (contenu du PKL ou manifeste de l'artefact) :
+# une table n'est utilisée que pour ce modèle exact.
+#
+# Seuls les nœuds exacts de la grille sont servis : le modèle est une somme d'arbres constante
+# par morceaux, une interpolation entre nœuds s'en écarte (jusqu'à ~12 % mesuré avec les pas
+# par défaut). Toute valeur hors des nœuds renvoie None et l'appelant interroge le modèle.
+
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, default_feature_info, load_feature_info, load_model, predict_matrix
+from model_artifact import MANIFEST_FILE as ARTIFACT_MANIFEST_FILE, file_sha256, load_artifact, resolve_artifact_dir
+
+LATTICE_DIR = 'prediction_lattice'
+VALUES_FILE = 'lattice.npy'
+MANIFEST_FILE = 'lattice.json'
+FORMAT_VERSION = 2
+
+# Surface de garage estimée par place, comme dans le formulaire
+GARAGE_AREA_PER_CAR = 250
+
+# Grille du formulaire : valeurs exactes pour les axes discrets, (début, fin, pas) pour les axes continus
+# (les valeurs par défaut et les valeurs rondes du formulaire tombent sur des nœuds; --step pour affiner)
+DISCRETE_AXES = {
+    'OverallQual': list(range(1, 11)),
+    'GarageCars': list(range(0, 5)),
+    'FullBath': list(range(1, 5)),
+    'TotRmsAbvGrd': list(range(3, 16)),
+    'Fireplaces': list(range(0, 4))
+}
+CONTINUOUS_AXES = {
+    'GrLivArea': (500, 5000, 500),
+    'TotalBsmtSF': (0, 3000, 500),
+    'YearBuilt': (1900, 2024, 10)
+}
+
+
+# Fonction pour générer les nœuds d'un axe continu
+def continuous_nodes(start, stop, step):
+    """Nœuds de start à stop par pas de step, en incluant toujours la borne finale"""
+    nodes = list(np.arange(start, stop + 1e-9, step, dtype=float))
+    if nodes[-1] < stop:
+        nodes.append(float(stop))
+    return nodes
+
+
+# Fonction pour décrire les axes de la table
+def build_axes(steps=None, values=None):
+    """Construire la liste des axes, avec pas continus et sous-ensembles discrets optionnels"""
+    steps = steps or {}
+    values = values or {}
+    axes = []
+    for feature, options in DISCRETE_AXES.items():
+        selected = values.get(feature, options)
+        axes.append({'feature': feature, 'values': [float(v) for v in selected], 'continuous': False})
+    for feature, (start, stop, step) in CONTINUOUS_AXES.items():
+        axes.append({
+            'feature': feature,
+            'values': continuous_nodes(start, stop, steps.get(feature, step)),
+            'continuous': True
+        })
+    return axes
+
+
+# Fonction pour évaluer le modèle sur toute la grille
+def build_lattice(model, feature_names, output_dir=LATTICE_DIR, steps=None, values=None,
+                  block_size=1_000_000, signature=None):
+    """Évaluer le modèle sur la grille, par blocs, et écrire la table .npy + son manifeste
+
+    Les deux fichiers sont écrits dans un répertoire temporaire mis en place par renommage :
+    un serveur qui a l'ancienne table en mémoire mappée garde ses pages (le fichier supprimé
+    reste lisible), et un lecteur ne voit jamais la nouvelle table sous l'ancien manifeste.
+    """
+    axes = build_axes(steps, values)
+    output_dir = os.path.normpath(output_dir)
+    tmp_dir = f'{output_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        manifest = _write_lattice(model, feature_names, tmp_dir, axes, block_size, signature)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Un répertoire non vide ne peut pas être remplacé directement : l'ancien est d'abord écarté
+    old_dir = f'{output_dir}.old-{os.getpid()}'
+    if os.path.isdir(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def _write_lattice(model, feature_names, directory, axes, block_size, signature):
+    shape = tuple(len(axis['values']) for axis in axes)
+    axis_values = [np.asarray(axis['values']) for axis in axes]
+    position = {axis['feature']: i for i, axis in enumerate(axes)}
+    table = np.lib.format.open_memmap(
+        os.path.join(directory, VALUES_FILE), mode='w+', dtype=np.float32, shape=shape
+    )
+    flat_table = table.reshape(-1)
+    total = flat_table.size
+
+    # Écrire par blocs pour borner la mémoire pendant la construction
+    for start in range(0, total, block_size):
+        flat_index = np.arange(start, min(start + block_size, total))
+        multi_index = np.unravel_index(flat_index, shape)
+        matrix = np.empty((len(flat_index), len(feature_names)))
+        for column, feature in enumerate(feature_names):
+            if feature == 'GarageArea':
+                cars = axis_values[position['GarageCars']][multi_index[position['GarageCars']]]
+                matrix[:, column] = cars * GARAGE_AREA_PER_CAR
+            else:
+                matrix[:, column] = axis_values[position[feature]][multi_index[position[feature]]]
+        flat_table[start:start + len(flat_index)] = predict_matrix(model, matrix, feature_names)
+    table.flush()
+    del table, flat_table
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'model_signature': signature if signature is not None else model_signature(),
+        'feature_names': list(feature_names),
+        'axes': axes,
+        'derived': {'GarageArea': {'from': 'GarageCars', 'factor': GARAGE_AREA_PER_CAR}},
+        'shape': list(shape)
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# Fonction pour identifier un modèle PKL ayant servi à la construction
+def model_signature(model_path=MODEL_PATH):
+    """Empreinte SHA-256 du contenu du fichier modèle, ou None s'il est absent"""
+    try:
+        return {'source': 'pkl', 'sha256': file_sha256(model_path)}
+    except OSError:
+        return None
+
+
+# Fonction pour identifier un artefact ayant servi à la construction
+def artifact_signature(path):
+    """Empreinte SHA-256 du manifeste de l'artefact (qui contient celles de ses tableaux)"""
+    return {'source': 'artifact', 'sha256': file_sha256(os.path.join(resolve_artifact_dir(path), ARTIFACT_MANIFEST_FILE))}
+
+
+class PredictionLattice:
+    """Table de prédictions en mémoire mappée, lue en O(1) sans appel au modèle
+
+    Le tableau est ouvert en lecture seule avec mmap: tous les processus qui
+    l'ouvrent partagent les mêmes pages du cache disque.
+    """
+
+    def __init__(self, table, manifest):
+        self.table = table
+        self.manifest = manifest
+        self.axes = manifest['axes']
+        self.derived = manifest.get('derived', {})
+        self._node_index = [{value: i for i, value in enumerate(axis['values'])} for axis in self.axes]
+
+    @classmethod
+    def load(cls, directory=LATTICE_DIR):
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Version de table non supportée: {manifest.get('format_version')}")
+        table = np.load(os.path.join(directory, VALUES_FILE), mmap_mode='r')
+        if list(table.shape) != manifest['shape']:
+            raise ValueError(f"Table {table.shape} incohérente avec son manifeste {manifest['shape']}")
+        return cls(table, manifest)
+
+    def matches(self, signature):
+        """Vérifier que la table a été construite avec le modèle de cette empreinte"""
+        return signature is not None and self.manifest.get('model_signature') == signature
+
+    def lookup(self, features):
+        """Prix exact du modèle pour un mapping feature -> valeur, ou None hors des nœuds de la grille"""
+        for feature, rule in self.derived.items():
+            if float(features[feature]) != float(features[rule['from']]) * rule['factor']:
+                return None
+
+        index = []
+        for axis, nodes in zip(self.axes, self._node_index):
+            position = nodes.get(float(features[axis['feature']]))
+            if position is None:
+                return None
+            index.append(position)
+        return float(self.table[tuple(index)])
+
+
+def _parse_assignments(items, cast):
+    parsed = {}
+    for item in items or []:
+        feature, _, raw = item.partition('=')
+        if not raw:
+            raise argparse.ArgumentTypeError(f"Format attendu FEATURE=VALEUR: {item}")
+        parsed[feature] = cast(raw)
+    return parsed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Construire la table de prédictions précalculée")
+    parser.add_argument('--output', default=LATTICE_DIR, help="Répertoire de sortie")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--artifact', help="Répertoire d'artefact sans pickle (prioritaire sur --model)")
+    parser.add_argument('--step', action='append', metavar='FEATURE=PAS',
+                        help=f"Pas d'un axe continu ({', '.join(CONTINUOUS_AXES)})")
+    parser.add_argument('--values', action='append', metavar='FEATURE=V1,V2',
+                        help=f"Sous-ensemble d'un axe discret ({', '.join(DISCRETE_AXES)})")
+    parser.add_argument('--block-size', type=int, default=1_000_000, help="Lignes prédites par bloc")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    steps = _parse_assignments(args.step, float)
+    values = _parse_assignments(args.values, lambda raw: [float(v) for v in raw.split(',')])
+    unknown = (set(steps) - set(CONTINUOUS_AXES)) | (set(values) - set(DISCRETE_AXES))
+    if unknown:
+        raise SystemExit(f"Axes inconnus: {', '.join(sorted(unknown))}")
+
+    if args.artifact:
+        try:
+            directory = resolve_artifact_dir(args.artifact)
+            model, feature_info = load_artifact(directory)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"Artefact '{args.artifact}' illisible: {e}")
+        signature = artifact_signature(directory)
+    else:
+        model = load_model(args.model)
+        if model is None:
+            raise SystemExit(f"Fichier '{args.model}' non trouvé")
+        feature_info = load_feature_info(args.feature_info) or default_feature_info()
+        signature = model_signature(args.model)
+
+    started = datetime.now()
+    manifest = build_lattice(model, feature_info['feature_names'], args.output, steps, values,
+                             args.block_size, signature)
+    cells = int(np.prod(manifest['shape']))
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ {cells:,} prédictions écrites dans {args.output}/{VALUES_FILE} en {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+# prediction_server.py
+# Service HTTP asyncio sans navigateur, avec micro-batching des requêtes unitaires
+#
+# Lancement : python prediction_server.py --port 8080 --batch-window-ms 5
+#
+#   GET  /health         -> état du service
+#   GET  /ready          -> 200 une fois le préchauffage terminé, 503 avant (et pendant l'arrêt progressif)
+#   POST /predict        -> {"OverallQual": 7, "GrLivArea": 1500, ...} -> {"prediction": ...}
+#   POST /predict/batch  -> {"rows": [{...}, {...}]}                  -> {"predictions": [...]}
+#   GET  /metrics        -> métriques au format texte Prometheus
+#   GET  /drift          -> dérive des entrées et des prédictions (tous les workers avec --drift-dir)
+#
+# Les lignes acceptent les noms de features du modèle (GrLivArea) ou les champs
+# du formulaire Streamlit (gr_liv_area).
+#
+# Préchauffage : le service écoute immédiatement (/health répond), puis exécute une prédiction
+# synthétique (unitaire et par lot) avant de répondre prêt sur /ready. Les durées de chargement
+# et de préchauffage sont exportées à part (jauges house_warmup_*_seconds), hors des histogrammes
+# de latence.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from house_model import (
+    FEATURE_INFO_PATH,
+    MODEL_PATH,
+    default_feature_info,
+    load_feature_info,
+    load_model,
+    predict_matrix,
+    row_to_vector,
+)
+from drift_monitor import DriftMonitor, load_merged
+from metrics import METRICS, PROMETHEUS_CONTENT_TYPE, Readiness
+from model_artifact import load_artifact
+from tree_evaluator import sample_features
+
+logger = logging.getLogger('prediction_server')
+
+DEFAULT_BATCH_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH_SIZE = 512
+MAX_BODY_BYTES = 64 * 1024 * 1024
+DRIFT_SAVE_INTERVAL = 10.0
+WARMUP_ROWS = 64
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    """Erreur renvoyée au client avec un code HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """Regroupe les prédictions unitaires concurrentes en un seul appel model.predict
+
+    Chaque requête attend au plus `window_ms` millisecondes que d'autres lignes
+    la rejoignent; le lot est envoyé dès que `max_batch_size` lignes sont réunies.
+    """
+
+    def __init__(self, predict_fn, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.rows = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, vector):
+        """Ajouter une ligne au prochain lot et attendre sa prédiction"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((vector, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Prédire le lot hors de la boucle d'événements pour continuer à accepter des requêtes
+            matrix = np.array([vector for vector, _ in batch], dtype=float)
+            try:
+                predictions = await loop.run_in_executor(None, self.predict_fn, matrix)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(float(prediction))
+
+
+class PredictionServer:
+    """Serveur HTTP/1.1 minimal (keep-alive) exposant le modèle chargé une seule fois"""
+
+    def __init__(self, model, feature_info, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 drift_state_path=None, readiness=None):
+        self.model = model
+        self.feature_info = feature_info
+        self.feature_names = list(feature_info['feature_names'])
+        self.batcher = MicroBatcher(self.predict_matrix, window_ms, max_batch_size)
+        self.in_flight = 0
+        self.draining = False
+        self.readiness = readiness if readiness is not None else Readiness()
+        self._server = None
+        self._warmup_task = None
+        # Dérive : état propre à ce processus, enregistré pour la vue fusionnée de tous les workers
+        self.drift = DriftMonitor.for_model(feature_info)
+        self.drift_state_path = drift_state_path
+        self._drift_task = None
+        if drift_state_path and os.path.exists(drift_state_path):
+            try:
+                with open(drift_state_path) as f:
+                    self.drift.merge(DriftMonitor.from_dict(json.load(f)))  # reprise après redémarrage
+            except (OSError, ValueError, KeyError):
+                logger.warning("État de dérive '%s' illisible, ignoré", drift_state_path)
+
+    def predict_matrix(self, matrix):
+        with METRICS.span('prediction'):
+            predictions = predict_matrix(self.model, matrix, self.feature_names)
+        METRICS.inc('predictions', len(predictions))
+        self.drift.update(matrix, predictions)
+        return predictions
+
+    async def start(self, host='127.0.0.1', port=8080, sock=None):
+        """Démarrer l'écoute sur host:port, ou sur un socket déjà ouvert"""
+        self.batcher.start()
+        if self.drift_state_path:
+            os.makedirs(os.path.dirname(self.drift_state_path) or '.', exist_ok=True)
+            self._drift_task = asyncio.get_running_loop().create_task(self._save_drift_periodically())
+        if sock is not None:
+            self._server = await asyncio.start_server(self._handle_connection, sock=sock)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        if not self.readiness.ready:
+            self._warmup_task = asyncio.get_running_loop().create_task(self._warm_up())
+        return self._server
+
+    def warm_up(self):
+        """Prédiction synthétique hors métriques de latence et hors surveillance de dérive"""
+        self.readiness.warm_up([('prediction', lambda: warm_up_model(self.model, self.feature_info))])
+
+    async def _warm_up(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+        except Exception:
+            logger.exception("Préchauffage impossible, le service reste non prêt")
+            return
+        logger.info("Service prêt (préchauffage %.3f s)", sum(self.readiness.stages.values()))
+
+    async def stop(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+        self.stop_drift()
+
+    def stop_drift(self):
+        """Arrêter l'enregistrement périodique et écrire l'état final"""
+        if self._drift_task is not None:
+            self._drift_task.cancel()
+            self._drift_task = None
+            self.drift.save(self.drift_state_path)
+
+    async def _save_drift_periodically(self):
+        while True:
+            await asyncio.sleep(DRIFT_SAVE_INTERVAL)
+            self.drift.save(self.drift_state_path)
+
+    def drift_report(self):
+        """Indicateurs de dérive de ce processus, ou de tous les workers partageant le répertoire d'état"""
+        monitor = self.drift
+        if self.drift_state_path:
+            self.drift.save(self.drift_state_path)
+            monitor = load_merged(os.path.dirname(self.drift_state_path) or '.', self.feature_info)
+        return {'rows': monitor.rows, 'reference': monitor.reference is not None, 'columns': monitor.scores()}
+
+    async def drain(self, timeout=30.0):
+        """Arrêter d'accepter des connexions et attendre la fin des requêtes en cours"""
+        self.draining = True
+        if self._server is not None:
+            self._server.close()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.in_flight and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        return self.in_flight == 0
+
+    async def serve_forever(self, host='127.0.0.1', port=8080, sock=None):
+        server = await self.start(host, port, sock)
+        for address in (s.getsockname() for s in server.sockets):
+            logger.info("Service de prédiction à l'écoute sur %s", address)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.stop()
+
+    # Routage des requêtes
+
+    async def handle_request(self, method, path, body):
+        """Traiter une requête et renvoyer (statut, payload JSON)"""
+        if path == '/health':
+            return 200, {
+                'status': 'draining' if self.draining else 'ok',
+                'ready': self.readiness.ready,
+                'pid': os.getpid(),
+                'features': self.feature_names,
+                'batches': self.batcher.batches,
+                'batched_rows': self.batcher.rows
+            }
+
+        if path == '/ready':
+            if self.draining:
+                return 503, {**self.readiness.status(), 'status': 'draining'}
+            return (200 if self.readiness.ready else 503), self.readiness.status()
+
+        if path == '/metrics':
+            return 200, METRICS.render_prometheus()
+
+        if path == '/drift':
+            return 200, await asyncio.get_running_loop().run_in_executor(None, self.drift_report)
+
+        if path not in ('/predict', '/predict/batch'):
+            raise HTTPError(404, f"Route inconnue: {path}")
+        if method != 'POST':
+            raise HTTPError(405, "Utiliser POST")
+
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            raise HTTPError(400, "Corps JSON invalide")
+
+        if path == '/predict' and isinstance(payload, dict) and 'rows' not in payload:
+            vector = self._parse_row(payload)
+            return 200, {'prediction': await self.batcher.submit(vector)}
+
+        # Lot explicite : un seul appel model.predict, sans fenêtre d'attente
+        rows = payload.get('rows') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not rows:
+            raise HTTPError(400, "Attendu: {\"rows\": [...]} avec au moins une ligne")
+        matrix = np.array([self._parse_row(row) for row in rows], dtype=float)
+        predictions = await asyncio.get_running_loop().run_in_executor(None, self.predict_matrix, matrix)
+        return 200, {'predictions': [float(p) for p in predictions]}
+
+    def _parse_row(self, row):
+        if not isinstance(row, dict):
+            raise HTTPError(400, "Chaque ligne doit être un objet JSON")
+        try:
+            return row_to_vector(row, self.feature_names)
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+
+    # Protocole HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._write_response(writer, 400, {'error': 'Requête HTTP invalide'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._write_response(writer, 400, {'error': 'En-tête Content-Length invalide'}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._write_response(writer, 413, {'error': 'Corps trop volumineux'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                self.in_flight += 1
+                try:
+                    try:
+                        status, payload = await self.handle_request(method.upper(), path.split('?', 1)[0], body)
+                    except HTTPError as e:
+                        status, payload = e.status, {'error': str(e)}
+                    except Exception as e:
+                        METRICS.inc('prediction_errors')
+                        logger.exception("Erreur lors de la prédiction")
+                        status, payload = 500, {'error': f"Erreur lors de la prédiction: {str(e)}"}
+                    await self._write_response(writer, status, payload, keep_alive and not self.draining)
+                finally:
+                    self.in_flight -= 1
+                if not keep_alive or self.draining:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write_response(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), PROMETHEUS_CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+# Fonction pour exécuter une première prédiction avant d'accepter du trafic
+def warm_up_model(model, feature_info, rows=WARMUP_ROWS):
+    """Prédire une ligne puis un lot synthétiques (initialisation paresseuse du prédicteur)"""
+    feature_names = list(feature_info['feature_names'])
+    matrix = sample_features(feature_info, rows).to_numpy()
+    predict_matrix(model, matrix[:1], feature_names)
+    predictions = predict_matrix(model, matrix, feature_names)
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError("Prédiction de préchauffage invalide (valeurs non finies)")
+
+
+# Fonction pour charger les artefacts comme load_real_models, sans Streamlit
+def load_artifacts(model_path=MODEL_PATH, feature_info_path=FEATURE_INFO_PATH, artifact_path=None):
+    """Charger le modèle et les métadonnées une seule fois pour tout le processus"""
+    if artifact_path:
+        return load_artifact(artifact_path)
+    model = load_model(model_path)
+    if model is None:
+        raise FileNotFoundError(f"Fichier '{model_path}' non trouvé")
+    feature_info = load_feature_info(feature_info_path)
+    if feature_info is None:
+        logger.warning("Fichier '%s' non trouvé, utilisation des valeurs par défaut", feature_info_path)
+        feature_info = default_feature_info()
+    return model, feature_info
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP de prédiction des prix immobiliers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model', default=MODEL_PATH, help="Chemin du modèle PKL")
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH, help="Chemin des métadonnées PKL")
+    parser.add_argument('--artifact', help="Répertoire d'artefact sans pickle (prioritaire sur --model)")
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="Fenêtre de regroupement des requêtes unitaires (ms)")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Nombre maximal de lignes par appel model.predict")
+    parser.add_argument('--drift-dir', help="Répertoire où enregistrer l'état de la surveillance de dérive")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    readiness = Readiness()
+    started = time.perf_counter()
+    model, feature_info = load_artifacts(args.model, args.feature_info, args.artifact)
+    readiness.record('model_load', time.perf_counter() - started)
+    drift_state_path = os.path.join(args.drift_dir, f'server-{args.port}.json') if args.drift_dir else None
+    server = PredictionServer(model, feature_info, args.batch_window_ms, args.max_batch_size, drift_state_path,
+                              readiness)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
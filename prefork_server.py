@@ -0,0 +1,254 @@
+# prefork_server.py
+# Service de prédiction multi-processus : un superviseur charge le modèle une fois puis forke N workers
+#
+# Lancement :
+#   python prefork_server.py --workers 8 --port 8080 --artifact model_artifacts
+#
+# - Le modèle est chargé avant le fork : les workers partagent ses pages en copie sur écriture
+#   (gc.freeze évite que le ramasse-miettes ne les duplique). Avec un artefact mmap
+#   (model_artifact.py) les tableaux sont de plus partagés via le cache disque.
+# - Chaque worker prédit avec --threads-per-worker threads XGBoost (1 par défaut) : N workers
+#   se partagent les cœurs au lieu d'ouvrir chacun un thread OpenMP par cœur.
+# - Tous les workers acceptent sur le même socket d'écoute : le noyau répartit les connexions.
+# - Chaque worker publie un battement de cœur; le superviseur tue et remplace un worker
+#   muet ou terminé anormalement.
+# - SIGTERM/SIGINT : arrêt progressif, chaque worker cesse d'accepter puis termine ses requêtes.
+# - --drift-dir : chaque worker enregistre son état de dérive (worker-<emplacement>.json, repris
+#   par le worker qui le remplace); GET /drift sur n'importe quel worker renvoie la vue fusionnée
+#   (états des autres workers enregistrés toutes les 10 s).
+# - Préchauffage : chaque worker fait sa prédiction synthétique après le fork (GET /ready répond
+#   503 jusque-là). Le superviseur ne prédit jamais : le pool de threads OpenMP de XGBoost
+#   (libgomp) ne survit pas à un fork, il doit être créé dans le worker.
+#
+# Linux/macOS uniquement (os.fork).
+
+import argparse
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from metrics import Readiness
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH
+from prediction_server import (
+    DEFAULT_BATCH_WINDOW_MS,
+    DEFAULT_MAX_BATCH_SIZE,
+    PredictionServer,
+    load_artifacts,
+)
+
+logger = logging.getLogger('prefork_server')
+
+DEFAULT_HEARTBEAT_INTERVAL = 1.0
+DEFAULT_HEARTBEAT_TIMEOUT = 10.0
+DEFAULT_DRAIN_TIMEOUT = 30.0
+# Délai minimal entre deux redémarrages d'un même worker (évite les boucles de crash)
+RESTART_BACKOFF = 1.0
+# Threads OpenMP de XGBoost par worker : le parallélisme vient des processus
+DEFAULT_THREADS_PER_WORKER = 1
+
+
+# Fonction pour créer le socket d'écoute partagé
+def create_listening_socket(host, port, backlog=2048):
+    """Ouvrir le socket avant le fork pour que tous les workers l'héritent"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+class Supervisor:
+    """Superviseur pré-fork : lancement, surveillance, redémarrage et arrêt progressif des workers"""
+
+    def __init__(self, model, feature_info, sock, workers, window_ms=DEFAULT_BATCH_WINDOW_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT, drain_timeout=DEFAULT_DRAIN_TIMEOUT, drift_dir=None,
+                 readiness=None, threads_per_worker=DEFAULT_THREADS_PER_WORKER):
+        self.model = model
+        self.feature_info = feature_info
+        self.sock = sock
+        self.workers = workers
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.drain_timeout = drain_timeout
+        self.drift_dir = drift_dir
+        self.threads_per_worker = threads_per_worker
+        self.readiness = readiness if readiness is not None else Readiness()
+        # Mémoire partagée anonyme : un horodatage (time.monotonic) par emplacement de worker
+        self.heartbeats = multiprocessing.Array('d', workers, lock=False)
+        self.pids = {}  # pid -> emplacement
+        self.last_start = [0.0] * workers
+        self.restarts = 0
+        self.stopping = False
+
+    # Côté superviseur
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        # Figer les objets existants (modèle compris) hors du ramasse-miettes avant le fork
+        gc.collect()
+        gc.freeze()
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+        logger.info("Superviseur %d : %d workers sur %s", os.getpid(), self.workers, self.sock.getsockname())
+
+        while not self.stopping:
+            self._reap(restart=True)
+            self._check_heartbeats()
+            time.sleep(self.heartbeat_interval / 2)
+
+        self._shutdown()
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def _spawn(self, slot):
+        wait = self.last_start[slot] + RESTART_BACKOFF - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.last_start[slot] = time.monotonic()
+        self.heartbeats[slot] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker_main(slot)
+            except BaseException:
+                logger.exception("Worker %d arrêté sur erreur", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.pids[pid] = slot
+        logger.info("Worker %d démarré (emplacement %d)", pid, slot)
+
+    def _reap(self, restart):
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.pids.clear()
+                return
+            if pid == 0:
+                return
+            slot = self.pids.pop(pid, None)
+            if slot is None:
+                continue
+            if restart and not self.stopping:
+                logger.warning("Worker %d terminé (statut %d), redémarrage", pid, status)
+                self.restarts += 1
+                self._spawn(slot)
+
+    def _check_heartbeats(self):
+        now = time.monotonic()
+        for pid, slot in list(self.pids.items()):
+            if now - self.heartbeats[slot] > self.heartbeat_timeout:
+                logger.warning("Worker %d sans battement depuis %.1fs, arrêt forcé", pid, now - self.heartbeats[slot])
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _shutdown(self):
+        logger.info("Arrêt progressif de %d workers", len(self.pids))
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.drain_timeout + 5
+        while self.pids and time.monotonic() < deadline:
+            self._reap(restart=False)
+            time.sleep(0.05)
+        for pid in list(self.pids):
+            logger.warning("Worker %d toujours actif après le délai, arrêt forcé", pid)
+            os.kill(pid, signal.SIGKILL)
+        self._reap(restart=False)
+        self.sock.close()
+
+    # Côté worker
+
+    def _worker_main(self, slot):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Seul le superviseur réagit à Ctrl-C
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # Après le fork : sans cela chaque worker ouvre un thread par cœur (N workers x N threads)
+        if hasattr(self.model, 'get_booster'):
+            self.model.get_booster().set_param('nthread', self.threads_per_worker)
+        asyncio.run(self._serve(slot))
+
+    async def _serve(self, slot):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+        drift_state_path = os.path.join(self.drift_dir, f'worker-{slot}.json') if self.drift_dir else None
+        server = PredictionServer(self.model, self.feature_info, self.window_ms, self.max_batch_size, drift_state_path,
+                                  self.readiness)
+        await server.start(sock=self.sock)
+
+        async def heartbeat():
+            while True:
+                self.heartbeats[slot] = time.monotonic()
+                await asyncio.sleep(self.heartbeat_interval)
+
+        beat = loop.create_task(heartbeat())
+        await stop.wait()
+        drained = await server.drain(self.drain_timeout)
+        if not drained:
+            logger.warning("Worker %d : %d requêtes abandonnées", os.getpid(), server.in_flight)
+        beat.cancel()
+        await server.batcher.stop()
+        server.stop_drift()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service de prédiction pré-forké multi-cœurs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Nombre de processus workers")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--artifact', help="Répertoire d'artefact sans pickle (recommandé : tableaux partagés en mmap)")
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW_MS)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--heartbeat-timeout', type=float, default=DEFAULT_HEARTBEAT_TIMEOUT,
+                        help="Secondes sans battement avant de remplacer un worker")
+    parser.add_argument('--drain-timeout', type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help="Secondes accordées aux requêtes en cours lors de l'arrêt")
+    parser.add_argument('--threads-per-worker', type=int, default=DEFAULT_THREADS_PER_WORKER,
+                        help="Threads de prédiction XGBoost par worker")
+    parser.add_argument('--drift-dir', help="Répertoire des états de dérive des workers (vue fusionnée sur /drift)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers < 1 or args.threads_per_worker < 1:
+        raise SystemExit("--workers et --threads-per-worker doivent être positifs")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(name)s %(levelname)s %(message)s')
+    readiness = Readiness()
+    started = time.perf_counter()
+    model, feature_info = load_artifacts(args.model, args.feature_info, args.artifact)
+    readiness.record('model_load', time.perf_counter() - started)
+    sock = create_listening_socket(args.host, args.port)
+    Supervisor(
+        model, feature_info, sock, args.workers,
+        window_ms=args.batch_window_ms, max_batch_size=args.max_batch_size,
+        heartbeat_timeout=args.heartbeat_timeout, drain_timeout=args.drain_timeout, drift_dir=args.drift_dir,
+        readiness=readiness, threads_per_worker=args.threads_per_worker
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
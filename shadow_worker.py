@@ -0,0 +1,110 @@
+# shadow_worker.py
+# Processus de scoring fantôme, lancé par model_registry.ShadowScorer (jamais directement)
+#
+#   python shadow_worker.py <descripteur>
+#
+# Le descripteur est l'extrémité enfant d'une paire de sockets créée par le processus de
+# l'application. Le premier message reçu est la configuration (modèles fantômes, journal,
+# intervalle de rechargement), puis chaque ligne servie; None demande l'arrêt. L'état des
+# modèles et les compteurs sont renvoyés sur la même connexion. Ce script est son propre
+# __main__ : le script Streamlit n'est jamais réexécuté dans ce processus.
+
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from house_model import row_to_vector
+from model_registry import SHADOW_PROCESS_NICE, STATUS_INTERVAL, parse_shadow_spec
+
+logger = logging.getLogger('shadow_worker')
+
+
+# Fonction pour décrire l'état des modèles fantômes chargés
+def holder_status(holders):
+    status = {}
+    for name, holder in holders.items():
+        current = holder.current
+        status[name] = {'version': current.key if current is not None else None,
+                        'source': current.source if current is not None else None,
+                        'error': holder.last_error}
+    return status
+
+
+# Fonction pour noter une ligne avec un modèle fantôme
+def score_one(name, holder, features, counters):
+    current = holder.current
+    if current is None:
+        return {'name': name, 'version': None, 'prediction': None, 'latency_ms': None,
+                'error': holder.last_error or "modèle non chargé"}
+    started = time.perf_counter()
+    try:
+        vector = row_to_vector(features, current.binder.feature_names)
+        prediction = float(current.binder.predict(current.model, np.asarray(vector)[None, :])[0])
+        error = None
+    except Exception as e:
+        prediction, error = None, f"{type(e).__name__}: {e}"
+        counters['shadow_errors'] += 1
+    latency = time.perf_counter() - started
+    counters['shadow_predictions'] += 1
+    return {'name': name, 'version': current.key, 'prediction': prediction,
+            'latency_ms': latency * 1000, 'error': error}
+
+
+# Fonction principale : charger les modèles fantômes, noter les lignes reçues, écrire le journal
+def serve(connection):
+    """Boucle du processus; se termine sur None ou quand le processus de l'application disparaît"""
+    config = connection.recv()
+    holders = parse_shadow_spec(config['spec'])
+    for name, holder in holders.items():
+        if holder.reload() is None:
+            logger.warning("Modèle fantôme %s non chargé: %s", name, holder.last_error)
+        if config['poll_interval'] > 0:
+            holder.start(config['poll_interval'])
+
+    counters = {'shadow_predictions': 0, 'shadow_errors': 0}
+    published = None
+    try:
+        with open(config['log_path'], 'a', buffering=1, encoding='utf-8') as log:
+            while True:
+                if published is None or time.monotonic() - published >= STATUS_INTERVAL:
+                    connection.send((holder_status(holders), dict(counters)))
+                    published = time.monotonic()
+                if not connection.poll(STATUS_INTERVAL):
+                    continue
+                record = connection.recv()
+                if record is None:
+                    break
+                try:
+                    record['features'] = {name: float(value) for name, value in record['features'].items()}
+                    record['shadows'] = [score_one(name, holder, record['features'], counters)
+                                         for name, holder in holders.items()]
+                    log.write(json.dumps(record) + '\n')
+                except Exception:
+                    logger.exception("Erreur du scoring fantôme")
+        connection.send((holder_status(holders), dict(counters)))
+    except (EOFError, BrokenPipeError):
+        pass  # processus de l'application arrêté
+    finally:
+        for holder in holders.values():
+            holder.stop()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # l'arrêt est demandé par le processus de l'application
+    try:
+        os.nice(SHADOW_PROCESS_NICE)
+    except (AttributeError, OSError):
+        pass
+    with Connection(int(argv[0])) as connection:
+        serve(connection)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,37 @@
 # streamlit_app.py
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
-import pickle
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import warnings
+import logging
+import atexit
+import tempfile
 import os
+import time
+import threading
+import uuid
+
+from batch_scoring import DEFAULT_CHUNK_SIZE, ERROR_COLUMN, detect_format, score_file
+from prediction_cache import DEFAULT_CACHE_SIZE, PredictionCache
+from prediction_lattice import LATTICE_DIR, PredictionLattice
+from tree_evaluator import TreeEnsemble, check_parity, sample_features
+from model_artifact import ARTIFACT_ROOT, LATEST_FILE, load_artifact
+from metrics import METRICS, Readiness
+from prediction_intervals import IntervalEstimator
+from feature_contributions import ContributionExplainer
+from what_if import DEFAULT_SWEEP_POINTS, SWEEP_AXES, run_sweep
+from comparables import DEFAULT_K, DISTANCE_COLUMN, ID_COLUMN, PRICE_COLUMN, SALES_DATA_PATH, ComparablesIndex
+from model_reloader import DEFAULT_KEEP_VERSIONS, DEFAULT_POLL_INTERVAL, ModelHolder
+from drift_monitor import MIN_ROWS as DRIFT_MIN_ROWS, DriftMonitor, load_merged
+from model_registry import SHADOW_LOG_PATH, ShadowScorer
+from prediction_history import HISTORY_DB_PATH, PredictionHistory
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, predict_matrix
 
 warnings.filterwarnings('ignore')
+logger = logging.getLogger('streamlit_app')
 
 # Configuration de la page avec responsive
 st.set_page_config(
@@ -23,354 +41,161 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS responsive et moderne ultra-optimisé
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-    
-    :root {
-        --primary-color: #667eea;
-        --secondary-color: #764ba2;
-        --accent-color: #f093fb;
-        --success-color: #10b981;
-        --warning-color: #f59e0b;
-        --error-color: #ef4444;
-        --background-gradient: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        --card-bg: #ffffff;
-        --text-color: #2c3e50;
-        --border-radius: 16px;
-        --shadow: 0 4px 20px rgba(0,0,0,0.1);
-        --transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    /* Reset et responsive base */
-    * {
-        box-sizing: border-box;
-    }
-    
-    .main .block-container {
-        padding: clamp(0.5rem, 2vw, 1rem);
-        max-width: 100%;
-    }
-    
-    /* Header responsive avec animation */
-    .main-header {
-        background: var(--background-gradient);
-        padding: clamp(1.5rem, 4vw, 3rem);
-        border-radius: var(--border-radius);
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: var(--shadow);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .main-header::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: linear-gradient(45deg, transparent, rgba(255,255,255,0.1), transparent);
-        animation: shine 4s infinite;
-    }
-    
-    @keyframes shine {
-        0% { transform: translateX(-100%) translateY(-100%) rotate(45deg); }
-        100% { transform: translateX(100%) translateY(100%) rotate(45deg); }
-    }
-    
-    .main-header h1 {
-        font-family: 'Inter', sans-serif;
-        font-weight: 800;
-        margin: 0;
-        font-size: clamp(1.8rem, 5vw, 3rem);
-        position: relative;
-        z-index: 1;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-    }
-    
-    .main-header p {
-        font-family: 'Inter', sans-serif;
-        font-weight: 400;
-        margin: 1rem 0 0 0;
-        opacity: 0.95;
-        font-size: clamp(0.9rem, 2.5vw, 1.2rem);
-        position: relative;
-        z-index: 1;
-    }
-    
-    /* Cards responsives avec hover effects */
-    .prediction-card {
-        background: linear-gradient(135deg, #10b981, #059669);
-        color: white;
-        padding: clamp(1.5rem, 4vw, 2.5rem);
-        border-radius: var(--border-radius);
-        text-align: center;
-        margin: 1rem 0;
-        box-shadow: var(--shadow);
-        transition: var(--transition);
-    }
-    
-    .prediction-card:hover {
-        transform: translateY(-4px);
-        box-shadow: 0 8px 30px rgba(16, 185, 129, 0.3);
-    }
-    
-    .prediction-price {
-        font-size: clamp(2rem, 6vw, 4rem);
-        font-weight: 800;
-        margin: 1rem 0;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .feature-card {
-        background: var(--card-bg);
-        padding: clamp(1rem, 3vw, 2rem);
-        border-radius: var(--border-radius);
-        border: 1px solid #e2e8f0;
-        margin: 1rem 0;
-        box-shadow: var(--shadow);
-        transition: var(--transition);
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-    }
-    
-    .metric-card {
-        background: linear-gradient(135deg, #f8fafc, #e2e8f0);
-        padding: clamp(0.8rem, 2vw, 1.5rem);
-        border-radius: 12px;
-        text-align: center;
-        margin: 0.5rem 0;
-        border-left: 4px solid var(--primary-color);
-        transition: var(--transition);
-    }
-    
-    .metric-card:hover {
-        transform: translateX(4px);
-        border-left-color: var(--secondary-color);
-    }
-    
-    /* Buttons responsive */
-    .stButton > button {
-        background: var(--background-gradient);
-        color: white;
-        border: none;
-        border-radius: var(--border-radius);
-        padding: clamp(0.75rem, 2vw, 1rem) clamp(1.5rem, 4vw, 2.5rem);
-        font-weight: 600;
-        font-size: clamp(0.9rem, 2vw, 1.1rem);
-        transition: var(--transition);
-        box-shadow: var(--shadow);
-        width: 100%;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 25px rgba(102, 126, 234, 0.3);
-    }
-    
-    /* Form inputs responsive */
-    .stNumberInput > div > div > input,
-    .stSelectbox > div > div > select {
-        border-radius: 8px;
-        border: 2px solid #e2e8f0;
-        transition: var(--transition);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .stNumberInput > div > div > input:focus,
-    .stSelectbox > div > div > select:focus {
-        border-color: var(--primary-color);
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
-    
-    /* Notifications */
-    .info-box {
-        background: linear-gradient(135deg, #e0f2fe, #b3e5fc);
-        padding: clamp(1rem, 2vw, 1.5rem);
-        border-radius: 12px;
-        border-left: 4px solid #0288d1;
-        margin: 1rem 0;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .warning-box {
-        background: linear-gradient(135deg, #fff8e1, #ffecb3);
-        padding: clamp(1rem, 2vw, 1.5rem);
-        border-radius: 12px;
-        border-left: 4px solid #ffa000;
-        margin: 1rem 0;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .success-box {
-        background: linear-gradient(135deg, #e8f5e8, #c8e6c9);
-        padding: clamp(1rem, 2vw, 1.5rem);
-        border-radius: 12px;
-        border-left: 4px solid #4caf50;
-        margin: 1rem 0;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .error-box {
-        background: linear-gradient(135deg, #ffebee, #ffcdd2);
-        padding: clamp(1rem, 2vw, 1.5rem);
-        border-radius: 12px;
-        border-left: 4px solid #f44336;
-        margin: 1rem 0;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Graphiques responsives */
-    .chart-container {
-        background: white;
-        border-radius: var(--border-radius);
-        padding: 1rem;
-        box-shadow: var(--shadow);
-        margin: 1rem 0;
-    }
-    
-    /* Responsive breakpoints */
-    @media (max-width: 768px) {
-        .main .block-container {
-            padding: 0.5rem;
-        }
-        
-        .main-header {
-            margin-bottom: 1rem;
-        }
-        
-        .feature-card {
-            padding: 1rem;
-        }
-        
-        .prediction-card {
-            padding: 1.5rem;
-        }
-        
-        .metric-card {
-            padding: 1rem;
-            margin: 0.25rem 0;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        .main-header h1 {
-            font-size: 1.5rem;
-        }
-        
-        .main-header p {
-            font-size: 0.85rem;
-        }
-        
-        .prediction-price {
-            font-size: 2.5rem;
-        }
-    }
-    
-    /* Animations */
-    @keyframes fadeInUp {
-        from {
-            opacity: 0;
-            transform: translateY(30px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .fade-in-up {
-        animation: fadeInUp 0.6s ease-out;
-    }
-    
-    /* Scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: #f1f5f9;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: var(--primary-color);
-        border-radius: 4px;
-    }
-    
-    /* Plotly charts responsive */
-    .js-plotly-plot .plotly .modebar {
-        right: 10px;
-        top: 10px;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Feuille de style statique (servie par Streamlit si server.enableStaticServing est actif)
+STYLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'style.css')
+STYLE_URL = 'app/static/style.css'
 
-# Fonction pour charger VOS modèles avec gestion d'erreur robuste
+# Fonction pour lire la feuille de style une seule fois par processus
 @st.cache_resource
-def load_real_models():
-    """Charger VOS modèles PKL avec gestion d'erreur complète"""
+def load_stylesheet():
+    """Contenu et version (date de modification) de static/style.css"""
+    with open(STYLE_PATH, encoding='utf-8') as f:
+        return f.read(), int(os.path.getmtime(STYLE_PATH))
+
+# Fonction pour appliquer le CSS responsive et moderne
+def inject_styles():
+    """Lier la feuille statique (téléchargée puis mise en cache par le navigateur), sinon l'inclure en ligne"""
+    css, version = load_stylesheet()
+    if st.get_option('server.enableStaticServing'):
+        st.markdown(f'<link rel="stylesheet" href="{STYLE_URL}?v={version}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{css}</style>", unsafe_allow_html=True)
+
+with METRICS.span('html_render'):
+    inject_styles()
+
+# Fonction pour créer une seule fois par processus le détenteur du modèle rechargeable à chaud
+@st.cache_resource
+def get_model_holder():
+    """Premier chargement synchrone, puis surveillance des artefacts en arrière-plan"""
+    # Préférer l'artefact sans pickle (tableaux mappés en mémoire) s'il a été exporté
+    artifact_dir = os.environ.get('MODEL_ARTIFACT_DIR', ARTIFACT_ROOT)
+    holder = ModelHolder(MODEL_PATH, FEATURE_INFO_PATH, artifact_dir if os.path.isdir(artifact_dir) else None,
+                         keep=int(os.environ.get('MODEL_KEEP_VERSIONS', DEFAULT_KEEP_VERSIONS)))
+    holder.reload()
+    interval = float(os.environ.get('MODEL_RELOAD_INTERVAL', DEFAULT_POLL_INTERVAL))
+    if interval > 0:
+        holder.start(interval)
+    return holder
+
+# Fonction pour lancer le processus du scoring fantôme (None sans modèle fantôme)
+@st.cache_resource
+def get_shadow_scorer():
+    """Processus séparé qui charge les modèles de SHADOW_MODELS et note chaque prédiction servie"""
     try:
-        model_loaded = False
-        feature_info_loaded = False
-        
-        # Charger le modèle XGBoost/Random Forest
-        if os.path.exists('xgb_model.pkl'):
-            with open('xgb_model.pkl', 'rb') as f:
-                model = pickle.load(f)
-            model_loaded = True
-            st.success("✅ Modèle Random Forest chargé avec succès!")
+        scorer = ShadowScorer(os.environ.get('SHADOW_MODELS', ''), os.environ.get('SHADOW_LOG', SHADOW_LOG_PATH),
+                              poll_interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', DEFAULT_POLL_INTERVAL)))
+    except ValueError as e:
+        st.warning(f"⚠️ Modèles fantômes ignorés: {str(e)}")
+        return None
+    return scorer if scorer.enabled else None
+
+# Fonction pour ouvrir l'historique des prédictions (écriture différée dans SQLite)
+@st.cache_resource
+def get_prediction_history():
+    """Historique partagé par les sessions; désactivé si HOUSE_HISTORY_DB est vide"""
+    path = os.environ.get('HOUSE_HISTORY_DB', HISTORY_DB_PATH)
+    if not path:
+        return None
+    history = PredictionHistory(path)
+    # Écrire les prédictions encore en file à l'arrêt du processus
+    atexit.register(history.close)
+    METRICS.register_collector(lambda: {
+        'history_pending': ('gauge', history.pending()),
+        'history_written': ('counter', history.written)
+    })
+    return history
+
+# Fonction pour créer l'état de préparation du processus (sonde /ready du port des métriques)
+@st.cache_resource
+def get_readiness():
+    return Readiness()
+
+# Fonction pour charger VOS modèles avec gestion d'erreur robuste
+def load_real_models():
+    """Instantané de la version courante de VOS modèles (artefact mmap ou PKL), chargée et validée en arrière-plan
+
+    Renvoie (modèle, métadonnées, chargement complet, version) : la session utilise cette version
+    jusqu'à la fin de l'exécution, même si une nouvelle est installée entre-temps.
+    """
+    # Le processus des modèles fantômes est lancé dès la première exécution, pas à la première prédiction
+    get_shadow_scorer()
+    holder = get_model_holder()
+    current = holder.current
+    if current is None:
+        st.error(f"❌ Erreur lors du chargement des modèles: {holder.last_error}")
+        return None, None, False, None
+    
+    if holder.artifact_dir:
+        st.success(f"✅ Artefact de modèle {current.model.version} chargé en mémoire mappée!")
+    else:
+        st.success("✅ Modèle Random Forest chargé avec succès!")
+        if current.defaults_used:
+            st.warning(f"⚠️ Fichier '{FEATURE_INFO_PATH}' non trouvé, utilisation des valeurs par défaut")
         else:
-            st.error("❌ Fichier 'xgb_model.pkl' non trouvé")
-            return None, None, False
-        
-        # Charger les métadonnées des features
-        if os.path.exists('feature_info.pkl'):
-            with open('feature_info.pkl', 'rb') as f:
-                feature_info = pickle.load(f)
-            feature_info_loaded = True
             st.success("✅ Métadonnées des features chargées!")
-        else:
-            st.warning("⚠️ Fichier 'feature_info.pkl' non trouvé, utilisation des valeurs par défaut")
-            # Créer des métadonnées par défaut basées sur votre rapport
-            feature_info = {
-                'rmse_score': 26240.20,
-                'r2_score': 0.8688,
-                'model_stats': {
-                    'test_r2': 0.8688,
-                    'train_r2': 0.9330,
-                    'train_samples': 1456,
-                    'mean_price': 180151.23,
-                    'min_price': 50000,
-                    'max_price': 500000
-                },
-                'feature_names': ['OverallQual', 'GrLivArea', 'TotalBsmtSF', 'GarageArea', 'YearBuilt', 'FullBath', 'TotRmsAbvGrd', 'Fireplaces', 'GarageCars'],
-                'feature_importance': [
-                    {'feature': 'OverallQual', 'importance': 0.579},
-                    {'feature': 'GrLivArea', 'importance': 0.184},
-                    {'feature': 'TotalBsmtSF', 'importance': 0.092},
-                    {'feature': 'GarageArea', 'importance': 0.047},
-                    {'feature': 'YearBuilt', 'importance': 0.039},
-                    {'feature': 'FullBath', 'importance': 0.030},
-                    {'feature': 'TotRmsAbvGrd', 'importance': 0.015},
-                    {'feature': 'Fireplaces', 'importance': 0.010},
-                    {'feature': 'GarageCars', 'importance': 0.004}
-                ]
-            }
-        
-        return model, feature_info, model_loaded and feature_info_loaded
-    
-    except Exception as e:
-        st.error(f"❌ Erreur lors du chargement des modèles: {str(e)}")
-        return None, None, False
+    if holder.last_error:
+        st.warning(f"⚠️ Nouvelle version du modèle rejetée, la version {current.key} reste en service: {holder.last_error}")
+    return current.model, current.feature_info, not current.defaults_used, current
+
+# Les ressources dérivées du modèle sont indexées par `model_version` : les arguments préfixés
+# par _ ne sont pas hachés, une nouvelle version installée à chaud doit donc changer la clé.
+
+# Fonction pour compiler VOTRE modèle en évaluateur natif (tableaux NumPy)
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_native_evaluator(_model, _feature_info, model_version):
+    """Aplatir les arbres du modèle et vérifier la parité; renvoie le modèle d'origine en cas d'échec"""
+    try:
+        ensemble = TreeEnsemble.from_model(_model, _feature_info['feature_names'])
+        parity = check_parity(_model, ensemble, sample_features(_feature_info, 256))
+    except (TypeError, ValueError):
+        return _model
+    return ensemble if parity['ok'] else _model
+
+# Fonction pour préparer les intervalles de prédiction à partir des arbres de VOTRE modèle
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_interval_estimator(_model, _feature_info, model_version):
+    """Aplatir le modèle et calibrer les intervalles une seule fois; None si le modèle n'est pas supporté"""
+    try:
+        return IntervalEstimator.from_model(_model, _feature_info)
+    except (TypeError, ValueError):
+        return None
+
+# Fonction pour préparer l'explication des prédictions de VOTRE modèle
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_contribution_explainer(_model, _feature_info, model_version):
+    """Précalculer une seule fois les écarts de valeur attendue par nœud; None si le modèle n'est pas supporté"""
+    try:
+        return ContributionExplainer.from_model(_model, _feature_info['feature_names'])
+    except (TypeError, ValueError):
+        return None
+
+# Fonction pour mesurer l'importance globale des features sur VOTRE modèle
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_model_importance(_model, _feature_info, model_version):
+    """Part moyenne de |contribution| par feature sur un échantillon, sinon l'importance de feature_info"""
+    explainer = get_contribution_explainer(_model, _feature_info, model_version)
+    if explainer is None:
+        return list(_feature_info.get('feature_importance', []))
+    return explainer.global_importance(sample_features(_feature_info, 2048))
+
+# Fonction pour charger l'index des ventes comparables (construit une fois, puis relu depuis le disque)
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_comparables_index(sales_path, _feature_info, model_version):
+    """Index KD-tree des ventes de référence; None si le fichier de ventes est absent ou invalide"""
+    if not os.path.exists(sales_path):
+        return None
+    try:
+        with METRICS.span('comparables_index_load'):
+            return ComparablesIndex.load_or_build(sales_path, _feature_info)
+    except (OSError, ValueError, KeyError) as e:
+        st.error(f"❌ Erreur lors de l'indexation des ventes: {str(e)}")
+        return None
+
+# Fonction pour créer le moniteur de dérive de VOTRE modèle (mémoire fixe, partagé par les sessions)
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_drift_monitor(_feature_info, model_version):
+    return DriftMonitor.for_model(_feature_info)
 
 # Fonction pour créer des données de démonstration basées sur votre dataset
 @st.cache_data
@@ -402,41 +227,90 @@ def create_demo_data():
     
     return surface_data, quality_data, evolution_data
 
-# Fonction pour préparer les features selon VOTRE modèle exact
-def prepare_features_for_your_model(user_inputs):
-    """Préparer les features selon l'ordre exact de VOTRE modèle entraîné"""
-    
-    # Ordre exact des features selon votre rapport
-    features_dict = {
-        'OverallQual': user_inputs['overall_qual'],
-        'GrLivArea': user_inputs['gr_liv_area'],
-        'TotalBsmtSF': user_inputs['total_bsmt_sf'],
-        'GarageArea': user_inputs['garage_area'],
-        'YearBuilt': user_inputs['year_built'],
-        'FullBath': user_inputs['full_bath'],
-        'TotRmsAbvGrd': user_inputs['tot_rms_abv_grd'],
-        'Fireplaces': user_inputs['fireplaces'],
-        'GarageCars': user_inputs['garage_cars']
-    }
-    
-    # Convertir en DataFrame avec l'ordre exact
-    df = pd.DataFrame([features_dict])
-    
-    return df
-
 # Fonction pour faire la prédiction avec VOTRE modèle
-def make_prediction_with_your_model(model, features_df):
-    """Faire la prédiction avec VOTRE modèle Random Forest entraîné"""
+def make_prediction_with_your_model(model, features):
+    """Faire la prédiction avec VOTRE modèle Random Forest entraîné (tampon NumPy ou DataFrame)"""
     try:
-        prediction = model.predict(features_df)
+        prediction = model.predict(features)
         return max(0, prediction[0])  # Assurer que le prix est positif
     except Exception as e:
+        METRICS.inc('prediction_errors')
         st.error(f"❌ Erreur lors de la prédiction: {str(e)}")
         return None
 
-# Fonction pour créer des graphiques interactifs
-def create_interactive_charts(surface_data, quality_data, evolution_data, predicted_price=None, user_features=None):
-    """Créer des graphiques interactifs avec Plotly"""
+# Fonction pour obtenir le cache de prédictions partagé par les sessions
+@st.cache_resource
+def get_prediction_cache():
+    """Créer le cache LRU des prédictions (taille et politique configurables par variables d'environnement)"""
+    cache = PredictionCache(
+        maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+        policy=os.environ.get('PREDICTION_CACHE_POLICY', 'lru'),
+        watched_paths=(MODEL_PATH, os.path.join(os.environ.get('MODEL_ARTIFACT_DIR', ARTIFACT_ROOT), LATEST_FILE))
+    )
+    
+    def collect_cache_metrics():
+        stats = cache.stats()
+        return {
+            'prediction_cache_hits': ('counter', stats['hits']),
+            'prediction_cache_misses': ('counter', stats['misses']),
+            'prediction_cache_evictions': ('counter', stats['evictions']),
+            'prediction_cache_entries': ('gauge', stats['size'])
+        }
+    
+    METRICS.register_collector(collect_cache_metrics)
+    return cache
+
+# Fonction pour ouvrir la table de prédictions précalculée (si elle a été construite)
+@st.cache_resource(max_entries=DEFAULT_KEEP_VERSIONS + 1)
+def get_prediction_lattice(signature):
+    """Ouvrir en mémoire mappée la table construite par prediction_lattice.py, ou None
+
+    `signature` est l'empreinte du modèle servi (contenu du PKL ou manifeste de l'artefact) :
+    une table construite pour un autre modèle est ignorée.
+    """
+    lattice_dir = os.environ.get('PREDICTION_LATTICE_DIR', LATTICE_DIR)
+    if not os.path.isdir(lattice_dir):
+        return None
+    try:
+        lattice = PredictionLattice.load(lattice_dir)
+    except (OSError, ValueError) as e:
+        st.warning(f"⚠️ Table de prédictions ignorée: {str(e)}")
+        return None
+    if not lattice.matches(signature):
+        st.warning("⚠️ Table de prédictions construite avec un autre modèle, elle est ignorée")
+        return None
+    return lattice
+
+# Fonction pour prédire via la table précalculée, sinon avec VOTRE modèle
+def predict_with_lattice(model, features, binder=None, version=None):
+    """Lire le prix exact dans la table précalculée si la propriété est sur un nœud de la grille, sinon appeler le modèle"""
+    lattice = get_prediction_lattice(version.signature) if version is not None else None
+    if lattice is not None:
+        row = binder.as_mapping(features) if binder is not None else features.iloc[0]
+        price = lattice.lookup(row)
+        if price is not None:
+            return max(0, price)
+    return make_prediction_with_your_model(model, features)
+
+# Fonction pour faire la prédiction en passant par le cache
+def make_cached_prediction(model, features, binder=None, version=None):
+    """Renvoyer la prédiction en cache ou appeler VOTRE modèle si le vecteur est nouveau"""
+    return get_prediction_cache().get_or_compute(
+        features, lambda: predict_with_lattice(model, features, binder, version),
+        version.key if version is not None else None
+    )
+
+# Fonction pour construire une seule fois les graphiques de base
+@st.cache_resource
+def build_base_charts():
+    """Construire les trois figures Plotly des données de démonstration, figées en dictionnaires
+
+    Les dictionnaires sont partagés par toutes les sessions : ils ne doivent jamais être modifiés.
+    """
+    # Import différé : plotly.express n'est chargé qu'à la construction du premier graphique
+    import plotly.express as px
+    
+    surface_data, quality_data, evolution_data = create_demo_data()
     
     # 1. Graphique Surface vs Prix
     fig_surface = px.scatter(
@@ -449,16 +323,6 @@ def create_interactive_charts(surface_data, quality_data, evolution_data, predic
         opacity=0.6
     )
     
-    # Ajouter le point de prédiction si disponible
-    if predicted_price and user_features:
-        fig_surface.add_scatter(
-            x=[user_features['gr_liv_area']],
-            y=[predicted_price],
-            mode='markers',
-            marker=dict(size=20, color='red', symbol='star', line=dict(width=2, color='white')),
-            name='🏠 Votre Propriété'
-        )
-    
     fig_surface.update_layout(
         height=400,
         font_family="Inter",
@@ -478,11 +342,6 @@ def create_interactive_charts(surface_data, quality_data, evolution_data, predic
         color_continuous_scale='viridis'
     )
     
-    # Mettre en évidence la qualité sélectionnée
-    if user_features:
-        colors = ['red' if x == user_features['overall_qual'] else '#667eea' for x in quality_data['OverallQual']]
-        fig_quality.update_traces(marker_color=colors)
-    
     fig_quality.update_layout(
         height=400,
         font_family="Inter",
@@ -502,71 +361,370 @@ def create_interactive_charts(surface_data, quality_data, evolution_data, predic
     
     fig_evolution.update_traces(line_color='#667eea', line_width=3)
     
+    fig_evolution.update_layout(
+        height=400,
+        font_family="Inter",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=True
+    )
+    
+    return fig_surface.to_dict(), fig_quality.to_dict(), fig_evolution.to_dict()
+
+# Fonction pour superposer des traces à une figure de base sans la modifier
+def overlay_traces(base_figure, traces):
+    """Copie superficielle de la figure de base avec les traces de l'utilisateur en plus"""
+    return {**base_figure, 'data': list(base_figure['data']) + list(traces)}
+
+# Fonction pour créer des graphiques interactifs
+def create_interactive_charts(surface_data, quality_data, evolution_data, predicted_price=None, user_features=None):
+    """Créer des graphiques interactifs avec Plotly : figures de base en cache + superpositions de l'utilisateur"""
+    fig_surface, fig_quality, fig_evolution = build_base_charts()
+    
+    # Ajouter le point de prédiction si disponible
+    if predicted_price and user_features:
+        fig_surface = overlay_traces(fig_surface, [dict(
+            type='scatter',
+            x=[user_features['gr_liv_area']],
+            y=[predicted_price],
+            mode='markers',
+            marker=dict(size=20, color='red', symbol='star', line=dict(width=2, color='white')),
+            name='🏠 Votre Propriété'
+        )])
+    
+    # Mettre en évidence la qualité sélectionnée
+    if user_features:
+        colors = ['red' if x == user_features['overall_qual'] else '#667eea' for x in quality_data['OverallQual']]
+        bars = fig_quality['data'][0]
+        fig_quality = {**fig_quality, 'data': [{**bars, 'marker': {**bars.get('marker', {}), 'color': colors}}]}
+    
     # Ajouter point pour l'année de construction
     if user_features:
         year_data = evolution_data[evolution_data['YearBuilt'] == user_features['year_built']]
         if not year_data.empty:
             year_price = year_data['Prix_Moyen'].iloc[0]
-            fig_evolution.add_scatter(
+            fig_evolution = overlay_traces(fig_evolution, [dict(
+                type='scatter',
                 x=[user_features['year_built']],
                 y=[year_price],
                 mode='markers',
                 marker=dict(size=15, color='red', symbol='diamond', line=dict(width=2, color='white')),
                 name='🏗️ Votre Année'
-            )
+            )])
     
-    fig_evolution.update_layout(
+    return fig_surface, fig_quality, fig_evolution
+
+# Fonction pour construire une seule fois le graphique d'importance des features
+@st.cache_resource
+def build_importance_chart(feature_importance):
+    """Graphique d'importance des features figé en dictionnaire (partagé, jamais modifié)"""
+    import plotly.express as px
+    
+    importance_df = pd.DataFrame(feature_importance)
+    
+    fig_importance = px.bar(
+        importance_df.head(6),
+        x='importance',
+        y='feature',
+        orientation='h',
+        title="🎯 Importance des Features",
+        color='importance',
+        color_continuous_scale='viridis'
+    )
+    
+    fig_importance.update_layout(
         height=400,
         font_family="Inter",
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)',
-        showlegend=True
+        yaxis={'categoryorder': 'total ascending'}
     )
     
-    return fig_surface, fig_quality, fig_evolution
+    return fig_importance.to_dict()
 
-# Interface principale
-def main():
-    # Header responsive avec vos vraies performances
-    st.markdown("""
-    <div class="main-header fade-in-up">
-        <h1>🏠 Prédicteur Prix Immobilier IA</h1>
-        <p>Random Forest Optimisé • R² = 0.8688 • RMSE = $26,240 • Interface Responsive</p>
+# Fonction pour créer le graphique des contributions d'une prédiction
+def create_contribution_chart(feature_names, contributions, bias):
+    """Barres horizontales des contributions signées (en $) de chaque feature au prix de la propriété"""
+    order = np.argsort(np.abs(contributions))
+    values = contributions[order]
+    return dict(
+        data=[dict(
+            type='bar',
+            orientation='h',
+            x=values,
+            y=[feature_names[i] for i in order],
+            marker=dict(color=['#10b981' if value >= 0 else '#ef4444' for value in values]),
+            text=[f"{value:+,.0f} $" for value in values],
+            textposition='auto',
+            hovertemplate="%{y}: %{x:+,.0f} $<extra></extra>"
+        )],
+        layout=dict(
+            title=dict(text="🎯 Contributions des Features à Votre Prix"),
+            height=400,
+            font=dict(family="Inter"),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(title=dict(text=f"Écart au prix de base (${bias:,.0f})")),
+            showlegend=False
+        )
+    )
+
+# Fonction pour calculer un balayage de sensibilité (mis en cache par propriété et par axes)
+@st.cache_data(max_entries=256)
+def compute_sweep(_model, _binder, model_version, user_inputs, x_axis, y_axis=None, points=DEFAULT_SWEEP_POINTS):
+    """Noter toute la grille « et si » autour de la propriété en un seul appel au modèle"""
+    return run_sweep(_model, _binder, user_inputs, x_axis, y_axis, points)
+
+# Fonction pour créer le graphique d'un balayage (courbe ou carte de chaleur)
+def create_sweep_chart(sweep, user_inputs):
+    """Figure Plotly (dictionnaire) du balayage, avec la propriété de l'utilisateur en surimpression"""
+    x_label = SWEEP_AXES[sweep.x_axis][0]
+    layout = dict(
+        height=450,
+        font=dict(family="Inter"),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(title=dict(text=x_label))
+    )
+    marker = dict(size=18, color='red', symbol='star', line=dict(width=2, color='white'))
+    
+    if sweep.y_axis is None:
+        user_price = float(np.interp(user_inputs[sweep.x_axis], sweep.x_values, sweep.prices))
+        data = [
+            dict(type='scatter', mode='lines', x=sweep.x_values, y=sweep.prices,
+                 line=dict(color='#667eea', width=3), name='Prix prédit'),
+            dict(type='scatter', mode='markers', x=[user_inputs[sweep.x_axis]], y=[user_price],
+                 marker=marker, name='🏠 Votre Propriété')
+        ]
+        layout.update(
+            title=dict(text=f"🔀 Prix selon {x_label}"),
+            yaxis=dict(title=dict(text='Prix Prédit ($)'))
+        )
+    else:
+        y_label = SWEEP_AXES[sweep.y_axis][0]
+        data = [
+            dict(type='heatmap', x=sweep.x_values, y=sweep.y_values, z=sweep.prices,
+                 colorscale='Viridis', colorbar=dict(title=dict(text='Prix ($)')),
+                 hovertemplate=f"{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Prix: $%{{z:,.0f}}<extra></extra>"),
+            dict(type='scatter', mode='markers', x=[user_inputs[sweep.x_axis]], y=[user_inputs[sweep.y_axis]],
+                 marker=marker, name='🏠 Votre Propriété')
+        ]
+        layout.update(
+            title=dict(text=f"🔀 Prix selon {x_label} × {y_label}"),
+            yaxis=dict(title=dict(text=y_label))
+        )
+    return dict(data=data, layout=layout)
+
+# Fragment du balayage de sensibilité : changer d'axe ne réexécute que ce bloc
+@st.fragment
+def render_sensitivity_sweep(model, binder, version, user_inputs):
+    """Afficher l'analyse « et si » le long d'un ou deux axes autour de la propriété"""
+    st.markdown("## 🔀 Analyse de Sensibilité")
+    
+    axis_labels = {axis: label for axis, (label, *_) in SWEEP_AXES.items()}
+    col_x, col_y = st.columns(2)
+    with col_x:
+        x_axis = st.selectbox(
+            "↔️ Axe horizontal",
+            list(SWEEP_AXES),
+            format_func=axis_labels.get,
+            key='sweep_x_axis',
+            help="Caractéristique que l'on fait varier autour de votre propriété"
+        )
+    with col_y:
+        y_options = [None] + [axis for axis in SWEEP_AXES if axis != x_axis]
+        y_axis = st.selectbox(
+            "↕️ Axe vertical",
+            y_options,
+            index=y_options.index('overall_qual') if 'overall_qual' in y_options else 0,
+            format_func=lambda axis: "Aucun (courbe)" if axis is None else axis_labels[axis],
+            key='sweep_y_axis',
+            help="Second axe optionnel : affiche une carte de chaleur"
+        )
+    
+    with METRICS.span('sensitivity_sweep'):
+        sweep = compute_sweep(model, binder, version.key, user_inputs, x_axis, y_axis)
+    
+    st.plotly_chart(create_sweep_chart(sweep, user_inputs), use_container_width=True)
+    st.caption(f"{sweep.prices.size:,} scénarios notés en un seul appel au modèle")
+
+# Fonction pour afficher les ventes comparables les plus proches de la propriété
+def render_comparables(binder, feature_info, version, user_inputs, predicted_price):
+    """Tableau des k ventes les plus proches (features mises à l'échelle des bornes d'entraînement)"""
+    st.markdown("## 🏘️ Ventes Comparables")
+    
+    sales_path = os.environ.get('HOUSE_SALES_DATA', SALES_DATA_PATH)
+    index = get_comparables_index(sales_path, feature_info, version.key)
+    if index is None:
+        st.info(f"ℹ️ Aucune donnée de ventes trouvée (`{sales_path}`). Définissez la variable "
+                "d'environnement HOUSE_SALES_DATA vers un CSV/Parquet contenant les features du modèle et SalePrice.")
+        return
+    
+    with METRICS.span('comparables_query'):
+        comparables = index.query(binder.row(user_inputs), DEFAULT_K)
+    comparables['Écart vs prédiction'] = (comparables[PRICE_COLUMN] / predicted_price - 1) * 100
+    
+    st.dataframe(
+        comparables,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            ID_COLUMN: st.column_config.NumberColumn("Vente", format="%d"),
+            PRICE_COLUMN: st.column_config.NumberColumn("Prix de vente", format="$%d"),
+            DISTANCE_COLUMN: st.column_config.NumberColumn("Distance", format="%.3f"),
+            'Écart vs prédiction': st.column_config.NumberColumn(format="%+.1f%%")
+        }
+    )
+    st.caption(f"{len(comparables)} ventes les plus proches parmi {len(index):,} • "
+               f"prix médian ${comparables[PRICE_COLUMN].median():,.0f}")
+
+# Fonction pour scorer un portefeuille complet (CSV/Parquet), en fragment isolé
+@st.fragment
+def render_portfolio_scoring(model, feature_info, version):
+    """Afficher le mode portefeuille: upload, scoring par morceaux et téléchargement"""
+    st.markdown("## 📁 Évaluation de Portefeuille")
+    feature_names = feature_info['feature_names']
+    st.markdown(f"""
+    <div class="info-box">
+        <h4>📋 Format attendu</h4>
+        <p>Fichier CSV ou Parquet contenant au minimum les colonnes : <code>{', '.join(feature_names)}</code></p>
+        <p>Le fichier est traité par morceaux : chaque morceau est prédit en un seul appel au modèle.</p>
     </div>
     """, unsafe_allow_html=True)
     
-    # Charger VOS VRAIS modèles
-    model, feature_info, models_loaded = load_real_models()
+    uploaded_file = st.file_uploader("📤 Fichier de propriétés", type=['csv', 'parquet', 'pq'])
+    chunk_size = st.number_input(
+        "📦 Taille des morceaux (lignes)",
+        min_value=1_000,
+        max_value=1_000_000,
+        value=DEFAULT_CHUNK_SIZE,
+        step=1_000,
+        help="Nombre de lignes lues et prédites à la fois (borne la mémoire utilisée)"
+    )
+    with_intervals = st.checkbox(
+        "📏 Ajouter l'intervalle de prédiction",
+        help="Colonnes PredictedPriceLower / PredictedPriceUpper calculées à partir des arbres du modèle "
+             "(niveau garanti seulement si le modèle a été calibré par train_model.py)"
+    )
+    with_contributions = st.checkbox(
+        "🎯 Ajouter les contributions des features",
+        help="Une colonne Contribution_<feature> par feature : écart au prix de base expliqué par cette feature"
+    )
     
-    # Si les modèles ne sont pas chargés, afficher un message d'erreur
-    if not models_loaded:
+    if uploaded_file is not None and st.button("🔮 Évaluer le Portefeuille", use_container_width=True):
+        # Supprimer le résultat précédent de la session
+        previous_path = st.session_state.pop('portfolio_result_path', None)
+        if previous_path and os.path.exists(previous_path):
+            os.remove(previous_path)
+        
+        progress_bar = st.progress(0.0, text="Démarrage...")
+        
+        def update_progress(progress, rows_scored):
+            progress_bar.progress(progress, text=f"{rows_scored:,} propriétés évaluées")
+        
+        output = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False)
+        try:
+            with output:
+                rows_scored, rows_rejected = score_file(
+                    model, feature_names, uploaded_file, detect_format(uploaded_file.name),
+                    output, chunk_size=int(chunk_size), progress_callback=update_progress,
+                    interval_estimator=get_interval_estimator(model, feature_info, version.key) if with_intervals else None,
+                    contribution_explainer=(get_contribution_explainer(model, feature_info, version.key)
+                                            if with_contributions else None)
+                )
+        except Exception as e:
+            os.remove(output.name)
+            progress_bar.empty()
+            st.error(f"❌ Erreur lors de l'évaluation du portefeuille: {str(e)}")
+            return
+        
+        progress_bar.progress(1.0, text=f"✅ {rows_scored:,} propriétés évaluées")
+        if rows_rejected:
+            st.warning(f"⚠️ {rows_rejected:,} propriétés non évaluées (valeurs non numériques) : "
+                       f"motif dans la colonne {ERROR_COLUMN}")
+        st.session_state['portfolio_result_path'] = output.name
+        st.session_state['portfolio_result_name'] = os.path.splitext(uploaded_file.name)[0] + '_predictions.csv'
+    
+    result_path = st.session_state.get('portfolio_result_path')
+    if result_path and os.path.exists(result_path):
+        with open(result_path, 'rb') as f:
+            st.download_button(
+                "📥 Télécharger les Prédictions (CSV)",
+                data=f,
+                file_name=st.session_state.get('portfolio_result_name', 'predictions.csv'),
+                mime='text/csv',
+                use_container_width=True
+            )
+
+# Fonction pour afficher le footer
+def render_footer():
+    """Afficher le footer avec les informations sur votre projet"""
+    st.markdown("---")
+    
+    # Layout adaptatif pour le footer
+    footer_cols = st.columns([1, 1, 1])
+    
+    with footer_cols[0]:
         st.markdown("""
-        <div class="error-box">
-            <h3>⚠️ Modèles non disponibles</h3>
-            <p>Veuillez vous assurer que les fichiers suivants sont présents dans le répertoire :</p>
-            <ul>
-                <li><code>xgb_model.pkl</code> - Votre modèle Random Forest entraîné</li>
-                <li><code>feature_info.pkl</code> - Métadonnées de vos features</li>
-            </ul>
-            <p><strong>📁 Structure attendue :</strong></p>
-            <pre>
-votre-projet-immobilier/
-├── streamlit_app.py
-├── xgb_model.pkl
-├── feature_info.pkl
-└── requirements.txt
-            </pre>
+        <div class="success-box">
+            <h4>🎯 Votre Modèle</h4>
+            <p><strong>Random Forest Optimisé</strong> entraîné sur 1,456 transactions avec 86.9% de précision.</p>
         </div>
         """, unsafe_allow_html=True)
-        return
     
-    # Charger les données de démonstration
-    surface_data, quality_data, evolution_data = create_demo_data()
+    with footer_cols[1]:
+        st.markdown("""
+        <div class="info-box">
+            <h4>📊 Features Clés</h4>
+            <p><strong>9 caractéristiques</strong> sélectionnées par importance : Qualité, Surface, Sous-sol, Garage, etc.</p>
+        </div>
+        """, unsafe_allow_html=True)
     
+    with footer_cols[2]:
+        st.markdown("""
+        <div class="warning-box">
+            <h4>⚠️ Précision</h4>
+            <p><strong>Marge d'erreur ±$26,240</strong> basée sur les performances réelles de votre modèle.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+# Fonction pour afficher les versions du modèle et revenir à une version précédente
+def render_model_versions(version):
+    """Version servie à cette session, versions conservées et bouton de retour arrière"""
+    holder = get_model_holder()
+    st.markdown("## 🔄 Versions du Modèle")
+    for item in holder.versions():
+        loaded_at = datetime.fromtimestamp(item.loaded_at).strftime('%H:%M:%S')
+        marker = "🟢" if item is holder.current else "⚪"
+        session = " (cette session)" if item is version else ""
+        st.write(f"{marker} **{item.key}** • {item.source} • {loaded_at}{session}")
+    
+    shadow_scorer = get_shadow_scorer()
+    for name, shadow in shadow_scorer.shadows() if shadow_scorer is not None else []:
+        status = f"{shadow['version']} • {shadow['source']}" if shadow['version'] else f"non chargé ({shadow['error']})"
+        st.write(f"👥 **{name}** (fantôme) • {status}")
+    
+    previous = [item.key for item in holder.versions()[1:]]
+    if previous:
+        target = st.selectbox("Version précédente", previous, key='rollback_version')
+        if st.button("↩️ Revenir à cette version", help="S'applique immédiatement à toutes les sessions"):
+            if holder.rollback(target) is not None:
+                st.rerun()
+
+# Fonction pour afficher la barre latérale et lire les réglages
+def render_sidebar(model, feature_info, version):
+    """Barre latérale (hors fragment : ses réglages s'appliquent à toute la page)"""
     # Sidebar responsive avec VOS VRAIES performances
     with st.sidebar:
         st.markdown("## 🎛️ Configuration")
         
+        # Sélection du mode d'évaluation
+        scoring_mode = st.radio(
+            "📋 Mode d'évaluation",
+            ["🏠 Propriété unique", "📁 Portefeuille (CSV/Parquet)"],
+            help="Évaluer une seule propriété ou un fichier complet de propriétés"
+        )
+        
         # Sélection de l'unité
         unit_system = st.selectbox(
             "🌍 Système d'unités",
@@ -591,6 +749,10 @@ votre-projet-immobilier/
             r2_score = feature_info.get('r2_score', 0.8688)
             train_samples = feature_info.get('model_stats', {}).get('train_samples', 1456)
             mean_price = feature_info.get('model_stats', {}).get('mean_price', 180151.23)
+            top_features = "\n            ".join(
+                f"- {item['feature']}: {item['importance'] * 100:.1f}%"
+                for item in get_model_importance(model, feature_info, version.key)[:3]
+            )
             
             st.markdown(f"""
             **🎯 Performances Réelles:**
@@ -604,17 +766,115 @@ votre-projet-immobilier/
             - Prix moyen: ${mean_price:,.0f}
             
             **🔥 Top Features:**
-            - OverallQual: 57.9%
-            - GrLivArea: 18.4%
-            - TotalBsmtSF: 9.2%
+            {top_features}
             """)
         
         # Informations sur les features
-        if advanced_mode and feature_info and 'feature_importance' in feature_info:
+        if advanced_mode and feature_info:
             st.markdown("## 🎯 Importance Features")
-            importance_data = feature_info['feature_importance'][:5]  # Top 5
+            importance_data = get_model_importance(model, feature_info, version.key)[:5]  # Top 5
             for item in importance_data:
                 st.write(f"• **{item['feature']}**: {item['importance']:.3f}")
+        
+        # Versions du modèle chargées à chaud, avec retour arrière instantané
+        if advanced_mode:
+            render_model_versions(version)
+        
+        # Statistiques du cache de prédictions
+        if advanced_mode:
+            cache_stats = get_prediction_cache().stats()
+            st.markdown("## ⚡ Cache Prédictions")
+            st.markdown(f"""
+            - Entrées: {cache_stats['size']:,} / {cache_stats['maxsize']:,} ({cache_stats['policy'].upper()})
+            - Hits: {cache_stats['hits']:,} • Misses: {cache_stats['misses']:,}
+            - Taux de hit: {cache_stats['hit_rate']*100:.1f}%
+            - Évictions: {cache_stats['evictions']:,} • Invalidations: {cache_stats['invalidations']:,}
+            """)
+    
+    return scoring_mode, unit_system, currency, advanced_mode
+
+# Fonction pour identifier la session dans l'historique
+def get_session_id():
+    return st.session_state.setdefault('history_session_id', uuid.uuid4().hex)
+
+# Fonction pour afficher l'historique des prédictions (requêtes indexées)
+def render_prediction_history(currency):
+    """Dernières prédictions de la session et volumes par version du modèle"""
+    history = get_prediction_history()
+    if history is None:
+        return
+    with st.expander("🗂️ Historique des Prédictions"):
+        with METRICS.span('history_query'):
+            rows = history.recent(20, session_id=get_session_id())
+            versions = history.stats_by_version(since=time.time() - 24 * 3600)
+        rate, symbol = (0.85, "€") if currency == "EUR (€)" else (1.0, "$")
+        if rows:
+            st.dataframe(pd.DataFrame([{
+                'Date': datetime.fromtimestamp(row['created_at']).strftime('%H:%M:%S'),
+                'Prix': f"{symbol}{row['predicted_price'] * rate:,.0f}",
+                'Version': row['model_version'],
+                'Latence (ms)': round(row['latency_ms'], 2),
+                **{key: value for key, value in row['inputs'].items()}
+            } for row in rows]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune prédiction enregistrée pour cette session (écriture différée de quelques centaines de ms)")
+        for row in versions:
+            st.write(f"• **{row['model_version']}** : {row['predictions']:,} prédictions sur 24 h • "
+                     f"prix moyen ${row['mean_price']:,.0f} • latence moyenne {row['mean_latency_ms']:.2f} ms")
+
+# Fonction pour afficher la dérive des entrées par rapport à l'entraînement
+def render_drift_monitor(feature_info, version):
+    """Indicateurs de dérive de ce processus, fusionnés avec ceux du service de prédiction (HOUSE_DRIFT_DIR)"""
+    monitor = get_drift_monitor(feature_info, version.key)
+    drift_dir = os.environ.get('HOUSE_DRIFT_DIR')
+    sources = "cette application"
+    if drift_dir and os.path.isdir(drift_dir):
+        try:
+            monitor = load_merged(drift_dir, feature_info).merge(monitor)
+            sources = "cette application et le service de prédiction"
+        except (OSError, ValueError, KeyError) as e:
+            st.warning(f"États de dérive du service ignorés : {e}")
+    with st.expander("📡 Dérive des Entrées"):
+        reference = "esquisse des données d'entraînement" if monitor.reference is not None \
+            else "bornes d'entraînement et statistiques du prix"
+        st.caption(f"{monitor.rows:,} prédictions ({sources}, version {version.key}) • référence : {reference}")
+        status_icons = {'ok': '🟢', 'avertissement': '🟠', 'dérive': '🔴', None: '⚪'}
+        st.dataframe(pd.DataFrame([{
+            'État': status_icons[row['status']],
+            'Feature': row['feature'],
+            'Lignes': row['rows'],
+            'PSI': row['psi'],
+            'Décalage (σ)': row['mean_shift'],
+            'Hors plage': row['out_of_range'],
+            'Médiane': row['p50'],
+            'Moyenne': row['mean']
+        } for row in monitor.scores()]), hide_index=True, use_container_width=True, column_config={
+            'PSI': st.column_config.NumberColumn(format="%.3f"),
+            'Décalage (σ)': st.column_config.NumberColumn(format="%+.2f"),
+            'Hors plage': st.column_config.NumberColumn(format="%.3f"),
+            'Médiane': st.column_config.NumberColumn(format="%.0f"),
+            'Moyenne': st.column_config.NumberColumn(format="%.0f")
+        })
+        if monitor.rows < DRIFT_MIN_ROWS:
+            st.caption(f"⚪ État affiché à partir de {DRIFT_MIN_ROWS} prédictions")
+
+# Fragment de l'évaluation d'une propriété : formulaire, résumé, résultats et graphiques
+@st.fragment
+def render_property_evaluation(model, feature_info, binder, version, unit_system, currency, advanced_mode):
+    """Seule cette partie est réexécutée à la soumission du formulaire (CSS, barre latérale et chargement inchangés)"""
+    with METRICS.span('fragment_rerun'):
+        render_property_panel(model, feature_info, binder, version, unit_system, currency, advanced_mode)
+        if advanced_mode:
+            render_prediction_history(currency)
+            render_drift_monitor(feature_info, version)
+    if METRICS.enabled:
+        export_metrics()
+
+# Fonction pour afficher le formulaire, le résumé et les résultats
+def render_property_panel(model, feature_info, binder, version, unit_system, currency, advanced_mode):
+    """Formulaire, résumé et résultats de la prédiction"""
+    # Charger les données de démonstration
+    surface_data, quality_data, evolution_data = create_demo_data()
     
     # Interface principale avec colonnes responsives
     col1, col2 = st.columns([2, 1])
@@ -784,7 +1044,7 @@ votre-projet-immobilier/
             st.metric("🎯 Score Global", f"{global_score:.0f}%")
     
     # Prédiction et résultats avec VOTRE modèle
-    if submitted and model:
+    if submitted and model and binder is not None:
         # Préparer les features selon VOTRE modèle exact
         user_inputs = {
             'overall_qual': overall_qual,
@@ -799,8 +1059,24 @@ votre-projet-immobilier/
         }
         
         # Faire la prédiction avec VOTRE modèle
-        features_df = prepare_features_for_your_model(user_inputs)
-        predicted_price_usd = make_prediction_with_your_model(model, features_df)
+        with METRICS.span('feature_preparation'):
+            features_row = binder.row(user_inputs)
+        predictor = get_native_evaluator(model, feature_info, version.key)
+        started = time.perf_counter()
+        with METRICS.span('prediction'):
+            predicted_price_usd = make_cached_prediction(predictor, features_row, binder, version)
+        if predicted_price_usd is not None:
+            METRICS.inc('predictions')
+            # Mêmes features confiées aux modèles fantômes, après la réponse du modèle principal
+            latency = time.perf_counter() - started
+            shadow_scorer = get_shadow_scorer()
+            if shadow_scorer is not None:
+                shadow_scorer.submit(binder.as_mapping(features_row), version.key, predicted_price_usd, latency)
+            get_drift_monitor(feature_info, version.key).update(features_row, [predicted_price_usd])
+            # Trace d'audit : dépôt non bloquant, écrit par lots en arrière-plan
+            history = get_prediction_history()
+            if history is not None:
+                history.record(user_inputs, predicted_price_usd, version.label, latency, get_session_id())
         
         if predicted_price_usd:
             # Conversion de devise
@@ -815,7 +1091,8 @@ votre-projet-immobilier/
             rmse_score = feature_info.get('rmse_score', 26240.20)
             r2_score = feature_info.get('r2_score', 0.8688)
             
-            st.markdown(f"""
+            with METRICS.span('html_render'):
+                st.markdown(f"""
             <div class="prediction-card fade-in-up">
                 <h2>🎯 Prix Estimé par Votre Modèle</h2>
                 <div class="prediction-price">{currency_symbol}{predicted_price:,.0f}</div>
@@ -828,10 +1105,11 @@ votre-projet-immobilier/
                 st.markdown("## 📈 Analyses Visuelles Interactives")
                 
                 # Créer les graphiques
-                fig_surface, fig_quality, fig_evolution = create_interactive_charts(
-                    surface_data, quality_data, evolution_data, 
-                    predicted_price_usd, user_inputs
-                )
+                with METRICS.span('figure_construction'):
+                    fig_surface, fig_quality, fig_evolution = create_interactive_charts(
+                        surface_data, quality_data, evolution_data, 
+                        predicted_price_usd, user_inputs
+                    )
                 
                 # Affichage responsive des graphiques
                 col_chart1, col_chart2 = st.columns(2)
@@ -850,27 +1128,18 @@ votre-projet-immobilier/
                     st.plotly_chart(fig_quality, use_container_width=True)
                     st.markdown('</div>', unsafe_allow_html=True)
                     
-                    # Graphique d'importance des features
-                    if 'feature_importance' in feature_info:
-                        importance_df = pd.DataFrame(feature_info['feature_importance'])
-                        
-                        fig_importance = px.bar(
-                            importance_df.head(6),
-                            x='importance',
-                            y='feature',
-                            orientation='h',
-                            title="🎯 Importance des Features",
-                            color='importance',
-                            color_continuous_scale='viridis'
-                        )
-                        
-                        fig_importance.update_layout(
-                            height=400,
-                            font_family="Inter",
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            yaxis={'categoryorder': 'total ascending'}
+                    # Contributions des features à CETTE prédiction (importance globale à défaut)
+                    explainer = get_contribution_explainer(model, feature_info, version.key)
+                    if explainer is not None:
+                        with METRICS.span('feature_contributions'):
+                            contributions = explainer.explain(binder.row(user_inputs))[0]
+                        st.plotly_chart(
+                            create_contribution_chart(explainer.feature_names, contributions, explainer.bias),
+                            use_container_width=True
                         )
+                    elif 'feature_importance' in feature_info:
+                        with METRICS.span('figure_construction'):
+                            fig_importance = build_importance_chart(feature_info['feature_importance'])
                         
                         st.plotly_chart(fig_importance, use_container_width=True)
                 
@@ -911,19 +1180,38 @@ votre-projet-immobilier/
                     """, unsafe_allow_html=True)
                 
                 with col_analysis3:
-                    # Confiance de la prédiction basée sur vos performances
+                    # Confiance de la prédiction : intervalle propre à cette propriété (arbres du modèle)
                     confidence = (r2_score * 100)
-                    error_margin = rmse_score / predicted_price_usd * 100
+                    interval_estimator = get_interval_estimator(model, feature_info, version.key)
+                    if interval_estimator is not None:
+                        with METRICS.span('prediction_interval'):
+                            _, lower, upper = interval_estimator.predict_interval(binder.row(user_inputs))
+                        lower_price, upper_price = float(lower[0]), float(upper[0])
+                        if interval_estimator.empirical_coverage is not None:
+                            interval_label = (f"Intervalle {interval_estimator.coverage:.0%} "
+                                              f"(couverture mesurée {interval_estimator.empirical_coverage:.0%})")
+                        else:
+                            interval_label = "Fourchette (dispersion des arbres)"
+                    else:
+                        lower_price, upper_price = predicted_price_usd - rmse_score, predicted_price_usd + rmse_score
+                        interval_label = "Fourchette (±RMSE)"
+                    error_margin = (upper_price - lower_price) / 2 / predicted_price_usd * 100
                     
                     st.markdown(f"""
                     <div class="metric-card">
                         <h4>🎯 Confiance Prédiction</h4>
                         <p><strong>Confiance modèle:</strong> {confidence:.1f}%</p>
                         <p><strong>Marge d'erreur:</strong> ±{error_margin:.1f}%</p>
-                        <p><strong>Fourchette:</strong> ${predicted_price_usd - rmse_score:,.0f} - ${predicted_price_usd + rmse_score:,.0f}</p>
-                        <p><strong>Fiabilité:</strong> {"🚀 Très élevée" if confidence > 85 else "📊 Élevée" if confidence > 75 else "⚠️ Modérée"}</p>
+                        <p><strong>{interval_label}:</strong> ${lower_price:,.0f} - ${upper_price:,.0f}</p>
+                        <p><strong>Fiabilité:</strong> {"🚀 Très élevée" if error_margin < 10 else "📊 Élevée" if error_margin < 20 else "⚠️ Modérée"}</p>
                     </div>
                     """, unsafe_allow_html=True)
+                
+                # Analyse « et si » autour de la propriété (lot unique, sur le modèle d'origine)
+                render_sensitivity_sweep(model, binder, version, user_inputs)
+                
+                # Ventes réelles les plus proches (index KD-tree prébâti)
+                render_comparables(binder, feature_info, version, user_inputs, predicted_price_usd)
     
     # Message de bienvenue si pas de prédiction
     else:
@@ -945,9 +1233,10 @@ votre-projet-immobilier/
         if advanced_mode:
             st.markdown("## 📊 Aperçu de Votre Dataset")
             
-            fig_surface, fig_quality, fig_evolution = create_interactive_charts(
-                surface_data, quality_data, evolution_data
-            )
+            with METRICS.span('figure_construction'):
+                fig_surface, fig_quality, fig_evolution = create_interactive_charts(
+                    surface_data, quality_data, evolution_data
+                )
             
             # Layout responsive pour les graphiques
             tab1, tab2, tab3 = st.tabs(["📐 Surface-Prix", "⭐ Qualité-Prix", "📈 Évolution Temporelle"])
@@ -963,36 +1252,155 @@ votre-projet-immobilier/
             with tab3:
                 st.plotly_chart(fig_evolution, use_container_width=True)
                 st.markdown("*Évolution des prix selon l'année de construction*")
+
+# Valeurs par défaut du formulaire, utilisées pour la prédiction synthétique du préchauffage
+WARMUP_INPUTS = {
+    'overall_qual': 7,
+    'gr_liv_area': 1500,
+    'total_bsmt_sf': 1000,
+    'garage_area': 500,
+    'year_built': 2000,
+    'full_bath': 2,
+    'tot_rms_abv_grd': 7,
+    'fireplaces': 1,
+    'garage_cars': 2
+}
+
+# Fonction pour préchauffer les graphiques Plotly hors du chemin de démarrage
+def warm_up_charts(predicted_price):
+    """Importer plotly.express et construire les graphiques de base (fil d'arrière-plan)"""
+    started = time.perf_counter()
+    try:
+        surface_data, quality_data, evolution_data = create_demo_data()
+        create_interactive_charts(surface_data, quality_data, evolution_data, predicted_price, WARMUP_INPUTS)
+    except Exception:
+        logger.exception("Préchauffage des graphiques impossible")
+        return
+    METRICS.set_gauge('warmup_charts_seconds', time.perf_counter() - started)
+
+# Fonction pour préchauffer le processus avant le premier utilisateur
+def warm_up():
+    """Exécuter une fois par processus toutes les initialisations paresseuses, puis passer prêt
+
+    Chargement du modèle (et lancement du processus fantôme), évaluateur natif, prédiction
+    synthétique et données de démonstration. La prédiction synthétique passe par predict_matrix :
+    ni cache, ni historique, ni surveillance de dérive, ni message d'erreur dans la page. En cas
+    d'échec, le processus reste non prêt (le message d'erreur du modèle est affiché par main).
+
+    Les graphiques Plotly sont préchauffés ensuite dans un fil d'arrière-plan, une fois le
+    processus prêt : l'import de plotly.express ne retarde pas la première prédiction
+    (HOUSE_CHART_WARMUP=0 le désactive, voir benchmarks/startup_benchmark.py).
+    """
+    readiness = get_readiness()
+    if readiness.ready:
+        return
+    state = {}
+
+    def load_models():
+        holder = get_model_holder()
+        if holder.current is None:
+            raise RuntimeError(holder.last_error)
+        state['version'] = holder.current
+        get_shadow_scorer()
+        get_prediction_history()
+        get_prediction_cache()
+
+    def first_prediction():
+        version = state['version']
+        predictor = get_native_evaluator(version.model, version.feature_info, version.key)
+        get_drift_monitor(version.feature_info, version.key)
+        predictions = predict_matrix(predictor, version.binder.row(WARMUP_INPUTS), version.feature_info['feature_names'])
+        if not np.all(np.isfinite(predictions)):
+            raise ValueError("Prédiction de préchauffage invalide (valeurs non finies)")
+        state['price'] = float(predictions[0])
+
+    try:
+        warmed = readiness.warm_up([
+            ('model_load', load_models),
+            ('prediction', first_prediction),
+            ('demo_data', create_demo_data)
+        ])
+    except Exception:
+        logger.exception("Préchauffage impossible, le processus reste non prêt")
+        return
+    if warmed and os.environ.get('HOUSE_CHART_WARMUP', '1').lower() not in ('0', 'false', 'no'):
+        thread = threading.Thread(target=warm_up_charts, args=(state['price'],), name='chart-warmup', daemon=True)
+        # Contexte de la session courante : les caches Streamlit s'utilisent sans avertissement dans le fil
+        add_script_run_ctx(thread, get_script_run_ctx())
+        thread.start()
+
+# Interface principale
+def main():
+    # Header responsive avec vos vraies performances
+    st.markdown("""
+    <div class="main-header fade-in-up">
+        <h1>🏠 Prédicteur Prix Immobilier IA</h1>
+        <p>Random Forest Optimisé • R² = 0.8688 • RMSE = $26,240 • Interface Responsive</p>
+    </div>
+    """, unsafe_allow_html=True)
     
-    # Footer responsive avec informations sur votre projet
-    st.markdown("---")
-    
-    # Layout adaptatif pour le footer
-    footer_cols = st.columns([1, 1, 1])
+    # Charger VOS VRAIS modèles
+    with METRICS.span('model_load'):
+        model, feature_info, models_loaded, version = load_real_models()
+        binder = version.binder if models_loaded else None
     
-    with footer_cols[0]:
+    # Si les modèles ne sont pas chargés, afficher un message d'erreur
+    if not models_loaded:
         st.markdown("""
-        <div class="success-box">
-            <h4>🎯 Votre Modèle</h4>
-            <p><strong>Random Forest Optimisé</strong> entraîné sur 1,456 transactions avec 86.9% de précision.</p>
+        <div class="error-box">
+            <h3>⚠️ Modèles non disponibles</h3>
+            <p>Veuillez vous assurer que les fichiers suivants sont présents dans le répertoire :</p>
+            <ul>
+                <li><code>xgb_model.pkl</code> - Votre modèle Random Forest entraîné</li>
+                <li><code>feature_info.pkl</code> - Métadonnées de vos features</li>
+            </ul>
+            <p><strong>📁 Structure attendue :</strong></p>
+            <pre>
+votre-projet-immobilier/
+├── streamlit_app.py
+├── xgb_model.pkl
+├── feature_info.pkl
+└── requirements.txt
+            </pre>
         </div>
         """, unsafe_allow_html=True)
+        return
     
-    with footer_cols[1]:
-        st.markdown("""
-        <div class="info-box">
-            <h4>📊 Features Clés</h4>
-            <p><strong>9 caractéristiques</strong> sélectionnées par importance : Qualité, Surface, Sous-sol, Garage, etc.</p>
-        </div>
-        """, unsafe_allow_html=True)
+    # Réglages de la barre latérale (un changement réexécute toute la page)
+    scoring_mode, unit_system, currency, advanced_mode = render_sidebar(model, feature_info, version)
     
-    with footer_cols[2]:
-        st.markdown("""
-        <div class="warning-box">
-            <h4>⚠️ Précision</h4>
-            <p><strong>Marge d'erreur ±$26,240</strong> basée sur les performances réelles de votre modèle.</p>
-        </div>
-        """, unsafe_allow_html=True)
+    # Mode portefeuille : scoring par morceaux d'un fichier complet
+    if scoring_mode == "📁 Portefeuille (CSV/Parquet)":
+        render_portfolio_scoring(model, feature_info, version)
+        render_footer()
+        return
+    
+    # Formulaire, résumé et résultats : réexécutés seuls à chaque soumission
+    render_property_evaluation(model, feature_info, binder, version, unit_system, currency, advanced_mode)
+    
+    # Footer responsive avec informations sur votre projet
+    render_footer()
+
+# Fonction pour exporter les métriques à la fin de chaque exécution
+def export_metrics():
+    """Écrire le fichier Prometheus si configuré"""
+    metrics_file = os.environ.get('HOUSE_METRICS_FILE')
+    if metrics_file:
+        METRICS.write_textfile(metrics_file)
+
+@st.cache_resource
+def start_metrics_exporter(port, host):
+    """Démarrer une seule fois par processus l'exporteur /metrics et la sonde /ready"""
+    return METRICS.start_http_exporter(port, host, readiness=get_readiness())
 
 if __name__ == "__main__":
-    main()
+    # Port annexe démarré avant le préchauffage : /ready répond 503 tant qu'il n'est pas terminé
+    metrics_port = os.environ.get('HOUSE_METRICS_PORT')
+    if metrics_port:
+        start_metrics_exporter(int(metrics_port), os.environ.get('HOUSE_METRICS_HOST', '127.0.0.1'))
+    # Hors de la span 'rerun' : le coût du premier chargement n'entre pas dans la latence mesurée
+    warm_up()
+    with METRICS.span('rerun'):
+        main()
+    if METRICS.enabled:
+        export_metrics()
@@ -0,0 +1,2 @@
+# tests/__init__.py
+# Tests pytest des modules du dépôt (lancer depuis la racine : python -m pytest -q)
@@ -0,0 +1,41 @@
+# tests/conftest.py
+# Fixtures partagées : modèle et métadonnées livrés avec le dépôt, lignes synthétiques
+
+import os
+import warnings
+
+import pytest
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, load_feature_info, load_model
+from tree_evaluator import sample_features
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def model():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickle XGBoost d'une version antérieure, comme dans l'application
+        loaded = load_model(os.path.join(ROOT, MODEL_PATH))
+    if loaded is None:
+        pytest.skip(f"Fichier '{MODEL_PATH}' non trouvé")
+    return loaded
+
+
+@pytest.fixture(scope='session')
+def feature_info():
+    loaded = load_feature_info(os.path.join(ROOT, FEATURE_INFO_PATH))
+    if loaded is None:
+        pytest.skip(f"Fichier '{FEATURE_INFO_PATH}' non trouvé")
+    return loaded
+
+
+@pytest.fixture(scope='session')
+def feature_names(feature_info):
+    return list(feature_info['feature_names'])
+
+
+@pytest.fixture(scope='session')
+def sample_rows(feature_info):
+    """256 lignes tirées dans les plages d'entraînement (DataFrame, ordre du modèle)"""
+    return sample_features(feature_info, 256, seed=42)
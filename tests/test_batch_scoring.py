@@ -0,0 +1,120 @@
+# tests/test_batch_scoring.py
+# Scoring en ligne de commande : résultat complet, erreurs en SystemExit, jamais de fichier partiel
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_scoring
+from batch_scoring import ERROR_COLUMN, PREDICTION_COLUMN, check_columns, detect_format, score_file
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, predict_matrix
+from tests.conftest import ROOT
+
+MODEL_ARGS = ['--model', os.path.join(ROOT, MODEL_PATH), '--feature-info', os.path.join(ROOT, FEATURE_INFO_PATH)]
+
+
+@pytest.fixture
+def portfolio(tmp_path, sample_rows):
+    path = tmp_path / 'portefeuille.csv'
+    sample_rows.to_csv(path, index=False)
+    return path
+
+
+def run_cli(*argv):
+    batch_scoring.main([str(arg) for arg in argv])
+
+
+def test_scores_every_row_in_order(portfolio, tmp_path, model, feature_names, sample_rows):
+    output = tmp_path / 'scores.csv'
+    run_cli(portfolio, '--output', output, '--workers', 2, '--chunk-size', 50, *MODEL_ARGS)
+    scores = pd.read_csv(output)
+    assert len(scores) == len(sample_rows)
+    pd.testing.assert_frame_equal(scores[feature_names], sample_rows[feature_names], check_dtype=False)
+    expected = predict_matrix(model, sample_rows[feature_names].to_numpy(), feature_names)
+    np.testing.assert_allclose(scores[PREDICTION_COLUMN], expected, rtol=1e-5)
+    assert not os.path.exists(f'{output}.tmp')
+    assert scores[ERROR_COLUMN].isna().all()
+
+
+def test_malformed_cells_are_rejected(tmp_path, sample_rows, capsys):
+    source = tmp_path / 'portefeuille.csv'
+    rows = sample_rows.head(6).astype(object)
+    rows.loc[1, 'GrLivArea'] = '1,200'
+    rows.loc[3, 'OverallQual'] = 'bonne'
+    rows.loc[3, 'YearBuilt'] = '20O3'
+    rows.loc[4, 'Fireplaces'] = None  # cellule vide : valeur manquante, la ligne reste scorée
+    rows.to_csv(source, index=False)
+    output = tmp_path / 'scores.csv'
+    run_cli(source, '--output', output, '--workers', 1, *MODEL_ARGS)
+    scores = pd.read_csv(output, keep_default_na=False, na_values=[''])
+    assert scores[PREDICTION_COLUMN].isna().tolist() == [False, True, False, True, False, False]
+    assert scores.loc[1, ERROR_COLUMN] == "valeurs non numériques: GrLivArea='1,200'"
+    assert 'OverallQual' in scores.loc[3, ERROR_COLUMN] and 'YearBuilt' in scores.loc[3, ERROR_COLUMN]
+    assert '2 lignes non scorées' in capsys.readouterr().err
+
+
+def test_score_file_reports_rejected_rows(model, feature_names, sample_rows, tmp_path):
+    source = tmp_path / 'portefeuille.csv'
+    rows = sample_rows.head(4).astype(object)
+    rows.loc[2, 'GarageCars'] = 'deux'
+    rows.to_csv(source, index=False)
+    output = tmp_path / 'scores.csv'
+    with open(source, 'rb') as f, open(output, 'w', newline='') as out:
+        assert score_file(model, feature_names, f, 'csv', out, chunk_size=2) == (4, 1)
+    assert pd.read_csv(output)[PREDICTION_COLUMN].isna().tolist() == [False, False, True, False]
+
+
+def test_missing_columns_leave_no_output(tmp_path, sample_rows):
+    source = tmp_path / 'incomplet.csv'
+    sample_rows.drop(columns=['GarageArea']).to_csv(source, index=False)
+    output = tmp_path / 'scores.csv'
+    with pytest.raises(SystemExit, match='Colonnes manquantes'):
+        run_cli(source, '--output', output, '--workers', 1, *MODEL_ARGS)
+    assert sorted(os.listdir(tmp_path)) == ['incomplet.csv']
+
+
+def test_missing_model_leaves_no_output(portfolio, tmp_path):
+    output = tmp_path / 'scores.csv'
+    with pytest.raises(SystemExit, match='❌'):
+        run_cli(portfolio, '--output', output, '--workers', 1, '--model', tmp_path / 'absent.pkl')
+    assert sorted(os.listdir(tmp_path)) == ['portefeuille.csv']
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(SystemExit, match='non supporté'):
+        run_cli(tmp_path / 'portefeuille.xlsx')
+
+
+def test_missing_input(tmp_path):
+    with pytest.raises(SystemExit, match='❌'):
+        run_cli(tmp_path / 'absent.csv', '--output', tmp_path / 'scores.csv')
+    assert os.listdir(tmp_path) == []
+
+
+def test_unwritable_output(portfolio, tmp_path):
+    with pytest.raises(SystemExit, match='❌'):
+        run_cli(portfolio, '--output', tmp_path / 'absent' / 'scores.csv', *MODEL_ARGS)
+
+
+@pytest.mark.parametrize('option', ['--chunk-size', '--workers'])
+def test_non_positive_settings(portfolio, option):
+    with pytest.raises(SystemExit, match='positifs'):
+        run_cli(portfolio, option, 0)
+
+
+def test_detect_format_and_columns():
+    assert detect_format('a/B.PARQUET') == 'parquet'
+    assert detect_format('scores.txt') == 'csv'
+    with pytest.raises(ValueError):
+        detect_format('scores.json')
+    with pytest.raises(ValueError, match='GarageArea'):
+        check_columns(['GrLivArea'], ['GrLivArea', 'GarageArea'])
+
+
+def test_cli_does_not_import_streamlit():
+    code = "import sys, batch_scoring; sys.exit('streamlit' in sys.modules or 'plotly' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
@@ -0,0 +1,90 @@
+# tests/test_comparables.py
+# Index des ventes comparables : recherche, persistance et invalidation par l'empreinte de la source
+
+import copy
+import json
+import os
+
+import numpy as np
+import pytest
+
+from comparables import DISTANCE_COLUMN, ID_COLUMN, MANIFEST_FILE, PRICE_COLUMN, ComparablesIndex
+from tree_evaluator import sample_features
+
+
+def write_sales(path, feature_info, rows, seed=0):
+    sales = sample_features(feature_info, rows, seed=seed)
+    sales.insert(0, ID_COLUMN, np.arange(1, rows + 1))
+    sales[PRICE_COLUMN] = 50_000 + sales['GrLivArea'] * 100
+    sales.to_csv(path, index=False)
+    return sales
+
+
+@pytest.fixture
+def sales_path(tmp_path, feature_info):
+    path = tmp_path / 'sales.csv'
+    write_sales(path, feature_info, 300)
+    return str(path)
+
+
+@pytest.fixture
+def no_rebuild(monkeypatch):
+    """Faire échouer toute reconstruction : l'index doit être relu depuis le disque"""
+    def build(cls, sales_path, feature_info):
+        pytest.fail("index reconstruit alors que la source n'a pas changé")
+    monkeypatch.setattr(ComparablesIndex, 'build', classmethod(build))
+
+
+def test_query_returns_nearest_first(sales_path, feature_info, feature_names):
+    index = ComparablesIndex.build(sales_path, feature_info)
+    assert len(index) == 300
+    comparables = index.query(index.features[10], k=5)
+    assert len(comparables) == 5
+    assert comparables[ID_COLUMN].iloc[0] == 11
+    assert comparables[DISTANCE_COLUMN].iloc[0] == 0
+    assert comparables[DISTANCE_COLUMN].is_monotonic_increasing
+    assert list(comparables.columns) == [ID_COLUMN, *feature_names, PRICE_COLUMN, DISTANCE_COLUMN]
+
+
+def test_saved_index_is_reused(sales_path, feature_info, tmp_path, request):
+    directory = str(tmp_path / 'index')
+    built = ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    assert sorted(os.listdir(tmp_path)) == ['index', 'sales.csv']  # ni .tmp-* ni .old-*
+    request.getfixturevalue('no_rebuild')
+    loaded = ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    assert loaded.fingerprint == built.fingerprint
+    np.testing.assert_array_equal(loaded.query(built.features[0])[ID_COLUMN], built.query(built.features[0])[ID_COLUMN])
+
+
+def test_changed_sales_invalidate(sales_path, feature_info, tmp_path):
+    directory = str(tmp_path / 'index')
+    ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    write_sales(sales_path, feature_info, 320, seed=1)
+    rebuilt = ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    assert len(rebuilt) == 320
+    assert len(ComparablesIndex.load(directory)) == 320
+
+
+def test_changed_bounds_invalidate(sales_path, feature_info, tmp_path):
+    directory = str(tmp_path / 'index')
+    first = ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    widened = copy.deepcopy(feature_info)
+    widened['feature_ranges']['GrLivArea']['max'] *= 2
+    rebuilt = ComparablesIndex.load_or_build(sales_path, widened, directory)
+    assert rebuilt.fingerprint != first.fingerprint
+    assert rebuilt.span[list(feature_info['feature_names']).index('GrLivArea')] > \
+        first.span[list(feature_info['feature_names']).index('GrLivArea')]
+
+
+def test_inconsistent_index_is_rebuilt(sales_path, feature_info, tmp_path):
+    directory = str(tmp_path / 'index')
+    ComparablesIndex.load_or_build(sales_path, feature_info, directory)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['rows'] += 1
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        ComparablesIndex.load(directory)
+    assert len(ComparablesIndex.load_or_build(sales_path, feature_info, directory)) == 300
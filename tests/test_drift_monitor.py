@@ -0,0 +1,107 @@
+# tests/test_drift_monitor.py
+# Surveillance de dérive : PSI, part hors plage d'entraînement, moments et fusion des états
+
+import math
+
+import numpy as np
+import pytest
+
+from drift_monitor import (
+    MIN_ROWS,
+    PREDICTION_COLUMN,
+    DriftMonitor,
+    drift_status,
+    load_merged,
+    population_stability,
+)
+from tree_evaluator import sample_features
+
+
+def scores_by_feature(monitor):
+    return {score['feature']: score for score in monitor.scores()}
+
+
+@pytest.fixture(scope='module')
+def reference_info(feature_info):
+    """Métadonnées avec une esquisse de référence construite sur 5 000 lignes d'entraînement simulées"""
+    reference = DriftMonitor.for_model(feature_info)
+    reference.update(sample_features(feature_info, 5_000, seed=0).to_numpy())
+    return {**feature_info, 'drift_reference': reference.to_dict()}
+
+
+def test_population_stability():
+    assert population_stability([10, 20, 30], [1, 2, 3]) == pytest.approx(0.0)
+    expected = (0.9 - 0.5) * math.log(0.9 / 0.5) + (0.1 - 0.5) * math.log(0.1 / 0.5)
+    assert population_stability([50, 50], [90, 10]) == pytest.approx(expected)
+    assert population_stability([50, 50], [100, 0]) > 1  # case vide : epsilon, pas de division par zéro
+
+
+def test_out_of_range_fraction(feature_info, feature_names):
+    monitor = DriftMonitor.for_model(feature_info)
+    rows = sample_features(feature_info, 200, seed=1).to_numpy(copy=True)
+    column = feature_names.index('GrLivArea')
+    high = feature_info['feature_ranges']['GrLivArea']['max']
+    rows[:10, column] = high + 100    # au-dessus du maximum d'entraînement
+    rows[10:20, column] = -1          # sous le minimum
+    monitor.update(rows)
+    scores = scores_by_feature(monitor)
+    assert scores['GrLivArea']['out_of_range'] == pytest.approx(20 / 200)
+    assert scores['GrLivArea']['status'] == 'dérive'
+    assert scores['OverallQual']['out_of_range'] == 0
+
+
+def test_same_distribution_is_ok(reference_info):
+    monitor = DriftMonitor.for_model(reference_info)
+    monitor.update(sample_features(reference_info, 2_000, seed=3).to_numpy())
+    for name, score in scores_by_feature(monitor).items():
+        if name != PREDICTION_COLUMN:
+            assert score['psi'] < 0.1, name
+            assert score['status'] == 'ok', name
+
+
+def test_shifted_distribution_drifts(reference_info, feature_names):
+    rows = sample_features(reference_info, 2_000, seed=3).to_numpy(copy=True)
+    rows[:, feature_names.index('YearBuilt')] -= 60
+    monitor = DriftMonitor.for_model(reference_info)
+    monitor.update(rows)
+    score = scores_by_feature(monitor)['YearBuilt']
+    assert score['psi'] >= 0.25
+    assert score['status'] == 'dérive'
+    assert score['mean'] == pytest.approx(rows[:, feature_names.index('YearBuilt')].mean())
+
+
+def test_moments_match_numpy(feature_info):
+    rows = sample_features(feature_info, 300, seed=4).to_numpy()
+    monitor = DriftMonitor.for_model(feature_info)
+    for batch in np.array_split(rows, 7):
+        monitor.update(batch, predictions=batch[:, 0] * 100)
+    np.testing.assert_allclose(monitor.mean[:-1], rows.mean(axis=0))
+    np.testing.assert_allclose(monitor.std()[:-1], rows.std(axis=0, ddof=1))
+    assert monitor.rows == 300
+
+
+def test_merged_states_equal_single_monitor(reference_info, tmp_path):
+    rows = sample_features(reference_info, 400, seed=5).to_numpy()
+    single = DriftMonitor.for_model(reference_info)
+    single.update(rows)
+    for worker, batch in enumerate(np.array_split(rows, 3)):
+        monitor = DriftMonitor.for_model(reference_info)
+        monitor.update(batch)
+        monitor.save(str(tmp_path / f'worker-{worker}.json'))
+    merged = load_merged(str(tmp_path), reference_info)
+    np.testing.assert_array_equal(merged.counts, single.counts)
+    np.testing.assert_allclose(merged.mean, single.mean)
+    assert [s['psi'] for s in merged.scores()] == pytest.approx([s['psi'] for s in single.scores()])
+
+
+def test_status_needs_enough_rows():
+    assert drift_status(MIN_ROWS - 1, 1.0, 1.0, 5.0) is None
+    assert drift_status(MIN_ROWS, 0.05, 0.0, 0.1) == 'ok'
+    assert drift_status(MIN_ROWS, 0.15, 0.0, None) == 'avertissement'
+    assert drift_status(MIN_ROWS, None, 0.06, None) == 'dérive'
+
+
+def test_incompatible_merge(feature_info):
+    monitor = DriftMonitor.for_model(feature_info)
+    with pytest.raises(ValueError):
+        monitor.merge(DriftMonitor.for_model(feature_info, bins=8))
@@ -0,0 +1,58 @@
+# tests/test_feature_contributions.py
+# Contributions des features : additivité (biais + contributions = prédiction), parité XGBoost pred_contribs
+
+import numpy as np
+import pytest
+
+from feature_contributions import ContributionExplainer, check_xgboost_parity
+from tree_evaluator import TreeEnsemble, sample_features
+
+
+@pytest.fixture(scope='module')
+def explainer(model, feature_names):
+    return ContributionExplainer.from_model(model, feature_names)
+
+
+def test_contributions_sum_to_prediction_minus_bias(explainer, model, sample_rows):
+    contributions = explainer.explain(sample_rows)
+    assert contributions.shape == sample_rows.shape
+    np.testing.assert_allclose(contributions.sum(axis=1), model.predict(sample_rows) - explainer.bias, atol=1.0)
+
+
+def test_matches_xgboost_pred_contribs(explainer, model, sample_rows):
+    import xgboost as xgb
+
+    reference = model.get_booster().predict(
+        xgb.DMatrix(sample_rows.to_numpy(), feature_names=explainer.feature_names),
+        pred_contribs=True, approx_contribs=True
+    )
+    contributions = explainer.explain(sample_rows)
+    np.testing.assert_allclose(contributions, reference[:, :-1], atol=1.0)
+    assert explainer.bias == pytest.approx(float(reference[0, -1]), abs=1.0)
+    assert check_xgboost_parity(model, explainer, sample_rows)['ok']
+
+
+def test_missing_values_follow_default_branch(explainer, model, sample_rows):
+    rows = sample_rows.copy()
+    rows.iloc[::2, 1] = np.nan
+    contributions = explainer.explain(rows)
+    np.testing.assert_allclose(contributions.sum(axis=1), model.predict(rows) - explainer.bias, atol=1.0)
+    assert check_xgboost_parity(model, explainer, rows)['ok']
+
+
+def test_blocks_match_single_pass(explainer, sample_rows):
+    np.testing.assert_allclose(explainer.explain(sample_rows, block_size=10), explainer.explain(sample_rows))
+
+
+def test_sklearn_forest_additivity(feature_info):
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = sample_features(feature_info, 400, seed=1)
+    y = X['GrLivArea'] * 100 + X['OverallQual'] * 10_000
+    forest = RandomForestRegressor(n_estimators=5, max_depth=5, random_state=0).fit(X, y)
+    explainer = ContributionExplainer(TreeEnsemble.from_model(forest))
+    rows = sample_features(feature_info, 50, seed=2)
+    np.testing.assert_allclose(explainer.bias + explainer.explain(rows).sum(axis=1), forest.predict(rows), rtol=1e-9)
+    importance = explainer.global_importance(rows)
+    assert {item['feature'] for item in importance[:2]} == {'GrLivArea', 'OverallQual'}
+    assert sum(item['importance'] for item in importance) == pytest.approx(1.0)
@@ -0,0 +1,92 @@
+# tests/test_house_model.py
+# Liaison du formulaire à l'ordre des colonnes du modèle (FeatureBinder) et conversion des lignes
+
+import threading
+
+import numpy as np
+import pytest
+
+from house_model import (
+    INPUT_FEATURES,
+    FeatureBinder,
+    predict_matrix,
+    prepare_features_for_your_model,
+    row_to_vector,
+)
+
+USER_INPUTS = {
+    'overall_qual': 7,
+    'gr_liv_area': 1710,
+    'total_bsmt_sf': 856,
+    'garage_area': 548,
+    'year_built': 2003,
+    'full_bath': 2,
+    'tot_rms_abv_grd': 8,
+    'fireplaces': 0,
+    'garage_cars': 2
+}
+
+
+def test_row_follows_model_column_order(model, feature_names):
+    binder = FeatureBinder(feature_names, model)
+    expected = prepare_features_for_your_model(USER_INPUTS, feature_names).to_numpy(dtype=float)
+    np.testing.assert_array_equal(binder.row(USER_INPUTS), expected)
+    for position, name in enumerate(binder.feature_names):
+        key = binder.input_keys[position]
+        assert INPUT_FEATURES[key] == name
+
+
+def test_bound_prediction_matches_dataframe_path(model, feature_names):
+    binder = FeatureBinder(feature_names, model)
+    frame = prepare_features_for_your_model(USER_INPUTS, feature_names)
+    assert binder.predict(model, binder.row(USER_INPUTS))[0] == pytest.approx(float(model.predict(frame)[0]))
+
+
+def test_matrix_matches_rows(model, feature_names):
+    binder = FeatureBinder(feature_names, model)
+    rows = [USER_INPUTS, {**USER_INPUTS, 'overall_qual': 4, 'gr_liv_area': 900}]
+    matrix = binder.matrix(rows)
+    for index, user_inputs in enumerate(rows):
+        np.testing.assert_array_equal(matrix[index], binder.row(user_inputs)[0])
+    np.testing.assert_allclose(binder.predict(model, matrix), predict_matrix(model, matrix, feature_names))
+
+
+def test_order_different_from_model_is_rejected(model, feature_names):
+    with pytest.raises(ValueError):
+        FeatureBinder(list(reversed(feature_names)), model)
+
+
+@pytest.mark.parametrize('change', ['unknown', 'missing', 'duplicate'])
+def test_schema_mismatch_is_rejected(feature_names, change):
+    names = list(feature_names)
+    if change == 'unknown':
+        names[0] = 'LotArea'
+    elif change == 'missing':
+        names = names[1:]
+    else:
+        names[1] = names[0]
+    with pytest.raises(ValueError):
+        FeatureBinder(names)
+
+
+def test_row_buffer_is_per_thread(feature_names):
+    binder = FeatureBinder(feature_names)
+    main_buffer = binder.row(USER_INPUTS)
+    other = {}
+    thread = threading.Thread(target=lambda: other.setdefault('buffer', binder.row(USER_INPUTS)))
+    thread.start()
+    thread.join()
+    assert other['buffer'] is not main_buffer
+    assert binder.row(USER_INPUTS) is main_buffer
+
+
+def test_as_mapping_round_trip(feature_names):
+    binder = FeatureBinder(feature_names)
+    mapping = binder.as_mapping(binder.row(USER_INPUTS))
+    assert list(mapping) == list(feature_names)
+    assert row_to_vector(mapping, feature_names) == row_to_vector(USER_INPUTS, feature_names)
+
+
+def test_row_to_vector_missing_feature(feature_names):
+    with pytest.raises(ValueError):
+        row_to_vector({'overall_qual': 7}, feature_names)
@@ -0,0 +1,68 @@
+# tests/test_model_registry.py
+# Scoring fantôme : spécification, processus séparé, file bornée et journal de comparaison
+
+import json
+import os
+
+import pytest
+
+from house_model import MODEL_PATH
+from model_registry import PRIMARY_MODEL, ShadowScorer, parse_shadow_spec, summarize_log
+from tests.conftest import ROOT
+
+
+@pytest.mark.parametrize('spec', ['challenger', '=modele.pkl', f'{PRIMARY_MODEL}=modele.pkl'])
+def test_invalid_spec(spec):
+    with pytest.raises(ValueError):
+        parse_shadow_spec(spec)
+
+
+def test_spec_entries(tmp_path):
+    holders = parse_shadow_spec(f' a=modele.pkl:info.pkl , b={tmp_path} ,')
+    assert list(holders) == ['a', 'b']
+    assert holders['b'].artifact_dir == str(tmp_path)
+
+
+def test_disabled_without_shadows(tmp_path):
+    scorer = ShadowScorer('', str(tmp_path / 'shadow_log.jsonl'))
+    assert not scorer.enabled
+    assert not scorer.submit({'GrLivArea': 1.0}, '0001', 1.0, 0.001)
+
+
+def test_rows_are_scored_in_another_process(tmp_path, sample_rows, model):
+    log_path = tmp_path / 'shadow_log.jsonl'
+    spec = f"shadow={os.path.join(ROOT, MODEL_PATH)},absent={tmp_path / 'absent.pkl'}"
+    scorer = ShadowScorer(spec, str(log_path), max_pending=4)
+    try:
+        assert scorer.wait_loaded(60)
+        status = dict(scorer.shadows())
+        assert status['shadow']['version'] is not None
+        assert status['absent']['version'] is None
+        rows = sample_rows.head(3).to_dict('records')
+        predictions = model.predict(sample_rows.head(3))
+        accepted = [scorer.submit(row, '0001', prediction, 0.001, request_id=str(index))
+                    for index, (row, prediction) in enumerate(zip(rows, predictions))]
+        assert all(accepted)
+    finally:
+        scorer.close()
+    assert scorer._process.returncode == 0
+    with open(log_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['request_id'] for record in records] == ['0', '1', '2']
+    for record in records:
+        shadow, absent = record['shadows']
+        assert shadow['prediction'] == pytest.approx(record['primary']['prediction'], rel=1e-5)
+        assert absent['prediction'] is None and absent['error']
+    summary = summarize_log(str(log_path))
+    assert summary['shadow']['rows'] == 3 and summary['absent']['errors'] == 3
+
+
+def test_full_queue_drops_rows(tmp_path, sample_rows):
+    scorer = ShadowScorer(f"shadow={os.path.join(ROOT, MODEL_PATH)}", str(tmp_path / 'shadow_log.jsonl'),
+                          max_pending=2)
+    try:
+        row = sample_rows.iloc[0].to_dict()
+        accepted = [scorer.submit(row, '0001', 1.0, 0.001) for _ in range(5000)]  # plus que le tampon du socket
+        assert not all(accepted)
+    finally:
+        scorer.close()
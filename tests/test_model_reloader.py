@@ -0,0 +1,82 @@
+# tests/test_model_reloader.py
+# Rechargement à chaud : remplacement après un changement stable, rejet d'un fichier corrompu, retour arrière
+
+import os
+import shutil
+
+import pytest
+
+from house_model import FEATURE_INFO_PATH, MODEL_PATH
+from model_reloader import ModelHolder
+from tests.conftest import ROOT
+
+# Pickle XGBoost d'une version antérieure, comme dans l'application
+pytestmark = pytest.mark.filterwarnings('ignore::UserWarning')
+
+
+@pytest.fixture
+def holder(tmp_path):
+    for name in (MODEL_PATH, FEATURE_INFO_PATH):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    holder = ModelHolder(str(tmp_path / MODEL_PATH), str(tmp_path / FEATURE_INFO_PATH))
+    assert holder.reload() is not None
+    return holder
+
+
+def touch(path, offset_ns):
+    """Changer la date du fichier comme une nouvelle copie (même contenu)"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset_ns))
+
+
+def test_unchanged_files_are_not_reloaded(holder):
+    first = holder.current
+    assert holder.poll() is None
+    assert holder.poll() is None
+    assert holder.current is first
+
+
+def test_stable_change_swaps_version(holder):
+    first = holder.current
+    touch(holder.model_path, 1_000_000_000)
+    assert holder.poll() is None  # premier relevé : copie possiblement en cours
+    assert holder.current is first
+    version = holder.poll()
+    assert version is not None and holder.current is version
+    assert version.key == '0002' and version.label == first.label  # même contenu, même empreinte
+    assert [v.key for v in holder.versions()] == ['0002', '0001']
+
+
+def test_changing_file_waits_until_stable(holder):
+    first = holder.current
+    touch(holder.model_path, 1_000_000_000)
+    assert holder.poll() is None
+    touch(holder.model_path, 2_000_000_000)  # toujours en cours d'écriture
+    assert holder.poll() is None
+    assert holder.current is first
+    assert holder.poll() is not None
+
+
+def test_corrupt_file_keeps_serving_version(holder):
+    first = holder.current
+    with open(holder.model_path, 'wb') as f:
+        f.write(b'pas un pickle')
+    assert holder.poll() is None
+    assert holder.poll() is None
+    assert holder.current is first
+    assert holder.last_error
+    assert [v.key for v in holder.versions()] == ['0001']
+    # Pas de nouvel essai tant que le fichier ne change pas
+    assert holder.poll() is None and holder.poll() is None
+
+
+def test_rollback_reinstalls_previous_version(holder):
+    first = holder.current
+    touch(holder.model_path, 1_000_000_000)
+    holder.poll()
+    second = holder.poll()
+    assert holder.rollback() is first
+    assert holder.current is first
+    assert [v.key for v in holder.versions()] == ['0001', '0002']
+    assert holder.rollback(key=second.key) is second
+    assert holder.rollback(key='9999') is None
@@ -0,0 +1,81 @@
+# tests/test_prediction_cache.py
+# Cache des prédictions : succès/échecs, politiques d'éviction, versions et invalidation
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction_cache import PredictionCache
+
+
+def row(*values):
+    return np.asarray([values], dtype=float)
+
+
+def test_hit_after_miss():
+    cache = PredictionCache(maxsize=4, watched_paths=())
+    calls = []
+    compute = lambda: calls.append(1) or 123.0
+    assert cache.get_or_compute(row(1, 2, 3), compute) == 123.0
+    assert cache.get_or_compute(row(1, 2, 3), compute) == 123.0
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_frame_and_array_share_key():
+    cache = PredictionCache(maxsize=4, watched_paths=())
+    cache.get_or_compute(row(1, 2), lambda: 10.0)
+    frame = pd.DataFrame([{'a': 1, 'b': 2}])
+    assert cache.get_or_compute(frame, lambda: pytest.fail("prédiction recalculée")) == 10.0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2, policy='lru', watched_paths=())
+    cache.get_or_compute(row(1), lambda: 1.0)
+    cache.get_or_compute(row(2), lambda: 2.0)
+    cache.get_or_compute(row(1), lambda: pytest.fail("1 doit être en cache"))
+    cache.get_or_compute(row(3), lambda: 3.0)  # évince 2, utilisé le moins récemment
+    assert cache.stats()['evictions'] == 1
+    assert cache.get_or_compute(row(1), lambda: -1.0) == 1.0
+    assert cache.get_or_compute(row(2), lambda: -2.0) == -2.0
+
+
+def test_fifo_evicts_oldest_insert():
+    cache = PredictionCache(maxsize=2, policy='fifo', watched_paths=())
+    cache.get_or_compute(row(1), lambda: 1.0)
+    cache.get_or_compute(row(2), lambda: 2.0)
+    cache.get_or_compute(row(1), lambda: pytest.fail("1 doit être en cache"))
+    cache.get_or_compute(row(3), lambda: 3.0)  # évince 1, inséré en premier
+    assert cache.get_or_compute(row(2), lambda: -2.0) == 2.0
+    assert cache.get_or_compute(row(1), lambda: -1.0) == -1.0
+
+
+def test_errors_are_not_cached():
+    cache = PredictionCache(maxsize=2, watched_paths=())
+    assert cache.get_or_compute(row(1), lambda: None) is None
+    assert cache.get_or_compute(row(1), lambda: 5.0) == 5.0
+    assert cache.stats()['misses'] == 2
+
+
+def test_versions_do_not_share_entries():
+    cache = PredictionCache(maxsize=4, watched_paths=())
+    cache.get_or_compute(row(1), lambda: 1.0, version='0001')
+    assert cache.get_or_compute(row(1), lambda: 2.0, version='0002') == 2.0
+
+
+def test_watched_file_change_invalidates(tmp_path):
+    watched = tmp_path / 'model.pkl'
+    watched.write_bytes(b'v1')
+    cache = PredictionCache(maxsize=4, watched_paths=(str(watched),))
+    cache.get_or_compute(row(1), lambda: 1.0)
+    watched.write_bytes(b'version 2')
+    assert cache.get_or_compute(row(1), lambda: 2.0) == 2.0
+    assert cache.stats()['invalidations'] == 1
+
+
+@pytest.mark.parametrize('kwargs', [{'maxsize': 0}, {'policy': 'random'}])
+def test_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        PredictionCache(watched_paths=(), **kwargs)
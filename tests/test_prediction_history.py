@@ -0,0 +1,97 @@
+# tests/test_prediction_history.py
+# Historique des prédictions : écriture différée par lots, aller-retour WAL, écriture à la fermeture,
+# consultation en lecture seule (sans écrivain ni création du fichier)
+
+import sqlite3
+import threading
+
+import pytest
+
+import prediction_history
+from prediction_history import HistoryView, PredictionHistory
+
+INPUTS = {'overall_qual': 7, 'gr_liv_area': 1500}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    history = PredictionHistory(str(tmp_path / 'history.db'))
+    history.record(INPUTS, 200_000.0, 'v0001', 0.002, 'session-a')
+    history.record(INPUTS, 150_000.0, 'v0002', 0.001, 'session-b')
+    history.close()
+    return str(tmp_path / 'history.db')
+
+
+def test_write_behind_queue_is_flushed(tmp_path):
+    history = PredictionHistory(str(tmp_path / 'history.db'), batch_size=7, flush_interval=0.05)
+    try:
+        for i in range(50):
+            assert history.record({**INPUTS, 'garage_cars': i}, 100_000.0 + i, 'v0001', 0.001, 'session-a')
+        history.flush()
+        assert history.pending() == 0
+        assert history.written == 50
+        rows = history.recent(limit=100)
+        assert len(rows) == 50
+        assert sorted(row['inputs']['garage_cars'] for row in rows) == list(range(50))
+    finally:
+        history.close()
+
+
+def test_wal_round_trip_with_concurrent_reader(tmp_path):
+    path = str(tmp_path / 'history.db')
+    history = PredictionHistory(path, flush_interval=0.05)
+    try:
+        # Lecteur ouvert avant l'écriture : il voit les lots validés sans bloquer l'écrivain
+        view = HistoryView(path)
+        assert view.recent() == []
+        history.record(INPUTS, 180_000.0, 'v0001', 0.0015, 'session-a')
+        history.flush()
+        [row] = view.recent()
+        assert (row['predicted_price'], row['model_version'], row['session_id']) == (180_000.0, 'v0001', 'session-a')
+        assert row['inputs'] == INPUTS
+        assert row['latency_ms'] == pytest.approx(1.5)
+        assert view._reader().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    finally:
+        history.close()
+
+    # Après fermeture, une nouvelle ouverture retrouve les lignes écrites
+    reopened = PredictionHistory(path)
+    try:
+        assert [row['predicted_price'] for row in reopened.recent()] == [180_000.0]
+        assert reopened.stats_by_version()[0]['predictions'] == 1
+    finally:
+        reopened.close()
+
+
+def test_close_writes_pending_rows(tmp_path):
+    path = str(tmp_path / 'history.db')
+    history = PredictionHistory(path, flush_interval=60)
+    for _ in range(3):
+        history.record(INPUTS, 1.0)
+    history.close()
+    assert len(HistoryView(path).recent()) == 3
+
+
+def test_view_is_read_only(db_path):
+    view = HistoryView(db_path)
+    assert [row['predicted_price'] for row in view.recent()] == [150_000.0, 200_000.0]
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        view._reader().execute("DELETE FROM predictions")
+
+
+def test_cli_reads_without_writer(db_path, capsys, monkeypatch):
+    started = []
+    monkeypatch.setattr(prediction_history.PredictionHistory, '__init__', lambda *args, **kwargs: started.append(1))
+    threads = threading.active_count()
+    prediction_history.main(['--db', db_path, '--version', 'v0001'])
+    out = capsys.readouterr().out
+    assert 'Version v0002: 1 prédictions' in out
+    assert '$   200,000' in out and '$   150,000' not in out
+    assert not started and threading.active_count() == threads
+
+
+def test_cli_does_not_create_database(tmp_path):
+    path = tmp_path / 'absent.db'
+    with pytest.raises(SystemExit, match='non trouvé'):
+        prediction_history.main(['--db', str(path)])
+    assert not path.exists()
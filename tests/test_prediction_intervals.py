@@ -0,0 +1,59 @@
+# tests/test_prediction_intervals.py
+# Intervalles de prédiction : calibration conformal sur ventes de test, couverture mesurée, calibration enregistrée
+
+import numpy as np
+import pytest
+
+from prediction_intervals import IntervalEstimator
+from tree_evaluator import TreeEnsemble, sample_features
+
+
+@pytest.fixture(scope='module')
+def ensemble(model, feature_names):
+    return TreeEnsemble.from_model(model, feature_names)
+
+
+def holdout_sales(ensemble, feature_info, n_rows, seed):
+    """Ventes synthétiques : prix du modèle avec un bruit proportionnel (hétéroscédastique)"""
+    X = sample_features(feature_info, n_rows, seed=seed)
+    noise = np.random.default_rng(seed).normal(0, 0.08, n_rows)
+    return X, ensemble.predict_native(X) * (1 + noise)
+
+
+@pytest.mark.parametrize('coverage', [0.8, 0.9])
+def test_holdout_coverage_close_to_target(ensemble, feature_info, coverage):
+    estimator = IntervalEstimator(ensemble, coverage=coverage)
+    X, y = holdout_sales(ensemble, feature_info, 4000, seed=3)
+    stored = estimator.calibrate_holdout(X, y)
+    assert stored['rows'] == 2000
+    assert stored['empirical_coverage'] == estimator.empirical_coverage
+    assert abs(stored['empirical_coverage'] - coverage) < 0.03
+
+    # Nouvelles ventes de la même distribution : la couverture tient hors de l'échantillon de calibration
+    X_new, y_new = holdout_sales(ensemble, feature_info, 2000, seed=4)
+    _, lower, upper = estimator.predict_interval(X_new)
+    assert abs(np.mean((y_new >= lower) & (y_new <= upper)) - coverage) < 0.04
+
+
+def test_interval_contains_prediction(ensemble, sample_rows):
+    estimator = IntervalEstimator(ensemble)
+    predictions, lower, upper = estimator.predict_interval(sample_rows)
+    np.testing.assert_allclose(predictions, np.maximum(ensemble.predict_native(sample_rows), 0))
+    assert np.all(lower <= predictions) and np.all(predictions <= upper)
+
+
+def test_too_few_sales_are_rejected(ensemble, sample_rows):
+    with pytest.raises(ValueError):
+        IntervalEstimator(ensemble).calibrate_holdout(sample_rows.iloc[:10], np.ones(10))
+
+
+def test_stored_calibration_is_reused(model, ensemble, feature_info):
+    estimator = IntervalEstimator(ensemble)
+    stored = estimator.calibrate_holdout(*holdout_sales(ensemble, feature_info, 400, seed=5))
+    restored = IntervalEstimator.from_model(model, {**feature_info, 'interval_calibration': stored})
+    assert restored.calibration == stored['factor']
+    assert restored.empirical_coverage == stored['empirical_coverage']
+
+    # Paramètres différents : la calibration enregistrée ne s'applique pas
+    other = IntervalEstimator.from_model(model, {**feature_info, 'interval_calibration': stored}, coverage=0.8)
+    assert other.empirical_coverage is None
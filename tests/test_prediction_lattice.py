@@ -0,0 +1,87 @@
+# tests/test_prediction_lattice.py
+# Table précalculée : parité avec le modèle aux nœuds, refus hors grille, empreinte du modèle
+
+import itertools
+import json
+import os
+
+import numpy as np
+import pytest
+
+from house_model import predict_matrix
+from prediction_lattice import GARAGE_AREA_PER_CAR, MANIFEST_FILE, PredictionLattice, build_lattice
+
+# Grille réduite (960 nœuds) pour garder le test rapide
+VALUES = {'OverallQual': [5, 7], 'GarageCars': [1, 2], 'FullBath': [2], 'TotRmsAbvGrd': [6, 7], 'Fireplaces': [0, 1]}
+STEPS = {'GrLivArea': 1500, 'TotalBsmtSF': 1500, 'YearBuilt': 40}
+SIGNATURE = {'source': 'pkl', 'sha256': 'test'}
+
+
+@pytest.fixture(scope='module')
+def lattice_dir(model, feature_names, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('lattice')
+    build_lattice(model, feature_names, str(directory), steps=STEPS, values=VALUES, block_size=100,
+                  signature=SIGNATURE)
+    return directory
+
+
+@pytest.fixture(scope='module')
+def lattice(lattice_dir):
+    return PredictionLattice.load(str(lattice_dir))
+
+
+def grid_rows(lattice):
+    for nodes in itertools.product(*(axis['values'] for axis in lattice.axes)):
+        features = dict(zip((axis['feature'] for axis in lattice.axes), nodes))
+        features['GarageArea'] = features['GarageCars'] * GARAGE_AREA_PER_CAR
+        yield features
+
+
+def test_nodes_match_model(lattice, model, feature_names):
+    rows = list(grid_rows(lattice))
+    assert len(rows) == lattice.table.size
+    expected = predict_matrix(model, [[features[name] for name in feature_names] for features in rows],
+                              feature_names)
+    actual = np.array([lattice.lookup(features) for features in rows])
+    np.testing.assert_allclose(actual, expected, rtol=1e-6)
+
+
+def test_off_grid_values_are_not_served(lattice):
+    features = next(grid_rows(lattice))
+    assert lattice.lookup({**features, 'GrLivArea': features['GrLivArea'] + 1}) is None
+    assert lattice.lookup({**features, 'OverallQual': 9}) is None
+    assert lattice.lookup({**features, 'GarageArea': features['GarageArea'] + 10}) is None
+
+
+def test_signature(lattice):
+    assert lattice.matches(SIGNATURE)
+    assert not lattice.matches({'source': 'pkl', 'sha256': 'autre'})
+    assert not lattice.matches(None)
+
+
+def test_unsupported_format_version(lattice_dir, tmp_path):
+    with open(os.path.join(lattice_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    manifest['format_version'] = 1
+    for name in os.listdir(lattice_dir):
+        if name != MANIFEST_FILE:
+            os.symlink(os.path.join(lattice_dir, name), tmp_path / name)
+    with open(tmp_path / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        PredictionLattice.load(str(tmp_path))
+
+
+def test_rebuild_keeps_open_table_readable(model, feature_names, tmp_path):
+    directory = str(tmp_path / 'lattice')
+    build_lattice(model, feature_names, directory, steps=STEPS, values=VALUES, signature=SIGNATURE)
+    served = PredictionLattice.load(directory)
+    before = np.array(served.table)
+    other = {'source': 'pkl', 'sha256': 'reconstruite'}
+    build_lattice(model, feature_names, directory, steps=STEPS, values={**VALUES, 'FullBath': [1, 2]},
+                  signature=other)
+    np.testing.assert_array_equal(served.table, before)  # ancienne table toujours mappée et intacte
+    rebuilt = PredictionLattice.load(directory)
+    assert rebuilt.matches(other)
+    assert rebuilt.table.shape != before.shape
+    assert sorted(os.listdir(tmp_path)) == ['lattice']  # ni .tmp-* ni .old-*
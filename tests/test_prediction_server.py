@@ -0,0 +1,94 @@
+# tests/test_prediction_server.py
+# Micro-batching : lignes regroupées en un appel, résultats dans l'ordre, envoi par taille ou par fenêtre
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from prediction_server import MicroBatcher
+
+
+class RecordingPredictor:
+    """Fonction de prédiction qui garde la taille de chaque lot reçu"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, matrix):
+        self.batch_sizes.append(len(matrix))
+        return matrix[:, 0] * 2 + matrix[:, 1]
+
+
+def run_batcher(predict_fn, vectors, **kwargs):
+    """Soumettre toutes les lignes en même temps; renvoyer (résultats, durée, batcher)"""
+    async def scenario():
+        batcher = MicroBatcher(predict_fn, **kwargs)
+        batcher.start()
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(batcher.submit(vector) for vector in vectors),
+                                           return_exceptions=True)
+        finally:
+            await batcher.stop()
+        return results, time.perf_counter() - started, batcher
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_rows_are_merged_in_order():
+    predictor = RecordingPredictor()
+    vectors = [[i, 1000 + i] for i in range(50)]
+    results, _, batcher = run_batcher(predictor, vectors, window_ms=50, max_batch_size=512)
+    assert results == [float(2 * i + 1000 + i) for i in range(50)]
+    assert predictor.batch_sizes == [50]
+    assert (batcher.batches, batcher.rows) == (1, 50)
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    predictor = RecordingPredictor()
+    vectors = [[i, 0] for i in range(12)]
+    results, elapsed, batcher = run_batcher(predictor, vectors, window_ms=10_000, max_batch_size=4)
+    assert results == [float(2 * i) for i in range(12)]
+    assert predictor.batch_sizes == [4, 4, 4]
+    assert elapsed < 5
+
+
+def test_lone_row_is_sent_when_the_window_expires():
+    predictor = RecordingPredictor()
+    results, elapsed, _ = run_batcher(predictor, [[3, 4]], window_ms=20, max_batch_size=512)
+    assert results == [10.0]
+    assert predictor.batch_sizes == [1]
+    assert 0.015 <= elapsed < 2
+
+
+def test_prediction_error_reaches_every_row():
+    def failing(matrix):
+        raise ValueError("modèle indisponible")
+
+    results, _, batcher = run_batcher(failing, [[1, 2], [3, 4]], window_ms=20)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert batcher.batches == 0
+
+
+def test_batcher_keeps_serving_after_an_error():
+    calls = []
+
+    def flaky(matrix):
+        calls.append(len(matrix))
+        if len(calls) == 1:
+            raise ValueError("échec ponctuel")
+        return np.zeros(len(matrix))
+
+    async def scenario():
+        batcher = MicroBatcher(flaky, window_ms=5)
+        batcher.start()
+        try:
+            with pytest.raises(ValueError):
+                await batcher.submit([1, 2])
+            return await batcher.submit([3, 4])
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == 0.0
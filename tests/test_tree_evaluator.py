@@ -0,0 +1,63 @@
+# tests/test_tree_evaluator.py
+# Évaluateur natif : parité avec model.predict (XGBoost livré, forêt scikit-learn), lots, valeurs manquantes,
+# passage des gros lots au booster
+
+import numpy as np
+import pytest
+
+from tree_evaluator import BOOSTER_MIN_ROWS, TreeEnsemble, check_parity, sample_features
+
+
+@pytest.fixture(scope='module')
+def ensemble(model, feature_names):
+    return TreeEnsemble.from_model(model, feature_names)
+
+
+def test_xgboost_parity(model, ensemble, sample_rows):
+    expected = model.predict(sample_rows)
+    np.testing.assert_allclose(ensemble.predict_native(sample_rows), expected, rtol=1e-5)
+    assert check_parity(model, ensemble, sample_rows)['ok']
+
+
+def test_single_row_and_blocks(ensemble, sample_rows):
+    batch = ensemble.predict_native(sample_rows)
+    np.testing.assert_allclose(ensemble.predict_native(sample_rows, block_size=7), batch)
+    single = ensemble.predict(sample_rows.to_numpy()[3])
+    assert single.shape == (1,)
+    assert single[0] == pytest.approx(batch[3])
+
+
+def test_frame_columns_are_reordered(ensemble, sample_rows):
+    shuffled = sample_rows[list(reversed(sample_rows.columns))]
+    np.testing.assert_allclose(ensemble.predict_native(shuffled), ensemble.predict_native(sample_rows))
+
+
+def test_missing_values_follow_model(model, ensemble, sample_rows):
+    rows = sample_rows.copy()
+    rows.iloc[::3, 0] = np.nan
+    np.testing.assert_allclose(ensemble.predict_native(rows), model.predict(rows), rtol=1e-5)
+
+
+def test_large_batches_use_booster(model, ensemble, sample_rows):
+    assert ensemble.booster is not None
+    small = sample_rows.iloc[:BOOSTER_MIN_ROWS]
+    np.testing.assert_array_equal(ensemble.predict(small), ensemble.predict_native(small))
+    shuffled = sample_rows[list(reversed(sample_rows.columns))]
+    np.testing.assert_allclose(ensemble.predict(shuffled), model.predict(sample_rows), rtol=1e-6)
+
+
+def test_sklearn_forest_parity(feature_info):
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = sample_features(feature_info, 400, seed=1)
+    y = X['GrLivArea'] * 100 + X['OverallQual'] * 10_000 + np.random.default_rng(1).normal(0, 5_000, len(X))
+    forest = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    ensemble = TreeEnsemble.from_model(forest)
+    rows = sample_features(feature_info, 100, seed=2)
+    assert ensemble.booster is None
+    np.testing.assert_allclose(ensemble.predict(rows), forest.predict(rows), rtol=1e-6)
+
+
+def test_unsupported_model():
+    with pytest.raises(TypeError):
+        TreeEnsemble.from_model(object())
@@ -0,0 +1,438 @@
+# train_model.py
+# Entraînement hors mémoire et parallèle produisant xgb_model.pkl et feature_info.pkl
+#
+# Lancement :
+#   python train_model.py --data ventes.csv --workers 4 --memory-limit-mb 4096
+#   python train_model.py --data ventes.parquet --grid '{"max_depth": [4, 6], "learning_rate": [0.05, 0.1]}'
+#
+# Le fichier de ventes (CSV ou Parquet) n'est jamais chargé en entier :
+# - une première passe par morceaux calcule les bornes des features et les statistiques du prix;
+# - chaque ligne est affectée au test ou à un pli de validation croisée par un hachage de son
+#   numéro de ligne (reproductible, sans mélange en mémoire);
+# - les matrices d'entraînement sont des QuantileDMatrix XGBoost alimentées morceau par morceau
+#   (DataIter) : seules les features quantifiées (1 octet par valeur) restent en mémoire;
+# - la recherche d'hyperparamètres répartit les plis sur un pool de processus dont la taille
+#   est choisie pour que l'estimation de la mémoire de pointe reste sous --memory-limit-mb;
+#   le pic réellement mesuré est ensuite contrôlé : au-dessus de la limite, l'entraînement
+#   échoue et aucun artefact n'est écrit.
+# Le modèle final est réentraîné sur toutes les lignes hors test avec les meilleurs paramètres.
+# Les intervalles de prédiction sont ensuite calibrés sur les ventes de test et leur couverture
+# réelle mesurée (feature_info['interval_calibration'], voir prediction_intervals.py).
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+
+from batch_scoring import DEFAULT_CHUNK_SIZE, check_columns, detect_format, iter_input_chunks
+from drift_monitor import DriftMonitor
+from house_model import FEATURE_INFO_PATH, MODEL_PATH, FeatureBinder
+from prediction_intervals import IntervalEstimator
+from tree_evaluator import TreeEnsemble
+
+TARGET_COLUMN = 'SalePrice'
+
+# Ordre des colonnes du modèle livré (feature_info['feature_names'])
+TRAINING_FEATURES = ['GrLivArea', 'TotalBsmtSF', 'OverallQual', 'GarageCars', 'GarageArea',
+                     'YearBuilt', 'FullBath', 'TotRmsAbvGrd', 'Fireplaces']
+
+# Grille de recherche par défaut, autour des meilleurs paramètres du modèle livré
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'learning_rate': [0.05, 0.1],
+    'max_depth': [4, 6],
+    'min_child_weight': [1, 3],
+    'subsample': [0.8]
+}
+
+DEFAULT_FOLDS = 5
+DEFAULT_TEST_FRACTION = 0.2
+DEFAULT_MEMORY_LIMIT_MB = 2048
+DEFAULT_MAX_BIN = 256
+DEFAULT_SEED = 42
+# Ventes de test gardées en mémoire pour calibrer les intervalles (moitié calibration, moitié mesure)
+CALIBRATION_ROWS = 20_000
+
+# Estimation de la mémoire d'un processus : interpréteur + pandas + xgboost, puis par ligne
+# d'entraînement : index quantifié (1 octet par feature), pointeur de ligne, gradients,
+# cache de prédiction et label; par ligne lue : colonnes du morceau pandas et copies float.
+PROCESS_BASE_MB = 250
+BYTES_PER_TRAINING_ROW = 32
+BYTES_PER_CHUNK_VALUE = 40
+MEMORY_SAFETY_FACTOR = 1.5
+
+
+# Fonction pour affecter chaque ligne au test ou à un pli
+def row_splits(row_ids, seed, folds, test_fraction):
+    """Pli de chaque ligne (-1 = test) à partir d'un hachage splitmix64 de son numéro"""
+    with np.errstate(over='ignore'):
+        x = row_ids.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    uniform = (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+    fold = np.floor((uniform - test_fraction) / (1 - test_fraction) * folds).astype(np.int64)
+    return np.where(uniform < test_fraction, -1, np.minimum(fold, folds - 1))
+
+
+# Fonction pour lire les ventes par morceaux, prêtes pour l'entraînement
+def iter_training_chunks(config):
+    """Renvoyer (X float32, y, pli) par morceau; les lignes sans prix sont ignorées"""
+    columns = config['feature_names'] + [TARGET_COLUMN]
+    row_offset = 0
+    for chunk, _ in iter_input_chunks(config['data'], config['file_format'], config['chunk_size'], columns):
+        folds = row_splits(np.arange(row_offset, row_offset + len(chunk)), config['seed'],
+                           config['folds'], config['test_fraction'])
+        row_offset += len(chunk)
+        y = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+        X = chunk[config['feature_names']].to_numpy(dtype=np.float32)
+        labelled = ~np.isnan(y)
+        yield X[labelled], y[labelled], folds[labelled]
+
+
+class ChunkIter(xgb.DataIter):
+    """Itérateur XGBoost sur les lignes des plis retenus par `keep_fold`, relu à chaque passe"""
+
+    def __init__(self, config, keep_fold):
+        super().__init__()
+        self.config = config
+        self.keep_fold = keep_fold
+        self._chunks = None
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter_training_chunks(self.config)
+        for X, y, folds in self._chunks:
+            keep = self.keep_fold(folds)
+            if keep.any():
+                input_data(data=X[keep], label=y[keep], feature_names=self.config['feature_names'])
+                return True
+        return False
+
+
+# Fonction pour construire une matrice quantifiée sans charger le fichier
+def build_quantile_matrix(config, keep_fold):
+    return xgb.QuantileDMatrix(ChunkIter(config, keep_fold), max_bin=config['max_bin'])
+
+
+# Fonction pour évaluer un modèle sur un sous-ensemble de plis, en streaming
+def evaluate_stream(boosters, config, keep_fold, monitor=None):
+    """Sommes (n, Σy, Σy², Σerreur²) par booster, pour RMSE et R² sans garder les prédictions
+
+    `monitor` (DriftMonitor) reçoit au passage les features et les prédictions du premier booster.
+    """
+    totals = np.zeros((len(boosters), 4))
+    for X, y, folds in iter_training_chunks(config):
+        keep = keep_fold(folds)
+        if not keep.any():
+            continue
+        X, y = X[keep], y[keep]
+        for position, booster in enumerate(boosters):
+            predictions = booster.inplace_predict(X)
+            errors = predictions - y
+            totals[position] += (len(y), y.sum(), np.square(y).sum(), np.square(errors).sum())
+            if monitor is not None and position == 0:
+                monitor.update(X, np.maximum(predictions, 0))
+    return totals
+
+
+# Fonction pour extraire un échantillon borné des ventes de test
+def holdout_sample(config, limit=CALIBRATION_ROWS):
+    """Premières ventes de test (X, y), au plus `limit` lignes; la lecture s'arrête dès qu'elles suffisent"""
+    features, prices, count = [], [], 0
+    for X, y, folds in iter_training_chunks(config):
+        test = folds < 0
+        features.append(X[test][:limit - count])
+        prices.append(y[test][:limit - count])
+        count += len(prices[-1])
+        if count >= limit:
+            break
+    return np.concatenate(features), np.concatenate(prices)
+
+
+# Fonction pour convertir les sommes en scores
+def scores_from_totals(totals):
+    """RMSE et R² à partir de (n, Σy, Σy², Σerreur²)"""
+    n, sum_y, sum_y2, sse = totals
+    if n == 0:
+        return float('nan'), float('nan')
+    variance = sum_y2 - sum_y ** 2 / n
+    return float(np.sqrt(sse / n)), float(1 - sse / variance) if variance > 0 else float('nan')
+
+
+# Fonction pour entraîner un booster avec les paramètres de l'API scikit-learn
+def train_booster(dtrain, params, nthread, seed):
+    booster_params = {key: value for key, value in params.items() if key != 'n_estimators'}
+    booster_params.update(objective='reg:squarederror', tree_method='hist', nthread=nthread, seed=seed)
+    return xgb.train(booster_params, dtrain, num_boost_round=params.get('n_estimators', 100))
+
+
+# Tâche d'un processus du pool : un pli, plusieurs jeux de paramètres
+def evaluate_fold(config, fold, param_sets):
+    """Entraîner chaque jeu de paramètres sur les autres plis et le noter sur `fold`"""
+    dtrain = build_quantile_matrix(config, lambda folds: (folds >= 0) & (folds != fold))
+    boosters = [train_booster(dtrain, params, config['nthread'], config['seed']) for params in param_sets]
+    del dtrain
+    totals = evaluate_stream(boosters, config, lambda folds: folds == fold)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return fold, [scores_from_totals(row) for row in totals], peak_mb
+
+
+# Fonction pour parcourir une fois le fichier (bornes, statistiques du prix, effectifs)
+def scan_dataset(config):
+    n_features = len(config['feature_names'])
+    low = np.full(n_features, np.inf)
+    high = np.full(n_features, -np.inf)
+    fold_rows = np.zeros(config['folds'] + 1, dtype=np.int64)  # dernière case : test
+    count, mean, m2 = 0, 0.0, 0.0
+    min_price, max_price = np.inf, -np.inf
+    for X, y, folds in iter_training_chunks(config):
+        if not len(y):
+            continue
+        low = np.fmin(low, np.nanmin(X, axis=0))
+        high = np.fmax(high, np.nanmax(X, axis=0))
+        fold_rows += np.bincount(np.where(folds < 0, config['folds'], folds), minlength=config['folds'] + 1)
+        # Fusion des moments (Chan et al.) : moyenne et variance exactes en une passe
+        chunk_mean = float(y.mean())
+        chunk_m2 = float(np.square(y - chunk_mean).sum())
+        total = count + len(y)
+        delta = chunk_mean - mean
+        mean += delta * len(y) / total
+        m2 += chunk_m2 + delta ** 2 * count * len(y) / total
+        count = total
+        min_price, max_price = min(min_price, float(y.min())), max(max_price, float(y.max()))
+    if count == 0:
+        raise ValueError(f"Aucune ligne avec un prix ({TARGET_COLUMN}) dans {config['data']}")
+    return {
+        'rows': count,
+        'fold_rows': fold_rows,
+        'feature_ranges': {
+            name: {'min': _plain_number(low[i]), 'max': _plain_number(high[i])}
+            for i, name in enumerate(config['feature_names']) if np.isfinite(low[i])
+        },
+        'mean_price': mean,
+        'std_price': float(np.sqrt(m2 / (count - 1))) if count > 1 else 0.0,
+        'min_price': min_price,
+        'max_price': max_price
+    }
+
+
+def _plain_number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+# Fonction pour estimer la mémoire d'un processus d'entraînement
+def estimate_process_mb(training_rows, n_features, chunk_size, n_columns):
+    per_row = n_features + BYTES_PER_TRAINING_ROW
+    chunk = chunk_size * n_columns * BYTES_PER_CHUNK_VALUE
+    return PROCESS_BASE_MB + MEMORY_SAFETY_FACTOR * (training_rows * per_row + chunk) / 2 ** 20
+
+
+# Fonction pour choisir le nombre de processus sous la limite mémoire
+def plan_workers(requested, tasks, memory_limit_mb, process_mb):
+    """Processus simultanés (le processus principal compte pour un) tenant dans la limite"""
+    if process_mb > memory_limit_mb:
+        raise ValueError(f"Mémoire estimée par processus ({process_mb:,.0f} Mo) supérieure à la limite "
+                         f"({memory_limit_mb:,} Mo) : réduire --chunk-size ou augmenter --memory-limit-mb")
+    fitting = int((memory_limit_mb - PROCESS_BASE_MB) // process_mb)
+    return max(1, min(requested, tasks, fitting))
+
+
+# Fonction pour contrôler le pic mémoire mesuré
+def check_memory(worker_peak_mb, workers, memory_limit_mb):
+    """Pic cumulé (workers au pic simultanément + processus principal); ValueError au-dessus de la limite"""
+    main_peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    total_mb = worker_peak_mb * workers + main_peak_mb
+    if total_mb > memory_limit_mb:
+        raise ValueError(f"Pic mémoire mesuré {total_mb:,.0f} Mo au-dessus de la limite de {memory_limit_mb:,} Mo "
+                         f"({workers} × {worker_peak_mb:,.0f} Mo + {main_peak_mb:,.0f} Mo) : aucun artefact écrit, "
+                         f"réduire --workers ou --chunk-size")
+    return total_mb
+
+
+# Fonction pour développer la grille de paramètres
+def expand_grid(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+# Fonction pour la validation croisée et la recherche d'hyperparamètres sur le pool
+def search_parameters(config, param_sets, workers):
+    """Score RMSE moyen de validation croisée de chaque jeu de paramètres"""
+    # Répartir les jeux de paramètres pour occuper tous les processus même avec peu de plis
+    groups = max(1, min(len(param_sets), workers // config['folds']))
+    batches = [list(batch) for batch in np.array_split(np.arange(len(param_sets)), groups)]
+    rmse = np.zeros((config['folds'], len(param_sets)))
+    peak_mb = 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(evaluate_fold, config, fold, [param_sets[i] for i in batch]): batch
+            for fold in range(config['folds']) for batch in batches
+        }
+        for future, batch in futures.items():
+            fold, scores, worker_peak_mb = future.result()
+            rmse[fold, batch] = [score[0] for score in scores]
+            peak_mb = max(peak_mb, worker_peak_mb)
+    return rmse.mean(axis=0), peak_mb
+
+
+# Fonction pour entraîner le modèle final et produire les deux artefacts
+def train(config, param_grid, workers, memory_limit_mb, log=print):
+    started = time.perf_counter()
+    stats = scan_dataset(config)
+    train_rows = int(stats['fold_rows'][:-1].sum())
+    log(f"📊 {stats['rows']:,} ventes • {train_rows:,} entraînement / {int(stats['fold_rows'][-1]):,} test "
+        f"• passe de lecture {time.perf_counter() - started:.1f}s")
+
+    n_features = len(config['feature_names'])
+    process_mb = estimate_process_mb(train_rows, n_features, config['chunk_size'], n_features + 1)
+    param_sets = expand_grid(param_grid)
+    tasks = config['folds'] * max(1, min(len(param_sets), workers // config['folds']))
+    workers = plan_workers(workers, tasks, memory_limit_mb, process_mb)
+    config = dict(config, nthread=max(1, (os.cpu_count() or 1) // workers))
+    log(f"⚙️ {len(param_sets)} jeux de paramètres × {config['folds']} plis sur {workers} processus "
+        f"(~{process_mb:,.0f} Mo estimés par processus, limite {memory_limit_mb:,} Mo)")
+
+    cv_rmse, worker_peak_mb = search_parameters(config, param_sets, workers)
+    check_memory(worker_peak_mb, workers, memory_limit_mb)  # échouer avant l'entraînement final
+    best = int(np.argmin(cv_rmse))
+    best_params = param_sets[best]
+    log(f"🏆 Meilleurs paramètres {best_params} • RMSE CV ${cv_rmse[best]:,.0f}")
+
+    # Modèle final sur toutes les lignes hors test, dans le processus principal (pool fermé)
+    config = dict(config, nthread=os.cpu_count() or 1)
+    dtrain = build_quantile_matrix(config, lambda folds: folds >= 0)
+    booster = train_booster(dtrain, best_params, config['nthread'], config['seed'])
+    del dtrain
+    # Référence de la surveillance de dérive : features et prédictions des lignes d'entraînement
+    reference = DriftMonitor.for_model({
+        'feature_names': config['feature_names'],
+        'feature_ranges': stats['feature_ranges'],
+        'model_stats': {key: stats[key] for key in ('mean_price', 'std_price', 'min_price', 'max_price')}
+    })
+    train_rmse, train_r2 = scores_from_totals(
+        evaluate_stream([booster], config, lambda folds: folds >= 0, reference)[0]
+    )
+    test_rmse, test_r2 = scores_from_totals(evaluate_stream([booster], config, lambda folds: folds < 0)[0])
+
+    model = as_regressor(booster, best_params)
+    interval_calibration = None
+    try:
+        estimator = IntervalEstimator(TreeEnsemble.from_model(model, config['feature_names']))
+        interval_calibration = estimator.calibrate_holdout(*holdout_sample(config))
+        log(f"📏 Intervalle {estimator.coverage:.0%} : couverture mesurée {estimator.empirical_coverage:.1%} "
+            f"sur {interval_calibration['rows']:,} ventes de test (facteur x{estimator.calibration:.2f})")
+    except (TypeError, ValueError) as e:
+        log(f"⚠️ Intervalles de prédiction non calibrés: {e}")
+    feature_info = {
+        'best_params': best_params,
+        'feature_importance': sorted(
+            ({'feature': name, 'importance': float(value)}
+             for name, value in zip(config['feature_names'], model.feature_importances_)),
+            key=lambda item: item['importance'], reverse=True
+        ),
+        'feature_names': list(config['feature_names']),
+        'feature_ranges': stats['feature_ranges'],
+        'model_stats': {
+            'mean_price': stats['mean_price'],
+            'std_price': stats['std_price'],
+            'min_price': stats['min_price'],
+            'max_price': stats['max_price'],
+            'test_r2': test_r2,
+            'test_rmse': test_rmse,
+            'train_r2': train_r2,
+            'train_rmse': train_rmse,
+            'train_samples': train_rows,
+            'test_samples': int(stats['fold_rows'][-1]),
+            'cv_rmse': float(cv_rmse[best])
+        },
+        'rmse_score': test_rmse,
+        'r2_score': test_r2,
+        'drift_reference': reference.to_dict(),
+        'interval_calibration': interval_calibration
+    }
+    total_mb = check_memory(worker_peak_mb, workers, memory_limit_mb)
+    log(f"✅ Test : RMSE ${test_rmse:,.0f} • R² {test_r2:.4f} • {time.perf_counter() - started:.1f}s "
+        f"• pic mémoire cumulé {total_mb:,.0f} Mo (limite {memory_limit_mb:,} Mo)")
+    return model, feature_info
+
+
+# Fonction pour exposer le booster sous la forme attendue par l'application (XGBRegressor)
+def as_regressor(booster, params):
+    model = xgb.XGBRegressor(**params)
+    model.load_model(bytearray(booster.save_raw()))
+    return model
+
+
+# Fonction pour écrire un pickle sans laisser de fichier partiel
+def write_pickle(obj, path):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Entraîner le modèle de prix sur un historique de ventes CSV/Parquet")
+    parser.add_argument('--data', required=True, help="Fichier de ventes (features du modèle + SalePrice)")
+    parser.add_argument('--model-output', default=MODEL_PATH)
+    parser.add_argument('--feature-info-output', default=FEATURE_INFO_PATH)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Lignes lues par morceau")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus maximum du pool")
+    parser.add_argument('--memory-limit-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="Mémoire totale autorisée (pool + processus principal)")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--test-fraction', type=float, default=DEFAULT_TEST_FRACTION)
+    parser.add_argument('--grid', type=json.loads, default=DEFAULT_PARAM_GRID,
+                        help="Grille JSON {paramètre: [valeurs]} (paramètres XGBRegressor)")
+    parser.add_argument('--max-bin', type=int, default=DEFAULT_MAX_BIN)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.folds < 2:
+        raise SystemExit("Au moins 2 plis sont nécessaires pour la validation croisée")
+    if not 0 < args.test_fraction < 1:
+        raise SystemExit("--test-fraction doit être compris entre 0 et 1")
+
+    file_format = detect_format(args.data)
+    config = {
+        'data': args.data,
+        'file_format': file_format,
+        'feature_names': list(TRAINING_FEATURES),
+        'chunk_size': args.chunk_size,
+        'folds': args.folds,
+        'test_fraction': args.test_fraction,
+        'max_bin': args.max_bin,
+        'seed': args.seed
+    }
+    first_chunk, _ = next(iter_input_chunks(args.data, file_format, 1))
+    check_columns(first_chunk.columns, config['feature_names'] + [TARGET_COLUMN])
+
+    try:
+        model, feature_info = train(config, args.grid, args.workers, args.memory_limit_mb)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+    # Même contrôle de schéma que l'application au chargement, avant d'écrire
+    FeatureBinder(feature_info['feature_names'], model)
+    write_pickle(model, args.model_output)
+    write_pickle(feature_info, args.feature_info_output)
+    print(f"💾 {args.model_output} et {args.feature_info_output} écrits")
+
+
+if __name__ == '__main__':
+    main()
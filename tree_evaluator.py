@@ -0,0 +1,312 @@
+# tree_evaluator.py
+# Évaluateur natif des ensembles d'arbres : arbres aplatis en tableaux NumPy contigus
+#
+# Vérification de parité et latence :
+#   python tree_evaluator.py --rows 10000 --repeat 200
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+# Objectifs XGBoost dont la prédiction est la marge brute (fonction de lien identité)
+IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:squaredlogerror')
+
+# Nombre de lignes évaluées à la fois (borne la taille des matrices de nœuds)
+DEFAULT_BLOCK_SIZE = 8192
+
+# Au-delà de ce nombre de lignes, le booster XGBoost d'origine (s'il est disponible) est plus rapide
+BOOSTER_MIN_ROWS = 128
+
+
+class TreeEnsemble:
+    """Ensemble d'arbres aplatis en tableaux (feature, threshold, left, right, value)
+
+    Tous les arbres partagent les mêmes tableaux; `roots` donne l'indice de la racine
+    de chaque arbre. Une feuille pointe vers elle-même (seuil +inf), ce qui permet de
+    parcourir tous les arbres pour toutes les lignes en exactement `max_depth` étapes
+    vectorisées, sans boucle Python sur les arbres.
+
+    Un nœud interne envoie la ligne à gauche si x < threshold, vers `missing` si x est NaN.
+    La prédiction vaut offset + scale * somme des feuilles atteintes.
+
+    Construit depuis un modèle XGBoost en mémoire, l'ensemble garde son `booster` et lui
+    confie les lots de plus de BOOSTER_MIN_ROWS lignes; chargé depuis un artefact, il
+    n'en a pas et évalue tous les lots lui-même.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing, value, roots, max_depth,
+                 feature_names, offset=0.0, scale=1.0, kind='xgboost', cover=None, version=None, booster=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.missing = np.asarray(missing, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.cover = None if cover is None else np.asarray(cover, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names)
+        self.offset = float(offset)
+        self.scale = float(scale)
+        self.kind = kind
+        self.version = version
+        self.booster = booster
+        # Copies d'indices en intp : take() convertit sinon les indices int32 à chaque appel
+        self._feature = self.feature.astype(np.intp)
+        self._left = self.left.astype(np.intp)
+        self._right = self.right.astype(np.intp)
+        self._missing = self.missing.astype(np.intp)
+        self._roots = self.roots.astype(np.intp)
+        # XGBoost alloue les enfants par paires (droit = gauche + 1) : un seul take par niveau.
+        # Une feuille a un seuil NaN (x >= NaN est toujours faux) et reste donc sur elle-même.
+        is_leaf = self._left == self._right
+        self._adjacent = bool(np.all(is_leaf | (self._right == self._left + 1)))
+        self._right_threshold = np.where(is_leaf, np.nan, self.threshold)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    # Construction
+
+    @classmethod
+    def from_model(cls, model, feature_names=None):
+        """Aplatir un modèle XGBoost (sklearn ou Booster) ou une forêt scikit-learn"""
+        if isinstance(model, cls):
+            return model
+        if hasattr(model, 'get_booster') or type(model).__name__ == 'Booster':
+            return cls.from_xgboost(model)
+        if hasattr(model, 'estimators_'):
+            return cls.from_sklearn_forest(model, feature_names)
+        raise TypeError(f"Modèle non supporté par l'évaluateur natif: {type(model).__name__}")
+
+    @classmethod
+    def from_xgboost(cls, model):
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(bytes(booster.save_raw('json')))['learner']
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objectif XGBoost non supporté: {objective}")
+        booster_model = learner['gradient_booster']
+        if booster_model.get('name') != 'gbtree':
+            raise ValueError(f"Booster non supporté: {booster_model.get('name')}")
+        trees = booster_model['model']['trees']
+        feature_names = learner.get('feature_names') or [f'f{i}' for i in range(int(learner['learner_model_param']['num_feature']))]
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+
+        arrays = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'missing', 'value', 'cover')}
+        roots = []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree.get('split_type', [])):
+                raise ValueError("Les splits catégoriels ne sont pas supportés")
+            left = np.asarray(tree['left_children'])
+            right = np.asarray(tree['right_children'])
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float64)
+            is_leaf = left == -1
+            local = np.arange(len(left))
+
+            roots.append(offset)
+            arrays['feature'].append(np.where(is_leaf, 0, tree['split_indices']))
+            arrays['threshold'].append(np.where(is_leaf, np.inf, conditions))
+            arrays['left'].append(np.where(is_leaf, local, left) + offset)
+            arrays['right'].append(np.where(is_leaf, local, right) + offset)
+            arrays['missing'].append(np.where(is_leaf, local, np.where(np.asarray(tree['default_left']) == 1, left, right)) + offset)
+            arrays['value'].append(np.where(is_leaf, conditions, 0.0))
+            arrays['cover'].append(np.asarray(tree['sum_hessian'], dtype=np.float64))
+            max_depth = max(max_depth, _tree_depth(left, right))
+            offset += len(left)
+
+        return cls(
+            **{name: np.concatenate(parts) for name, parts in arrays.items()},
+            roots=roots, max_depth=max_depth, feature_names=feature_names,
+            offset=base_score, scale=1.0, kind='xgboost', booster=booster
+        )
+
+    @classmethod
+    def from_sklearn_forest(cls, model, feature_names=None):
+        names = feature_names if feature_names is not None else getattr(model, 'feature_names_in_', None)
+        if names is None:
+            names = [f'f{i}' for i in range(model.n_features_in_)]
+        arrays = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'missing', 'value', 'cover')}
+        roots = []
+        max_depth = 0
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            left = tree.children_left
+            right = tree.children_right
+            is_leaf = left == -1
+            local = np.arange(tree.node_count)
+            # scikit-learn teste x <= seuil : équivalent à x < seuil suivant représentable
+            threshold = np.nextafter(tree.threshold, np.inf)
+            # Les valeurs manquantes suivent la branche de droite (x <= NaN est faux)
+            missing = right
+            if hasattr(tree, 'missing_go_to_left'):
+                missing = np.where(np.asarray(tree.missing_go_to_left) == 1, left, right)
+
+            roots.append(offset)
+            arrays['feature'].append(np.where(is_leaf, 0, tree.feature))
+            arrays['threshold'].append(np.where(is_leaf, np.inf, threshold))
+            arrays['left'].append(np.where(is_leaf, local, left) + offset)
+            arrays['right'].append(np.where(is_leaf, local, right) + offset)
+            arrays['missing'].append(np.where(is_leaf, local, missing) + offset)
+            arrays['value'].append(np.where(is_leaf, tree.value[:, 0, 0], 0.0))
+            arrays['cover'].append(tree.weighted_n_node_samples.astype(np.float64))
+            max_depth = max(max_depth, int(tree.max_depth))
+            offset += tree.node_count
+
+        return cls(
+            **{name: np.concatenate(parts) for name, parts in arrays.items()},
+            roots=roots, max_depth=max_depth, feature_names=names,
+            offset=0.0, scale=1.0 / len(model.estimators_), kind='forest'
+        )
+
+    # Évaluation
+
+    def as_matrix(self, X):
+        """Convertir un DataFrame (réordonné selon feature_names) ou un tableau en matrice float64"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names].to_numpy()
+        # Les seuils sont comparés en float32, comme dans les bibliothèques d'origine
+        return np.atleast_2d(np.asarray(X, dtype=np.float32)).astype(np.float64)
+
+    def leaf_indices(self, X):
+        """Indices (globaux) des feuilles atteintes : matrice (n_lignes, n_arbres)"""
+        X = self.as_matrix(X)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self._roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            x = flat_X.take(self._feature.take(nodes) + row_offsets)
+            if self._adjacent:
+                go_right = x >= self._right_threshold.take(nodes)
+                next_nodes = self._left.take(nodes)
+                next_nodes += go_right
+            else:
+                next_nodes = np.where(x < self.threshold.take(nodes), self._left.take(nodes), self._right.take(nodes))
+            is_nan = np.isnan(x)
+            if is_nan.any():
+                next_nodes = np.where(is_nan, self._missing.take(nodes), next_nodes)
+            nodes = next_nodes
+        return nodes
+
+    def tree_values(self, X):
+        """Valeur de chaque arbre pour chaque ligne : matrice (n_lignes, n_arbres)"""
+        return self.value.take(self.leaf_indices(X))
+
+    def predict(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Prédire une ligne ou un lot; les gros lots passent par le booster d'origine s'il existe"""
+        X = self.as_matrix(X)
+        if self.booster is not None and len(X) > BOOSTER_MIN_ROWS:
+            return np.asarray(self.booster.inplace_predict(X), dtype=np.float64)
+        return self.predict_native(X, block_size)
+
+    def predict_native(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Prédire par parcours des tableaux, par blocs de `block_size` lignes"""
+        X = self.as_matrix(X)
+        if len(X) <= block_size:
+            return self.offset + self.scale * self.tree_values(X).sum(axis=1)
+        predictions = np.empty(len(X))
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            predictions[start:start + len(block)] = self.offset + self.scale * self.tree_values(block).sum(axis=1)
+        return predictions
+
+
+def _tree_depth(left, right):
+    """Profondeur maximale d'un arbre décrit par ses tableaux d'enfants"""
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):  # Les enfants ont toujours un indice supérieur au parent
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+# Fonction pour vérifier la parité avec le modèle d'origine
+def check_parity(model, ensemble, X, rtol=1e-5):
+    """Comparer les prédictions de l'évaluateur natif et du modèle d'origine"""
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = ensemble.predict_native(X)
+    abs_diff = np.abs(actual - expected)
+    return {
+        'rows': len(expected),
+        'max_abs_diff': float(abs_diff.max()),
+        'max_rel_diff': float((abs_diff / np.maximum(np.abs(expected), 1e-12)).max()),
+        'ok': bool(np.allclose(actual, expected, rtol=rtol, atol=1e-6 * np.abs(expected).max()))
+    }
+
+
+# Fonction pour générer des lignes aléatoires dans les plages d'entraînement
+def sample_features(feature_info, n_rows, seed=0):
+    """Tirer des lignes uniformes dans feature_info['feature_ranges'] (entiers)"""
+    rng = np.random.default_rng(seed)
+    ranges = feature_info.get('feature_ranges', {})
+    columns = {}
+    for feature in feature_info['feature_names']:
+        low = ranges.get(feature, {}).get('min', 0)
+        high = ranges.get(feature, {}).get('max', 10)
+        columns[feature] = rng.integers(low, high + 1, n_rows).astype(float)
+    return pd.DataFrame(columns)
+
+
+def _latency_us(fn, repeat):
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return float(np.median(timings) * 1e6), float(np.percentile(timings, 99) * 1e6)
+
+
+def main(argv=None):
+    from house_model import FEATURE_INFO_PATH, MODEL_PATH, default_feature_info, load_feature_info, load_model
+
+    parser = argparse.ArgumentParser(description="Parité et latence de l'évaluateur natif")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--feature-info', default=FEATURE_INFO_PATH)
+    parser.add_argument('--rows', type=int, default=10_000, help="Taille du lot de vérification")
+    parser.add_argument('--repeat', type=int, default=200, help="Répétitions pour la latence")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    if model is None:
+        raise SystemExit(f"Fichier '{args.model}' non trouvé")
+    feature_info = load_feature_info(args.feature_info) or default_feature_info()
+
+    started = time.perf_counter()
+    ensemble = TreeEnsemble.from_model(model, feature_info['feature_names'])
+    print(f"Aplatissement : {ensemble.n_trees} arbres, {ensemble.n_nodes} nœuds, "
+          f"profondeur {ensemble.max_depth} en {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    batch = sample_features(feature_info, args.rows)
+    parity = check_parity(model, ensemble, batch)
+    print(f"Parité ({parity['rows']:,} lignes) : écart max {parity['max_abs_diff']:.6f} "
+          f"({parity['max_rel_diff']:.2e} relatif) -> {'✅ OK' if parity['ok'] else '❌ ÉCHEC'}")
+
+    row_df = batch.iloc[:1]
+    row_array = row_df.to_numpy()
+    for label, fn in (
+        ('model.predict (1 ligne)', lambda: model.predict(row_df)),
+        ('natif (1 ligne)', lambda: ensemble.predict(row_array)),
+        (f'model.predict ({args.rows:,} lignes)', lambda: model.predict(batch)),
+        (f'natif ({args.rows:,} lignes)', lambda: ensemble.predict_native(batch)),
+        (f'routé ({args.rows:,} lignes)', lambda: ensemble.predict(batch)),
+    ):
+        repeat = args.repeat if '1 ligne' in label else max(3, args.repeat // 20)
+        p50, p99 = _latency_us(fn, repeat)
+        print(f"  {label:<32} p50 {p50:12.1f} µs   p99 {p99:12.1f} µs")
+    return 0 if parity['ok'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+# what_if.py
+# Balayages de sensibilité « et si » autour d'une propriété, notés en un seul appel au modèle
+#
+# Exemple :
+#   sweep = run_sweep(model, binder, user_inputs, 'gr_liv_area', 'overall_qual', points=100)
+#   sweep.prices.shape  # (10, 100) : une ligne par qualité, une colonne par surface
+
+import numpy as np
+
+from house_model import INPUT_FEATURES
+
+# Axes balayables : champ du formulaire -> (libellé, minimum, maximum, valeurs entières)
+# Les bornes sont celles des widgets du formulaire.
+SWEEP_AXES = {
+    'gr_liv_area': ("Surface Habitable (sq ft)", 500, 5000, False),
+    'overall_qual': ("Qualité Générale", 1, 10, True),
+    'total_bsmt_sf': ("Surface Sous-sol (sq ft)", 0, 3000, False),
+    'year_built': ("Année de Construction", 1900, 2024, False),
+    'garage_cars': ("Places de Garage", 0, 4, True),
+    'full_bath': ("Salles de Bain Complètes", 1, 4, True),
+    'tot_rms_abv_grd': ("Pièces au-dessus du Sol", 3, 15, True),
+    'fireplaces': ("Cheminées", 0, 3, True)
+}
+
+# Champs calculés par l'application à partir d'un autre champ (garage_area = garage_cars * 250)
+DERIVED_INPUTS = {'garage_area': ('garage_cars', 250)}
+
+DEFAULT_SWEEP_POINTS = 100
+
+
+class Sweep:
+    """Résultat d'un balayage : valeurs des axes et grille des prix (y, x) ou (x,)"""
+
+    def __init__(self, x_axis, x_values, prices, y_axis=None, y_values=None):
+        self.x_axis = x_axis
+        self.x_values = x_values
+        self.y_axis = y_axis
+        self.y_values = y_values
+        self.prices = prices
+
+
+# Fonction pour calculer les valeurs d'un axe
+def axis_values(axis, points=DEFAULT_SWEEP_POINTS):
+    """Valeurs balayées : toutes les valeurs entières, ou `points` valeurs régulières (arrondies)"""
+    if axis not in SWEEP_AXES:
+        raise ValueError(f"Axe de balayage inconnu: {axis} (attendu: {', '.join(SWEEP_AXES)})")
+    _, low, high, integer = SWEEP_AXES[axis]
+    if integer or high - low + 1 <= points:
+        return np.arange(low, high + 1, dtype=float)
+    return np.unique(np.round(np.linspace(low, high, points)))
+
+
+# Fonction pour construire la matrice de la grille
+def build_sweep_matrix(binder, user_inputs, axes):
+    """Répéter la ligne de la propriété et remplacer les colonnes balayées (produit cartésien des axes)
+
+    `axes` est une liste [(champ, valeurs), ...]; le premier axe varie le plus vite.
+    """
+    shape = tuple(len(values) for _, values in reversed(axes))
+    matrix = np.repeat(binder.row(user_inputs), int(np.prod(shape)), axis=0)
+    grids = np.meshgrid(*[values for _, values in reversed(axes)], indexing='ij')
+    columns = {feature: position for position, feature in enumerate(binder.feature_names)}
+
+    for (axis, _), grid in zip(reversed(axes), grids):
+        matrix[:, columns[INPUT_FEATURES[axis]]] = grid.ravel()
+        for derived, (source, factor) in DERIVED_INPUTS.items():
+            if source == axis:
+                matrix[:, columns[INPUT_FEATURES[derived]]] = grid.ravel() * factor
+    return matrix, shape
+
+
+# Fonction pour exécuter un balayage
+def run_sweep(model, binder, user_inputs, x_axis, y_axis=None, points=DEFAULT_SWEEP_POINTS):
+    """Noter toute la grille autour de `user_inputs` en un seul appel vectorisé au modèle"""
+    if y_axis == x_axis:
+        raise ValueError("Les deux axes du balayage doivent être différents")
+    axes = [(x_axis, axis_values(x_axis, points))]
+    if y_axis is not None:
+        axes.append((y_axis, axis_values(y_axis, points)))
+
+    matrix, shape = build_sweep_matrix(binder, user_inputs, axes)
+    prices = binder.predict(model, matrix).reshape(shape)
+    if y_axis is None:
+        return Sweep(x_axis, axes[0][1], prices)
+    return Sweep(x_axis, axes[0][1], prices, y_axis, axes[1][1])